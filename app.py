@@ -1,4 +1,6 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, has_request_context
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
 import os
 from dotenv import load_dotenv
 from gtts import gTTS
@@ -9,16 +11,23 @@ import re
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 import random
 import time
 import hashlib
 import glob
 import threading
 import logging
+import json
+import zlib
+import base64
+import secrets
+import atexit
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, NamedTuple
+from types import MappingProxyType
 from collections import defaultdict
+from urllib.parse import quote
 
 # ================= SETUP =================
 load_dotenv()
@@ -29,6 +38,232 @@ app.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-product
 
 logger = logging.getLogger(__name__)
 
+# ================= SERVER-SIDE SESSION STORE =================
+# Session state (conversation context, current puzzle/grammar answers) and the item bags
+# live in a local SQLite file shared by all workers; the cookie only carries an opaque id.
+SESSION_BACKEND  = os.getenv("SESSION_BACKEND", "sqlite")   # "sqlite" or "cookie"
+SESSION_DB_PATH  = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL_SECS = int(os.getenv("SESSION_TTL_SECS", 7 * 24 * 3600))
+_SID_RE = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+def _pack(value):
+    """Compact JSON, zlib-compressed when that actually saves space. First byte is the format flag."""
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(raw) > 256:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"j" + raw
+
+def _unpack(blob):
+    blob = bytes(blob)
+    if blob[:1] == b"z":
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
+
+class SqliteKVStore:
+    """Tiny namespaced key/value store with TTL expiry, one connection per thread."""
+
+    def __init__(self, path):
+        self.path   = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS kv_store (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_kv_store_expires ON kv_store(expires_at)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        row = self._conn().execute(
+            'SELECT value, expires_at FROM kv_store WHERE namespace=? AND key=?', (namespace, key)
+        ).fetchone()
+        if not row or row[1] < time.time():
+            return None, 0
+        return _unpack(row[0]), row[1]
+
+    def set(self, namespace, key, value, ttl):
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO kv_store (namespace, key, value, expires_at) VALUES (?,?,?,?)',
+            (namespace, key, _pack(value), time.time() + ttl)
+        )
+        conn.commit()
+
+    def touch(self, namespace, key, ttl):
+        conn = self._conn()
+        conn.execute(
+            'UPDATE kv_store SET expires_at=? WHERE namespace=? AND key=?',
+            (time.time() + ttl, namespace, key)
+        )
+        conn.commit()
+
+    def delete(self, namespace, key):
+        conn = self._conn()
+        conn.execute('DELETE FROM kv_store WHERE namespace=? AND key=?', (namespace, key))
+        conn.commit()
+
+    def delete_many(self, namespace, keys):
+        conn = self._conn()
+        conn.executemany('DELETE FROM kv_store WHERE namespace=? AND key=?', [(namespace, k) for k in keys])
+        conn.commit()
+
+    def purge_expired(self):
+        conn = self._conn()
+        deleted = conn.execute('DELETE FROM kv_store WHERE expires_at < ?', (time.time(),)).rowcount
+        conn.commit()
+        return deleted
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=0, is_new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+        super().__init__(initial, on_update)
+        self.sid        = sid
+        self.expires_at = expires_at
+        self.new        = is_new
+        self.modified   = False
+        self.accessed   = False
+        self.rotate     = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+class ServerSideSessionInterface(SessionInterface):
+    namespace = "session"
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl   = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_RE.match(sid):
+            data, expires_at = self.store.get(self.namespace, sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid, expires_at=expires_at)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), is_new=True)
+
+    def save_session(self, app, session, response):
+        name   = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path   = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(self.namespace, session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.rotate and not session.new:
+            self.store.delete(self.namespace, session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        if session.modified or session.new:
+            self.store.set(self.namespace, session.sid, dict(session), self.ttl)
+        elif session.expires_at - time.time() < self.ttl / 2:
+            # Sliding expiry, but only rewrite the row once half the TTL has elapsed
+            self.store.touch(self.namespace, session.sid, self.ttl)
+
+        if session.new or session.modified:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+def regenerate_session_id():
+    """Issue a fresh session id on privilege change (login) to prevent session fixation."""
+    if isinstance(session, ServerSideSession):
+        session.rotate   = True
+        session.modified = True
+
+if SESSION_BACKEND == "sqlite":
+    kv_store = SqliteKVStore(SESSION_DB_PATH)
+    app.session_interface = ServerSideSessionInterface(kv_store, SESSION_TTL_SECS)
+else:
+    kv_store = None
+
+def schedule_session_purge():
+    try:
+        kv_store.purge_expired()
+    except sqlite3.Error as e:
+        logger.warning("Session purge failed: %s", e)
+    t = threading.Timer(1800, schedule_session_purge)
+    t.daemon = True
+    t.start()
+
+# ================= STUDENT INFO CACHE =================
+# The /get_student_info payload, cached per student and UTC day in the shared kv store so every
+# worker sees the same entry. Writers that change it (XP, daily challenge, admin reset/delete)
+# drop the entry after they commit; the short TTL bounds anything that slips between a
+# reader's queries and its cache write. Off under the cookie session backend.
+STUDENT_INFO_CACHE_SECS = int(os.getenv("STUDENT_INFO_CACHE_SECS", 30))
+STUDENT_INFO_NAMESPACE  = "student_info"
+student_info_cache = kv_store if STUDENT_INFO_CACHE_SECS > 0 else None
+
+def _student_info_key(user_id_code):
+    return f"{user_id_code}:{datetime.now(timezone.utc).date().isoformat()}"
+
+def cached_student_info(user_id_code):
+    if not student_info_cache:
+        return None
+    try:
+        return student_info_cache.get(STUDENT_INFO_NAMESPACE, _student_info_key(user_id_code))[0]
+    except sqlite3.Error as e:
+        logger.warning("Student info cache read failed: %s", e)
+        return None
+
+def cache_student_info(user_id_code, info):
+    if not student_info_cache:
+        return
+    try:
+        student_info_cache.set(STUDENT_INFO_NAMESPACE, _student_info_key(user_id_code), info, STUDENT_INFO_CACHE_SECS)
+    except sqlite3.Error as e:
+        logger.warning("Student info cache write failed: %s", e)
+
+def invalidate_student_info(*user_id_codes):
+    if not student_info_cache or not user_id_codes:
+        return
+    try:
+        student_info_cache.delete_many(STUDENT_INFO_NAMESPACE, [_student_info_key(uid) for uid in user_id_codes])
+    except sqlite3.Error as e:
+        logger.warning("Student info cache invalidation failed: %s", e)
+
 # ================= ADMIN CREDENTIALS (env-based) =================
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 _ADMIN_PASSWORD_RAW = os.getenv("ADMIN_PASSWORD", "admin123")
@@ -109,6 +344,11 @@ def generate_unique_user_id(conn):
         existing = conn.execute(
             'SELECT id FROM users WHERE user_id_code = ?', (uid,)
         ).fetchone()
+        if not existing and SHARD_BY:
+            # Students in class shards are only visible here through the global directory.
+            existing = conn.execute(
+                'SELECT id FROM shard_directory WHERE user_id_code = ?', (uid,)
+            ).fetchone()
         if not existing:
             return uid
     return f"GSS-{int(time.time() * 1000) % 100000:05d}"
@@ -168,86 +408,92 @@ ALL_BADGES = [
 
 BADGE_MAP = {b["id"]: b for b in ALL_BADGES}
 
-def check_earned_badges(user_id_code, progress_data, mode=None, difficulty=None, score=None, stars_earned=None, attempt=None):
-    conn = get_db_connection()
-    existing = conn.execute(
-        'SELECT badge_id FROM student_badges WHERE user_id_code = ?', (user_id_code,)
-    ).fetchall()
-    conn.close()
-    already_earned = {row['badge_id'] for row in existing}
-    newly_earned = []
-
-    def award(badge_id):
-        if badge_id not in already_earned:
-            newly_earned.append(badge_id)
-            already_earned.add(badge_id)
-
-    total_xp    = progress_data.get('xp', 0)
-    conv_xp     = progress_data.get('conversation_xp', 0)
-    role_xp     = progress_data.get('roleplay_xp', 0)
-    repeat_xp   = progress_data.get('repeat_xp', 0)
-    spell_xp    = progress_data.get('spellbee_xp', 0)
-    mean_xp     = progress_data.get('meanings_xp', 0)
-    puzzle_xp   = progress_data.get('wordpuzzle_xp', 0)
-    grammar_xp  = progress_data.get('grammar_xp', 0)
-    total_stars = progress_data.get('total_stars', 0)
-    streak      = progress_data.get('streak', 0)
-
-    if total_xp >= 1:   award("first_xp")
-    if total_xp >= 25:  award("xp_25")
-    if total_xp >= 50:  award("xp_50")
-    if total_xp >= 100: award("xp_100")
-    if total_xp >= 250: award("xp_250")
-    if total_xp >= 500: award("xp_500")
-
-    if conv_xp >= 10: award("conv_10")
-    if conv_xp >= 50: award("conv_50")
-
-    if role_xp >= 10: award("role_10")
-    if role_xp >= 50: award("role_50")
-
-    if mode == 'repeat':
-        if difficulty == 'easy':   award("repeat_easy")
-        if difficulty == 'medium': award("repeat_medium")
-        if difficulty == 'hard':   award("repeat_hard")
-        if score == 100:           award("perfect_repeat")
-    if repeat_xp >= 50: award("repeat_50")
-
-    if mode == 'spellbee':
-        if difficulty == 'easy':   award("spell_easy")
-        if difficulty == 'medium': award("spell_medium")
-        if difficulty == 'hard':   award("spell_hard")
-        if score == 100:           award("perfect_spell")
-    if spell_xp >= 50: award("spell_50")
-
-    if mean_xp >= 10: award("meanings_1")
-    if mean_xp >= 50: award("meanings_50")
-
-    if mode == 'wordpuzzle':
-        if difficulty == 'easy':   award("puzzle_easy")
-        if difficulty == 'medium': award("puzzle_medium")
-        if difficulty == 'hard':   award("puzzle_hard")
-        if score == 100 and (attempt is None or attempt == 1):
-            award("perfect_puzzle")
-    if puzzle_xp >= 50: award("puzzle_50")
-
-    if mode == 'grammar':
-        if difficulty == 'easy':   award("grammar_easy")
-        if difficulty == 'medium': award("grammar_medium")
-        if difficulty == 'hard':   award("grammar_hard")
-    if grammar_xp >= 50: award("grammar_50")
-
-    if total_stars >= 5:  award("stars_5")
-    if total_stars >= 15: award("stars_15")
-    if total_stars >= 30: award("stars_30")
-
-    if streak >= 3: award("streak_3")
-    if streak >= 7: award("streak_7")
-
-    if conv_xp > 0 and role_xp > 0 and repeat_xp > 0 and spell_xp > 0 and mean_xp > 0 and puzzle_xp > 0 and grammar_xp > 0:
-        award("all_modes")
-
-    return newly_earned
+# Earned badges are also kept as student_progress.badge_mask, bit i for ALL_BADGES[i], so the
+# XP path knows what a student has from the row its UPDATE returns. Only ever append to
+# ALL_BADGES: reordering it would reassign every stored bit.
+BADGE_BITS = {b["id"]: 1 << i for i, b in enumerate(ALL_BADGES)}
+
+def badge_mask_of(badge_ids):
+    mask = 0
+    for badge_id in badge_ids:
+        mask |= BADGE_BITS[badge_id]
+    return mask
+
+def badge_ids_in(mask):
+    return [b["id"] for b in ALL_BADGES if mask & BADGE_BITS[b["id"]]]
+
+# ================= BADGE RULES =================
+# Each rule names the inputs it reads: progress fields, or "event:<mode>" for badges awarded by
+# a single practice event. An XP event only evaluates the rules indexed under what it changed,
+# so a grammar answer never looks at the roleplay or spelling thresholds.
+def _threshold(field, minimum):
+    return (field,), lambda progress, event: progress.get(field, 0) >= minimum
+
+def _on_event(mode, difficulty=None, perfect=False, first_try=False):
+    def test(progress, event):
+        return (event is not None and event['mode'] == mode
+                and (difficulty is None or event['difficulty'] == difficulty)
+                and (not perfect or event['score'] == 100)
+                and (not first_try or event['attempt'] in (None, 1)))
+    return (f"event:{mode}",), test
+
+_ALL_MODE_XP = ("conversation_xp", "roleplay_xp", "repeat_xp", "spellbee_xp",
+                "meanings_xp", "wordpuzzle_xp", "grammar_xp")
+
+BADGE_RULES = {
+    "first_xp":       _threshold("xp", 1),
+    "xp_25":          _threshold("xp", 25),
+    "xp_50":          _threshold("xp", 50),
+    "xp_100":         _threshold("xp", 100),
+    "xp_250":         _threshold("xp", 250),
+    "xp_500":         _threshold("xp", 500),
+    "conv_10":        _threshold("conversation_xp", 10),
+    "conv_50":        _threshold("conversation_xp", 50),
+    "role_10":        _threshold("roleplay_xp", 10),
+    "role_50":        _threshold("roleplay_xp", 50),
+    "repeat_easy":    _on_event("repeat", difficulty="easy"),
+    "repeat_medium":  _on_event("repeat", difficulty="medium"),
+    "repeat_hard":    _on_event("repeat", difficulty="hard"),
+    "repeat_50":      _threshold("repeat_xp", 50),
+    "spell_easy":     _on_event("spellbee", difficulty="easy"),
+    "spell_medium":   _on_event("spellbee", difficulty="medium"),
+    "spell_hard":     _on_event("spellbee", difficulty="hard"),
+    "spell_50":       _threshold("spellbee_xp", 50),
+    "meanings_1":     _threshold("meanings_xp", 10),
+    "meanings_50":    _threshold("meanings_xp", 50),
+    "puzzle_easy":    _on_event("wordpuzzle", difficulty="easy"),
+    "puzzle_medium":  _on_event("wordpuzzle", difficulty="medium"),
+    "puzzle_hard":    _on_event("wordpuzzle", difficulty="hard"),
+    "puzzle_50":      _threshold("wordpuzzle_xp", 50),
+    "grammar_easy":   _on_event("grammar", difficulty="easy"),
+    "grammar_medium": _on_event("grammar", difficulty="medium"),
+    "grammar_hard":   _on_event("grammar", difficulty="hard"),
+    "grammar_50":     _threshold("grammar_xp", 50),
+    "stars_5":        _threshold("total_stars", 5),
+    "stars_15":       _threshold("total_stars", 15),
+    "stars_30":       _threshold("total_stars", 30),
+    "perfect_repeat": _on_event("repeat", perfect=True),
+    "perfect_spell":  _on_event("spellbee", perfect=True),
+    "perfect_puzzle": _on_event("wordpuzzle", perfect=True, first_try=True),
+    "streak_3":       _threshold("streak", 3),
+    "streak_7":       _threshold("streak", 7),
+    "all_modes":      (_ALL_MODE_XP, lambda progress, event: all(progress.get(f, 0) > 0 for f in _ALL_MODE_XP)),
+}
+
+if set(BADGE_RULES) != set(BADGE_MAP):
+    raise RuntimeError(f"Badges without a rule (or rules without a badge): {sorted(set(BADGE_RULES) ^ set(BADGE_MAP))}")
+
+BADGE_RULE_INDEX = defaultdict(list)
+for _badge in ALL_BADGES:
+    _inputs, _test = BADGE_RULES[_badge["id"]]
+    for _input in _inputs:
+        BADGE_RULE_INDEX[_input].append((BADGE_BITS[_badge["id"]], _badge["id"], _test))
+
+def check_earned_badges(progress_data, earned_mask, changed, event=None):
+    """Badge ids newly earned, in ALL_BADGES order, by the rules reading anything in changed."""
+    candidates = {rule for key in changed for rule in BADGE_RULE_INDEX.get(key, ())}
+    return [badge_id for bit, badge_id, test in sorted(candidates, key=lambda rule: rule[0])
+            if not earned_mask & bit and test(progress_data, event)]
 
 _ROLEPLAY_ROLE_PROMPTS = {
     "teacher": (
@@ -294,94 +540,52 @@ _ROLEPLAY_ROLE_PROMPTS = {
     ),
 }
 
-def get_session_recent_sentences():
-    return session.get('recent_sentences', [])
-
-def set_session_recent_sentences(lst):
-    session['recent_sentences'] = lst
-
-def get_session_recent_words():
-    return session.get('recent_words', [])
-
-def set_session_recent_words(lst):
-    session['recent_words'] = lst
-
-def get_session_recent_roleplay(rtype):
-    return session.get(f'recent_roleplay_{rtype}', [])
-
-def set_session_recent_roleplay(rtype, lst):
-    session[f'recent_roleplay_{rtype}'] = lst
-
-def get_session_recent_puzzle_words():
-    return session.get('recent_puzzle_words', [])
-
-def set_session_recent_puzzle_words(lst):
-    session['recent_puzzle_words'] = lst
-
-MAX_HISTORY = 20
-
-ROLEPLAY_QUESTIONS = {
-    "teacher": [
-        "What did you learn in school today?",
-        "Can you tell me what photosynthesis means?",
-        "What is the capital city of India?",
-        "Can you solve: what is 12 multiplied by 8?",
-        "What is the largest planet in our solar system?",
-        "Can you name three types of triangles?",
-        "What causes day and night on Earth?",
-        "Who wrote the national anthem of India?",
-    ],
-    "friend": [
-        "Want to play cricket after school?",
-        "What's your favorite cartoon?",
-        "Did you bring lunch today?",
-        "Which subject do you like most?",
-        "What game do you play on weekends?",
-        "Have you watched any good movies lately?",
-        "What's your favorite ice cream flavor?",
-        "Do you have any pets at home?",
-    ],
-    "interviewer": [
-        "Please introduce yourself.",
-        "What are your strengths and weaknesses?",
-        "Where do you see yourself in five years?",
-        "Describe a challenge you overcame.",
-        "Why should we select you for this role?",
-        "Tell me about a time you worked in a team.",
-        "What motivates you to do your best work?",
-        "Do you have any questions for us?",
-    ],
-    "viva": [
-        "Can you explain your project methodology?",
-        "What are the limitations of your approach?",
-        "How does your solution work in practice?",
-        "What references did you use for your research?",
-        "Can you walk me through your key findings?",
-        "How would you improve your project if given more time?",
-        "What alternative approaches did you consider?",
-        "How does your work contribute to the field?",
-    ],
-}
+# ================= NO-REPEAT ITEM SAMPLER =================
+# One shuffle-bag per (mode, corpus) stored as [size, last_idx, *remaining]. Every item is
+# served once before any repeats, each draw is a list pop, and the bag is reshuffled (never
+# starting with the item just served) only once it runs dry.
+# With server-side sessions each bag is its own kv_store row keyed by session id, so a draw
+# never rewrites the session blob and can't be lost to (or clobber) a concurrent request's
+# session save. The cookie backend keeps the bags in the session.
+SAMPLER_NAMESPACE = "sampler"
+
+def load_item_bag(bag_key):
+    if isinstance(session, ServerSideSession):
+        return kv_store.get(SAMPLER_NAMESPACE, f"{session.sid}:{bag_key}")[0]
+    return session.get('item_bags', {}).get(bag_key)
+
+def store_item_bag(bag_key, bag):
+    if isinstance(session, ServerSideSession):
+        kv_store.set(SAMPLER_NAMESPACE, f"{session.sid}:{bag_key}", bag, SESSION_TTL_SECS)
+    else:
+        session['item_bags'] = {**session.get('item_bags', {}), bag_key: bag}
+
+def draw_item(bag_key, items):
+    n    = len(items)
+    bag  = load_item_bag(bag_key)
+    if not bag or bag[0] != n or len(bag) <= 2:
+        last  = bag[1] if bag and bag[0] == n else -1
+        order = list(range(n))
+        random.shuffle(order)
+        if n > 1 and order[-1] == last:
+            order[0], order[-1] = order[-1], order[0]
+        bag = [n, last] + order
+    idx    = bag.pop()
+    bag[1] = idx
+    store_item_bag(bag_key, bag)
+    return items[idx], idx
 
 def get_roleplay_question(roleplay_type):
-    questions = ROLEPLAY_QUESTIONS.get(roleplay_type, ROLEPLAY_QUESTIONS["friend"])
-    recent = get_session_recent_roleplay(roleplay_type)
-    available_questions = [q for q in questions if q not in recent]
-    if not available_questions:
-        recent = recent[-5:] if len(recent) > 5 else []
-        set_session_recent_roleplay(roleplay_type, recent)
-        available_questions = [q for q in questions if q not in recent]
-    if not available_questions:
-        available_questions = questions
-    selected_question = random.choice(available_questions)
-    recent.append(selected_question)
-    if len(recent) > 10:
-        recent = recent[-10:]
-    set_session_recent_roleplay(roleplay_type, recent)
-    return selected_question
+    corpus = current_content().roleplay
+    if roleplay_type not in corpus:
+        roleplay_type = "friend"
+    question, _ = draw_item(f"roleplay:{roleplay_type}", corpus[roleplay_type])
+    return question.text
 
 # ================= TTS CACHE =================
 CACHE_DIR = "static/audio_cache"
+# Set DISABLE_TTS=1 for load tests so gTTS is never called (routes already handle audio=None)
+DISABLE_TTS = os.getenv("DISABLE_TTS", "").lower() in ("1", "true", "yes")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 def get_cache_filename(text, slow=False):
@@ -424,73 +628,107 @@ def schedule_audio_cleanup():
     t.daemon = True
     t.start()
 
-schedule_audio_cleanup()
-
 # ================= FEATURE UNLOCK SYSTEM =================
 FEATURE_SEQUENCE = ["conversation", "roleplay", "repeat", "spellbee", "wordpuzzle", "grammar", "meanings"]
 XP_PER_UNLOCK = 50
 
+# Each feature after the first unlocks once the one before it has XP_PER_UNLOCK XP. The result
+# is stored as student_progress.unlock_mask (bit i for FEATURE_SEQUENCE[i]), recomputed only
+# when an XP write changes a mode's XP, so read paths decode it instead of re-walking the chain.
+FEATURE_BITS      = {feature: 1 << i for i, feature in enumerate(FEATURE_SEQUENCE)}
+UNLOCK_THRESHOLDS = [
+    # (feature, XP column that unlocks it, XP needed)
+    (feature, f"{previous}_xp", XP_PER_UNLOCK)
+    for previous, feature in zip(FEATURE_SEQUENCE, FEATURE_SEQUENCE[1:])
+]
+UNLOCK_MASK_BASE = FEATURE_BITS[FEATURE_SEQUENCE[0]]
+UNLOCK_MASK_SQL  = " | ".join(
+    [str(UNLOCK_MASK_BASE)] +
+    [f"(CASE WHEN {column} >= {needed} THEN {FEATURE_BITS[feature]} ELSE 0 END)"
+     for feature, column, needed in UNLOCK_THRESHOLDS]
+)
+
+def unlock_mask_for(progress_data):
+    mask = UNLOCK_MASK_BASE
+    for feature, column, needed in UNLOCK_THRESHOLDS:
+        if (progress_data.get(column) or 0) >= needed:
+            mask |= FEATURE_BITS[feature]
+    return mask
+
+def _unlock_mask(progress_data):
+    mask = progress_data.get('unlock_mask')
+    return unlock_mask_for(progress_data) if mask is None else mask
+
 def get_unlocked_features(progress_data):
-    unlocked = ["conversation"]
-    if progress_data.get('conversation_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("roleplay")
-    if progress_data.get('roleplay_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("repeat")
-    if progress_data.get('repeat_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("spellbee")
-    if progress_data.get('spellbee_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("wordpuzzle")
-    if progress_data.get('wordpuzzle_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("grammar")
-    if progress_data.get('grammar_xp', 0) >= XP_PER_UNLOCK:
-        unlocked.append("meanings")
-    return unlocked
+    mask = _unlock_mask(progress_data)
+    return [feature for feature in FEATURE_SEQUENCE if mask & FEATURE_BITS[feature]]
 
 def get_next_unlock(progress_data):
-    chain = [
-        ("roleplay",   "conversation"),
-        ("repeat",     "roleplay"),
-        ("spellbee",   "repeat"),
-        ("wordpuzzle", "spellbee"),
-        ("grammar",    "wordpuzzle"),
-        ("meanings",   "grammar"),
-    ]
-    for feature, current_mode in chain:
-        current_xp = progress_data.get(f"{current_mode}_xp", 0)
-        if current_xp < XP_PER_UNLOCK:
+    mask = _unlock_mask(progress_data)
+    for feature, column, needed in UNLOCK_THRESHOLDS:
+        if not mask & FEATURE_BITS[feature]:
+            current_xp = progress_data.get(column) or 0
             return {
                 'feature':      feature,
-                'current_mode': current_mode,
-                'xp_needed':    XP_PER_UNLOCK - current_xp,
+                'current_mode': column[:-len("_xp")],
+                'xp_needed':    needed - current_xp,
                 'current_xp':   current_xp,
             }
     return None
 
 # ================= STREAK CALCULATION =================
+# student_progress keeps the streak up to date as activity is recorded: STREAK_BUMP runs in
+# the same UPDATE that logs XP, and last_active_day (UTC, like activity_log.day) says whether
+# it is still alive. Reads are a single row lookup however long the history is.
+STREAK_BUMP = """
+    streak = CASE
+        WHEN last_active_day = date('now')             THEN streak
+        WHEN last_active_day = date('now', '-1 day')   THEN streak + 1
+        ELSE 1
+    END,
+    last_active_day = date('now')
+"""
+
+# For list queries over student_progress sp: a streak whose last day is before yesterday is over.
+STREAK_COLUMN = "CASE WHEN sp.last_active_day >= date('now', '-1 day') THEN sp.streak ELSE 0 END AS streak"
+
+def live_streak(streak, last_active_day):
+    yesterday = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+    if not last_active_day or last_active_day < yesterday:
+        return 0
+    return streak or 0
+
 def calculate_streak(user_id_code):
-    conn = get_db_connection()
-    rows = conn.execute(
-        '''SELECT DISTINCT date(date) as day FROM activity_log
-           WHERE user_id_code = ? ORDER BY day DESC''',
+    conn = student_connection(user_id_code)
+    row = conn.execute(
+        'SELECT streak, last_active_day FROM student_progress WHERE user_id_code = ?',
         (user_id_code,)
-    ).fetchall()
+    ).fetchone()
     conn.close()
-    if not rows:
-        return 0
-    streak = 0
-    today = date.today()
-    check_date = today
-    for row in rows:
-        day = date.fromisoformat(row['day'])
-        if day == check_date or day == check_date - timedelta(days=1):
-            streak += 1
-            check_date = day - timedelta(days=1)
-        elif day < check_date - timedelta(days=1):
-            break
-    most_recent = date.fromisoformat(rows[0]['day'])
-    if most_recent < today - timedelta(days=1):
-        return 0
-    return streak
+    return live_streak(row['streak'], row['last_active_day']) if row else 0
+
+def backfill_streaks(c):
+    """One-off: derive streak/last_active_day from activity_log for existing students."""
+    rows = c.execute(
+        '''SELECT user_id_code, day FROM activity_log
+           WHERE user_id_code IS NOT NULL AND day IS NOT NULL
+           GROUP BY user_id_code, day ORDER BY user_id_code, day DESC'''
+    ).fetchall()
+    state = {}
+    for uid, day in rows:
+        d = date.fromisoformat(day)
+        if uid not in state:
+            state[uid] = [day, 1, d]
+        elif state[uid][2] is not None:
+            if d == state[uid][2] - timedelta(days=1):
+                state[uid][1] += 1
+                state[uid][2] = d
+            else:
+                state[uid][2] = None
+    c.executemany(
+        'UPDATE student_progress SET last_active_day=?, streak=? WHERE user_id_code=?',
+        [(last_day, streak, uid) for uid, (last_day, streak, _) in state.items()]
+    )
 
 # ================= DAILY WORD/SENTENCE =================
 DAILY_WORDS = [
@@ -518,10 +756,11 @@ def get_daily_challenge():
     return {"word": word, "sentence": sentence}
 
 def has_completed_daily(user_id_code):
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     row = conn.execute(
-        '''SELECT id FROM activity_log WHERE user_id_code = ? AND mode = 'daily'
-           AND date(date) = date('now')''',
+        '''SELECT attempts FROM activity_daily_rollup
+           WHERE user_id_code = ? AND day = date('now') AND mode = 'daily'
+        ''',
         (user_id_code,)
     ).fetchone()
     conn.close()
@@ -529,85 +768,13 @@ def has_completed_daily(user_id_code):
 
 # ================= PERSONAL SUGGESTIONS ENGINE =================
 
-MODE_META = {
-    "conversation": {
-        "icon": "💬", "label": "Conversation",
-        "tips": [
-            "Try speaking in longer sentences during Conversation practice.",
-            "When chatting, describe your feelings in detail — use words like 'excited', 'nervous', or 'curious'.",
-            "Practice asking follow-up questions in Conversation mode to boost your score.",
-            "Read a short English passage aloud before each Conversation session to warm up.",
-        ],
-        "praise": "Your Conversation skills are really strong! Keep the streak going.",
-    },
-    "roleplay": {
-        "icon": "🎭", "label": "Roleplay",
-        "tips": [
-            "In Roleplay, stay in character! Pretend the scenario is real and respond naturally.",
-            "Before Roleplay, think about how the character (teacher/friend/interviewer) would speak.",
-            "Use polite phrases like 'Could you please...', 'I believe...' in Interviewer roleplay.",
-            "For the Teacher roleplay, try answering in complete sentences with reasons.",
-        ],
-        "praise": "You're doing great in Roleplay! Your character responses are natural.",
-    },
-    "repeat": {
-        "icon": "🔁", "label": "Repeat After Me",
-        "tips": [
-            "In Repeat mode, listen to the full sentence first, then speak clearly and at a steady pace.",
-            "Try the Slow Audio button to catch every word before repeating.",
-            "Focus on getting the ending of each sentence right — that's where most mistakes happen.",
-            "Record yourself and compare with the original to spot pronunciation differences.",
-        ],
-        "praise": "Excellent pronunciation work in Repeat mode! You're a natural speaker.",
-    },
-    "spellbee": {
-        "icon": "🐝", "label": "Spell Bee",
-        "tips": [
-            "For Spell Bee, break words into syllables — e.g., 'beau-ti-ful' is easier to spell that way.",
-            "Listen to the word two or three times before typing your spelling.",
-            "Learn common word patterns like '-tion', '-ough', '-ight' to spell faster.",
-            "Practice with Easy words daily to build spelling confidence before tackling Hard words.",
-        ],
-        "praise": "Your spelling is fantastic! You have a sharp eye for letters.",
-    },
-    "wordpuzzle": {
-        "icon": "🧩", "label": "Word Puzzle",
-        "tips": [
-            "In Word Puzzle, read the hint carefully — it always points to the right answer.",
-            "Try sorting the scrambled letters alphabetically in your head first.",
-            "Look for vowels (A, E, I, O, U) first — they're the skeleton of every word.",
-            "If stuck, use the category clue alongside the hint for extra guidance.",
-        ],
-        "praise": "You're a Word Puzzle champion! Your lateral thinking is impressive.",
-    },
-    "grammar": {
-        "icon": "📝", "label": "Grammar",
-        "tips": [
-            "For Grammar, read the full sentence aloud — the correct option usually sounds natural.",
-            "Remember: 'He/She/It' → always use verbs ending in -s (goes, runs, eats).",
-            "Study subject-verb agreement: singular subjects take singular verbs.",
-            "Practice Medium Grammar questions after mastering Easy ones — the jump is big!",
-        ],
-        "praise": "Your grammar instincts are sharp! Keep challenging yourself.",
-    },
-    "meanings": {
-        "icon": "📖", "label": "Word Meanings",
-        "tips": [
-            "In Meanings mode, make a small notebook of new words and review them daily.",
-            "Try using each new word in a sentence of your own right after looking it up.",
-            "Group words by theme (feelings, nature, actions) to remember them better.",
-            "Challenge yourself to learn 3 new words per day in Meanings mode.",
-        ],
-        "praise": "You love learning new words! Your vocabulary is growing beautifully.",
-    },
-}
-
 def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, streak):
     """
     Generates a list of personal suggestion objects based on the student's
     performance data. Each suggestion has: type, icon, title, message, priority.
     """
     suggestions = []
+    mode_meta   = current_content().mode_meta
 
     total_xp     = progress_data.get('xp', 0)
     total_stars  = progress_data.get('total_stars', 0)
@@ -680,7 +847,7 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
 
     # Suggestions for struggling modes (priority: highest)
     for mode, avg in sorted(struggling_modes, key=lambda x: x[1]):
-        meta = MODE_META.get(mode, {})
+        meta = mode_meta.get(mode, {})
         tip  = random.choice(meta.get('tips', ["Practice this mode a little every day."]))
         suggestions.append({
             "type": "struggle",
@@ -694,7 +861,7 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
 
     # Suggestions for improving modes
     for mode, avg in sorted(improving_modes, key=lambda x: x[1]):
-        meta = MODE_META.get(mode, {})
+        meta = mode_meta.get(mode, {})
         tip  = random.choice(meta.get('tips', ["You're getting better — keep it up!"]))
         suggestions.append({
             "type": "improve",
@@ -708,7 +875,7 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
 
     # Praise for strong modes
     for mode, avg in sorted(strong_modes, key=lambda x: -x[1])[:2]:  # top 2 only
-        meta = MODE_META.get(mode, {})
+        meta = mode_meta.get(mode, {})
         suggestions.append({
             "type": "praise",
             "icon": "⭐",
@@ -723,7 +890,7 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
     unlocked = get_unlocked_features(progress_data)
     for mode in untried_modes:
         if mode in unlocked:
-            meta = MODE_META.get(mode, {})
+            meta = mode_meta.get(mode, {})
             suggestions.append({
                 "type": "explore",
                 "icon": meta.get('icon', '🆕'),
@@ -739,7 +906,7 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
     for ws in recent_weak:
         mode = ws.get('mode', '')
         score = ws.get('score', 0)
-        meta = MODE_META.get(mode, {})
+        meta = mode_meta.get(mode, {})
         if meta:
             tip = random.choice(meta.get('tips', ["Review this mode and try again!"]))
             suggestions.append({
@@ -788,11 +955,343 @@ def generate_personal_suggestions(mode_stats, weak_sessions, progress_data, stre
     return suggestions[:6]
 
 
-# ================= DATABASE SETUP =================
-def init_db():
-    conn = sqlite3.connect('students.db')
-    c = conn.cursor()
+# ================= STAT COUNTERS =================
+# Dashboard totals live in stat_counters and are kept exact by triggers, so every write path
+# (signup, login, XP, admin toggles, bulk deletes, write-behind flushes) updates them in the
+# same transaction without having to remember to. Per-day activity counts are keyed
+# 'activity:YYYY-MM-DD'.
+#
+# Archival is the exception: it deletes thousands of old activity rows at once, so it holds a
+# row in activity_archiving for the length of its transaction, which silences the per-row
+# activity_log delete triggers, and applies the same changes itself in bulk.
+ACTIVITY_ARCHIVING_TABLE = "CREATE TABLE IF NOT EXISTS activity_archiving (active INTEGER PRIMARY KEY)"
+NOT_ARCHIVING = "NOT EXISTS (SELECT 1 FROM activity_archiving)"
+USER_COUNTERS = {
+    "students_total":    "{r}.role='student'",
+    "students_active":   "{r}.role='student' AND {r}.is_active=1",
+    "students_inactive": "{r}.role='student' AND {r}.is_active=0",
+    "teachers_total":    "{r}.role='teacher'",
+    "teachers_pending":  "{r}.role='teacher' AND {r}.is_approved=0",
+}
+STAT_COUNTER_NAMES = [*USER_COUNTERS, "total_xp", "total_sessions"]
+
+def _counter_delta(counters, sign_row_pairs):
+    cases = " ".join(
+        f"WHEN '{name}' THEN " + " ".join(f"{sign} IFNULL(({pred.format(r=row)}), 0)" for sign, row in sign_row_pairs)
+        for name, pred in counters.items()
+    )
+    names = ", ".join(f"'{name}'" for name in counters)
+    return f"UPDATE stat_counters SET value = value + CASE name {cases} ELSE 0 END WHERE name IN ({names});"
+
+STAT_TRIGGERS = {
+    "trg_users_count_ins": f"AFTER INSERT ON users BEGIN {_counter_delta(USER_COUNTERS, [('+', 'NEW')])} END",
+    "trg_users_count_del": f"AFTER DELETE ON users BEGIN {_counter_delta(USER_COUNTERS, [('-', 'OLD')])} END",
+    "trg_users_count_upd": (
+        "AFTER UPDATE OF role, is_active, is_approved ON users "
+        f"BEGIN {_counter_delta(USER_COUNTERS, [('+', 'NEW'), ('-', 'OLD')])} END"
+    ),
+    "trg_progress_xp_ins": "AFTER INSERT ON student_progress BEGIN "
+                           "UPDATE stat_counters SET value = value + IFNULL(NEW.xp, 0) WHERE name='total_xp'; END",
+    "trg_progress_xp_del": "AFTER DELETE ON student_progress BEGIN "
+                           "UPDATE stat_counters SET value = value - IFNULL(OLD.xp, 0) WHERE name='total_xp'; END",
+    "trg_progress_xp_upd": "AFTER UPDATE OF xp ON student_progress BEGIN "
+                           "UPDATE stat_counters SET value = value + IFNULL(NEW.xp, 0) - IFNULL(OLD.xp, 0) WHERE name='total_xp'; END",
+    "trg_sessions_count_ins": "AFTER INSERT ON student_sessions BEGIN "
+                              "UPDATE stat_counters SET value = value + 1 WHERE name='total_sessions'; END",
+    "trg_sessions_count_del": "AFTER DELETE ON student_sessions BEGIN "
+                              "UPDATE stat_counters SET value = value - 1 WHERE name='total_sessions'; END",
+    "trg_activity_count_ins": "AFTER INSERT ON activity_log WHEN NEW.day IS NOT NULL BEGIN "
+                              "INSERT INTO stat_counters (name, value) VALUES ('activity:' || NEW.day, 1) "
+                              "ON CONFLICT(name) DO UPDATE SET value = value + 1; END",
+    "trg_activity_count_del": f"AFTER DELETE ON activity_log WHEN OLD.day IS NOT NULL AND {NOT_ARCHIVING} BEGIN "
+                              "UPDATE stat_counters SET value = value - 1 WHERE name = 'activity:' || OLD.day; END",
+}
 
+def rebuild_stat_counters(c):
+    """Recompute every counter from the base tables (first install, or after a manual repair)."""
+    c.execute("DELETE FROM stat_counters")
+    for name, pred in USER_COUNTERS.items():
+        c.execute(f"INSERT INTO stat_counters (name, value) SELECT ?, COUNT(*) FROM users u WHERE {pred.format(r='u')}", (name,))
+    c.execute("INSERT INTO stat_counters (name, value) SELECT 'total_xp', IFNULL(SUM(xp), 0) FROM student_progress")
+    c.execute("INSERT INTO stat_counters (name, value) SELECT 'total_sessions', COUNT(*) FROM student_sessions")
+    c.execute('''INSERT INTO stat_counters (name, value)
+                 SELECT 'activity:' || day, COUNT(*) FROM activity_log WHERE day IS NOT NULL GROUP BY day''')
+
+def install_stat_counters(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stat_counters'").fetchone()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    c.execute(ACTIVITY_ARCHIVING_TABLE)
+    installed = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+    for name, body in STAT_TRIGGERS.items():
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    # A table rebuild drops its triggers, so recount whenever any had to be (re)created.
+    if not exists or not installed.issuperset(STAT_TRIGGERS):
+        rebuild_stat_counters(c)
+
+# ================= CASCADING FOREIGN KEYS =================
+# Every per-student table hangs off users with ON DELETE CASCADE, so deleting a student is one
+# DELETE FROM users and SQLite clears the rest. Each child column is the leading column of an
+# index, which keeps the cascade to an index lookup per table. Connections enable the pragma
+# in _configure_connection; init_db's own connection leaves it off so table rebuilds are safe.
+CASCADE_FOREIGN_KEYS = {
+    # child table: (child column, users column)
+    "student_progress": ("user_id_code", "user_id_code"),
+    "activity_log":     ("user_id_code", "user_id_code"),
+    "student_badges":   ("user_id_code", "user_id_code"),
+    "xp_event_seq":     ("user_id_code", "user_id_code"),
+    "student_sessions": ("student_id",   "id"),
+}
+
+def _with_cascade_foreign_key(table_sql, new_name, column, parent_column):
+    """Rewrite a CREATE TABLE statement under new_name with a cascading users foreign key."""
+    head, tail = table_sql[:table_sql.rindex(")")], table_sql[table_sql.rindex(")"):]
+    head = re.sub(rf",\s*FOREIGN KEY\s*\(\s*{column}\s*\)\s*REFERENCES\s+\"?users\"?\s*\([^)]*\)[^,]*",
+                  "", head, flags=re.I)
+    head = re.sub(r'^\s*CREATE TABLE\s+(IF NOT EXISTS\s+)?("?)\w+\2', f"CREATE TABLE {new_name}", head, flags=re.I)
+    return f"{head.rstrip()},\n    FOREIGN KEY ({column}) REFERENCES users ({parent_column}) ON DELETE CASCADE\n{tail}"
+
+def add_cascade_foreign_keys(c):
+    """Rebuild child tables created before their users foreign key cascaded.
+
+    SQLite can't alter a constraint, so each such table is copied into a new definition and
+    its indexes and triggers are replayed. Rows whose student no longer exists are dropped:
+    they are left over from deletes that missed a table, and would fail the new key."""
+    for table, (column, parent_column) in CASCADE_FOREIGN_KEYS.items():
+        fks = c.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+        if any(fk[2] == "users" and fk[3] == column and fk[6] == "CASCADE" for fk in fks):
+            continue
+        table_sql = c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+        dependents = [r[0] for r in c.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name=? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+            (table,))]
+        columns = ", ".join(r[1] for r in c.execute(f"PRAGMA table_xinfo({table})") if r[6] == 0)
+        orphans = c.execute(f'''
+            DELETE FROM {table} WHERE {column} IS NOT NULL
+              AND {column} NOT IN (SELECT {parent_column} FROM users WHERE {parent_column} IS NOT NULL)
+        ''').rowcount
+        c.execute(_with_cascade_foreign_key(table_sql, f"{table}_fk", column, parent_column))
+        c.execute(f"INSERT INTO {table}_fk ({columns}) SELECT {columns} FROM {table}")
+        c.execute(f"DROP TABLE {table}")
+        c.execute(f"ALTER TABLE {table}_fk RENAME TO {table}")
+        for sql in dependents:
+            c.execute(sql)
+        print(f"Migration: {table} now cascades from users ({orphans} orphaned rows removed)")
+
+# ================= ACTIVITY ROLLUP =================
+# activity_daily_rollup holds one row per student, UTC day and mode with the aggregates the
+# analytics read (attempts, score sum, high/low counts, stars, XP). A trigger upserts it on
+# every activity_log insert, so it is current in the same transaction as the row itself.
+#
+# There is deliberately no DELETE trigger: archival removes raw rows but their days stay in
+# the rollup. Paths that erase history (progress reset) clear the rollup explicitly; deleting
+# a student cascades through the users foreign key.
+ACTIVITY_ROLLUP_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_activity_rollup AFTER INSERT ON activity_log
+    WHEN NEW.day IS NOT NULL BEGIN
+        INSERT INTO activity_daily_rollup
+            (user_id_code, day, mode, attempts, score_sum, high_count, low_count, stars, xp)
+        VALUES (NEW.user_id_code, NEW.day, NEW.mode, 1, COALESCE(NEW.score, 0),
+                COALESCE(NEW.score >= 80, 0), COALESCE(NEW.score < 60, 0),
+                COALESCE(NEW.stars_earned, 0), COALESCE(NEW.xp_earned, 0))
+        ON CONFLICT (user_id_code, day, mode) DO UPDATE SET
+            attempts   = attempts + 1,
+            score_sum  = score_sum + excluded.score_sum,
+            high_count = high_count + excluded.high_count,
+            low_count  = low_count + excluded.low_count,
+            stars      = stars + excluded.stars,
+            xp         = xp + excluded.xp;
+    END
+'''
+
+# student_mode_stats is the same idea collapsed over days: one row per student and mode with
+# lifetime totals, so the progress page reads a handful of rows however long the history is.
+ACTIVITY_MODE_STATS_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_activity_mode_stats AFTER INSERT ON activity_log BEGIN
+        INSERT INTO student_mode_stats
+            (user_id_code, mode, attempts, score_sum, high_count, low_count, stars)
+        VALUES (NEW.user_id_code, NEW.mode, 1, COALESCE(NEW.score, 0),
+                COALESCE(NEW.score >= 80, 0), COALESCE(NEW.score < 60, 0),
+                COALESCE(NEW.stars_earned, 0))
+        ON CONFLICT (user_id_code, mode) DO UPDATE SET
+            attempts   = attempts + 1,
+            score_sum  = score_sum + excluded.score_sum,
+            high_count = high_count + excluded.high_count,
+            low_count  = low_count + excluded.low_count,
+            stars      = stars + excluded.stars;
+    END
+'''
+
+def install_activity_rollup(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS activity_daily_rollup (
+            user_id_code TEXT NOT NULL,
+            day TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            high_count INTEGER NOT NULL DEFAULT 0,
+            low_count INTEGER NOT NULL DEFAULT 0,
+            stars INTEGER NOT NULL DEFAULT 0,
+            xp INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id_code, day, mode),
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    c.execute("DELETE FROM activity_daily_rollup")
+    c.execute('''
+        INSERT INTO activity_daily_rollup
+            (user_id_code, day, mode, attempts, score_sum, high_count, low_count, stars, xp)
+        SELECT user_id_code, day, mode, COUNT(*), COALESCE(SUM(score), 0),
+               SUM(COALESCE(score >= 80, 0)), SUM(COALESCE(score < 60, 0)),
+               COALESCE(SUM(stars_earned), 0), COALESCE(SUM(xp_earned), 0)
+        FROM activity_log
+        WHERE day IS NOT NULL AND user_id_code IN (SELECT user_id_code FROM users)
+        GROUP BY user_id_code, day, mode
+    ''')
+    c.execute(ACTIVITY_ROLLUP_TRIGGER)
+
+def install_mode_stats(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS student_mode_stats (
+            user_id_code TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            high_count INTEGER NOT NULL DEFAULT 0,
+            low_count INTEGER NOT NULL DEFAULT 0,
+            stars INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id_code, mode),
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    # From the rollup rather than activity_log, so archived history is counted too.
+    c.execute("DELETE FROM student_mode_stats")
+    c.execute('''
+        INSERT INTO student_mode_stats (user_id_code, mode, attempts, score_sum, high_count, low_count, stars)
+        SELECT user_id_code, mode, SUM(attempts), SUM(score_sum), SUM(high_count), SUM(low_count), SUM(stars)
+        FROM activity_daily_rollup
+        GROUP BY user_id_code, mode
+    ''')
+    c.execute(ACTIVITY_MODE_STATS_TRIGGER)
+
+# ================= STATE VERSIONS =================
+# student_progress.version changes whenever anything a student's own pages show changes: their
+# progress row (XP, badges, unlocks, streak, reset) or their activity history. The 'students'
+# row of state_versions changes with any student's progress, which covers the leaderboards.
+# Both only ever go up, so together with the day they make exact validators for /bootstrap.
+STATE_VERSION_TRIGGERS = {
+    "trg_progress_version": (
+        "AFTER UPDATE ON student_progress WHEN NEW.version = OLD.version BEGIN "
+        "UPDATE student_progress SET version = OLD.version + 1 WHERE user_id_code = NEW.user_id_code; "
+        "UPDATE state_versions SET value = value + 1 WHERE name='students'; END"
+    ),
+    "trg_progress_version_ins": "AFTER INSERT ON student_progress BEGIN "
+                                "UPDATE state_versions SET value = value + 1 WHERE name='students'; END",
+    "trg_progress_version_del": "AFTER DELETE ON student_progress BEGIN "
+                                "UPDATE state_versions SET value = value + 1 WHERE name='students'; END",
+    # Unlike the rollup, deletes count too: archival and resets change the recent/weak lists.
+    # Archival bumps each affected student once per batch itself (see STAT COUNTERS).
+    "trg_activity_version_ins": "AFTER INSERT ON activity_log BEGIN "
+                                "UPDATE student_progress SET version = version + 1 WHERE user_id_code = NEW.user_id_code; END",
+    "trg_activity_version_del": f"AFTER DELETE ON activity_log WHEN {NOT_ARCHIVING} BEGIN "
+                                "UPDATE student_progress SET version = version + 1 WHERE user_id_code = OLD.user_id_code; END",
+}
+
+def install_state_versions(c):
+    if not col_exists(c, 'student_progress', 'version'):
+        c.execute('ALTER TABLE student_progress ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS state_versions (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    c.execute("INSERT OR IGNORE INTO state_versions (name, value) VALUES ('students', 0)")
+    for name, body in STATE_VERSION_TRIGGERS.items():
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+# ================= DATABASE SETUP =================
+DB_PATH = os.getenv("DB_PATH", "students.db")
+
+# Every student has a student_progress row. Signup writes it with the users row, login
+# recreates it if it is missing, and migration 7 backfilled older databases. The rank listing
+# and the leaderboards walk student_progress, so a student without one would never be listed.
+MISSING_PROGRESS_ROWS_SQL = '''
+    INSERT INTO student_progress
+        (user_id_code, roll_no, class_name, division, xp, conversation_xp, roleplay_xp,
+         repeat_xp, spellbee_xp, meanings_xp, wordpuzzle_xp, grammar_xp,
+         total_stars, streak, total_sessions)
+    SELECT u.user_id_code, u.roll_no, u.class_name, u.division, 0,0,0,0,0,0,0,0,0,0,0
+    FROM users u
+    WHERE u.role='student' AND u.user_id_code IS NOT NULL AND {where}
+      AND NOT EXISTS (SELECT 1 FROM student_progress sp WHERE sp.user_id_code=u.user_id_code)
+'''
+
+def add_missing_progress_rows(c, user_id_code=None):
+    if user_id_code:
+        c.execute(MISSING_PROGRESS_ROWS_SQL.format(where="u.user_id_code=?"), (user_id_code,))
+    else:
+        c.execute(MISSING_PROGRESS_ROWS_SQL.format(where="1=1"))
+
+# ================= STUDENT SHARDS =================
+# Optional. With SHARD_BY=class, each class's students are created in their own database file
+# under SHARD_DIR: the users row and everything hanging off it (progress, activity, badges,
+# sessions, rollups, counters), so foreign keys and triggers never cross files. Each file has
+# its own write lock, so a busy class no longer queues every other class's writes.
+#
+# DB_PATH stays the global database: teachers, the audit log, students created before
+# sharding was switched on, and shard_directory, which maps a student's id and User ID to
+# their shard. Ids are handed out by the directory so they stay unique across files.
+#
+# A class's shard is created the first time one of its students signs up (ensure_shard);
+# readers that walk every shard only visit the ones that exist (live_shards).
+#
+# Shard "" is always the global database, so with SHARD_BY unset everything below returns
+# the one connection it always did.
+SHARD_BY  = os.getenv("SHARD_BY", "").lower()
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")
+if SHARD_BY not in ("", "class"):
+    raise ValueError(f"SHARD_BY must be empty or 'class', not {SHARD_BY!r}")
+
+CLASS_SHARDS = VALID_CLASSES if SHARD_BY == "class" else []
+
+def shard_path(shard):
+    return os.path.join(SHARD_DIR, f"class_{shard}.db") if shard else DB_PATH
+
+def shard_for_class(class_name):
+    """Shard new students of this class are created in."""
+    return class_name if SHARD_BY == "class" and class_name in VALID_CLASSES else ""
+
+# ================= SCHEMA MIGRATIONS =================
+# Schema changes are numbered migrations, each applied exactly once per database and recorded
+# in schema_version. A warm start is a single SELECT. A worker that finds work pending takes
+# an exclusive lock, re-reads the version (another worker may have just finished) and applies
+# the rest in one transaction, so a failed step leaves the database as it was.
+#
+# Migrations 1-8 are the schema init_db used to converge on at every import. They keep their
+# existence checks because databases from before schema_version may have any of them already.
+# New changes append a version; never edit one that has shipped.
+DB_MIGRATION_TIMEOUT_SECS = float(os.getenv("DB_MIGRATION_TIMEOUT_SECS", 300))
+
+SCHEMA_MIGRATIONS = []
+
+def migration(version, name):
+    def register(fn):
+        SCHEMA_MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+def col_exists(c, table, col):
+    rows = c.execute(f"PRAGMA table_info({table})").fetchall()
+    return any(r[1] == col for r in rows)
+
+@migration(1, "base tables and legacy columns")
+def migrate_base_tables(c):
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -834,7 +1333,7 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             student_id INTEGER NOT NULL,
             login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES users (id)
+            FOREIGN KEY (student_id) REFERENCES users (id) ON DELETE CASCADE
         )
     ''')
 
@@ -857,7 +1356,9 @@ def init_db():
             total_sessions INTEGER DEFAULT 0,
             average_accuracy REAL DEFAULT 0,
             streak INTEGER DEFAULT 0,
-            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_active_day TEXT,
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
         )
     ''')
 
@@ -872,7 +1373,9 @@ def init_db():
             mode TEXT NOT NULL,
             score REAL,
             xp_earned INTEGER,
-            stars_earned INTEGER
+            stars_earned INTEGER,
+            day TEXT,
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
         )
     ''')
 
@@ -885,25 +1388,22 @@ def init_db():
             division TEXT,
             badge_id TEXT NOT NULL,
             earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id_code, badge_id)
+            UNIQUE(user_id_code, badge_id),
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
         )
     ''')
 
-    def col_exists(table, col):
-        rows = c.execute(f"PRAGMA table_info({table})").fetchall()
-        return any(r[1] == col for r in rows)
-
     for tbl in ['student_progress', 'activity_log', 'student_badges']:
-        if not col_exists(tbl, 'user_id_code'):
+        if not col_exists(c, tbl, 'user_id_code'):
             c.execute(f'ALTER TABLE {tbl} ADD COLUMN user_id_code TEXT')
 
     for tbl in ['users', 'student_progress', 'activity_log', 'student_badges']:
-        if not col_exists(tbl, 'class_name'):
+        if not col_exists(c, tbl, 'class_name'):
             c.execute(f'ALTER TABLE {tbl} ADD COLUMN class_name TEXT')
-        if not col_exists(tbl, 'division'):
+        if not col_exists(c, tbl, 'division'):
             c.execute(f'ALTER TABLE {tbl} ADD COLUMN division TEXT')
 
-    if not col_exists('users', 'user_id_code'):
+    if not col_exists(c, 'users', 'user_id_code'):
         c.execute('ALTER TABLE users ADD COLUMN user_id_code TEXT')
         existing_students = c.execute(
             "SELECT id, roll_no FROM users WHERE role='student' AND (user_id_code IS NULL OR user_id_code='')"
@@ -926,26 +1426,26 @@ def init_db():
         ('approved_by', 'TEXT'),
         ('approved_at', 'TIMESTAMP'),
     ]:
-        if not col_exists('users', col):
+        if not col_exists(c, 'users', col):
             c.execute(f'ALTER TABLE users ADD COLUMN {col} {definition}')
 
     c.execute("UPDATE users SET is_approved=1 WHERE role='student' AND (is_approved IS NULL OR is_approved=0)")
     c.execute("UPDATE users SET is_approved=1 WHERE role='teacher' AND (is_approved IS NULL OR is_approved=0)")
 
-    if not col_exists('student_progress', 'conversation_xp'):
+    if not col_exists(c, 'student_progress', 'conversation_xp'):
         c.execute('ALTER TABLE student_progress ADD COLUMN conversation_xp INTEGER DEFAULT 0')
         c.execute('ALTER TABLE student_progress ADD COLUMN roleplay_xp INTEGER DEFAULT 0')
         c.execute('ALTER TABLE student_progress ADD COLUMN repeat_xp INTEGER DEFAULT 0')
         c.execute('ALTER TABLE student_progress ADD COLUMN spellbee_xp INTEGER DEFAULT 0')
         c.execute('ALTER TABLE student_progress ADD COLUMN meanings_xp INTEGER DEFAULT 0')
 
-    if not col_exists('student_progress', 'wordpuzzle_xp'):
+    if not col_exists(c, 'student_progress', 'wordpuzzle_xp'):
         c.execute('ALTER TABLE student_progress ADD COLUMN wordpuzzle_xp INTEGER DEFAULT 0')
-    if not col_exists('student_progress', 'grammar_xp'):
+    if not col_exists(c, 'student_progress', 'grammar_xp'):
         c.execute('ALTER TABLE student_progress ADD COLUMN grammar_xp INTEGER DEFAULT 0')
-    if not col_exists('student_progress', 'streak'):
+    if not col_exists(c, 'student_progress', 'streak'):
         c.execute('ALTER TABLE student_progress ADD COLUMN streak INTEGER DEFAULT 0')
-    if not col_exists('users', 'reset_token'):
+    if not col_exists(c, 'users', 'reset_token'):
         c.execute('ALTER TABLE users ADD COLUMN reset_token TEXT')
         c.execute('ALTER TABLE users ADD COLUMN reset_token_expiry TIMESTAMP')
 
@@ -1035,10 +1535,183 @@ def init_db():
     except Exception as e:
         print(f"Migration note: {e}")
 
-    conn.commit()
-    conn.close()
+@migration(2, "activity_log day column")
+def migrate_activity_day(c):
+    # Stored UTC day of each activity row. Filtering on date(date) can't use an index;
+    # filtering on day can.
+    if not col_exists(c, 'activity_log', 'day'):
+        c.execute('ALTER TABLE activity_log ADD COLUMN day TEXT')
+    c.execute("UPDATE activity_log SET day = date(date) WHERE day IS NULL")
+    c.execute('CREATE INDEX IF NOT EXISTS idx_activity_user_day ON activity_log(user_id_code, day, mode)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_activity_user_mode ON activity_log(user_id_code, mode, score, stars_earned)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_activity_day ON activity_log(day)')
+
+@migration(3, "leaderboard xp indexes")
+def migrate_leaderboard_indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_progress_xp ON student_progress(xp DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_progress_class_xp ON student_progress(class_name, xp DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_progress_class_div_xp ON student_progress(class_name, division, xp DESC)')
+
+@migration(4, "stored streak day")
+def migrate_streak_day(c):
+    if not col_exists(c, 'student_progress', 'last_active_day'):
+        c.execute('ALTER TABLE student_progress ADD COLUMN last_active_day TEXT')
+        backfill_streaks(c)
+
+@migration(5, "xp event sequence numbers")
+def migrate_xp_event_seq(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS xp_event_seq (
+            user_id_code TEXT NOT NULL,
+            client_id TEXT NOT NULL,
+            last_seq INTEGER NOT NULL,
+            PRIMARY KEY (user_id_code, client_id),
+            FOREIGN KEY (user_id_code) REFERENCES users (user_id_code) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+@migration(6, "stat counters")
+def migrate_stat_counters(c):
+    install_stat_counters(c)
+
+@migration(7, "student listing sort keys")
+def migrate_listing_sort_keys(c):
+    # Student listing sort keys (see STUDENT_SORTS). Virtual generated columns rather than
+    # expression indexes: SQLite only seeks a row-value cursor through plain index columns.
+    if not col_exists(c, 'users', 'class_num'):
+        c.execute('ALTER TABLE users ADD COLUMN class_num INTEGER GENERATED ALWAYS AS (CAST(class_name AS INTEGER)) VIRTUAL')
+    if not col_exists(c, 'student_progress', 'class_num'):
+        c.execute('ALTER TABLE student_progress ADD COLUMN class_num INTEGER GENERATED ALWAYS AS (CAST(class_name AS INTEGER)) VIRTUAL')
+    if not col_exists(c, 'student_progress', 'xp_rank'):
+        c.execute('ALTER TABLE student_progress ADD COLUMN xp_rank INTEGER GENERATED ALWAYS AS (-xp) VIRTUAL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_student_order ON users(role, class_num, division, name)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_progress_class_rank ON student_progress(class_num, division, xp_rank)')
+    add_missing_progress_rows(c)
+
+@migration(8, "cascading foreign keys")
+def migrate_cascading_foreign_keys(c):
+    add_cascade_foreign_keys(c)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_sessions_student ON student_sessions(student_id)')
+
+@migration(9, "activity daily rollup")
+def migrate_activity_rollup(c):
+    install_activity_rollup(c)
+    # Databases from before this step carry the unguarded activity delete trigger.
+    c.execute(ACTIVITY_ARCHIVING_TABLE)
+    c.execute("DROP TRIGGER IF EXISTS trg_activity_count_del")
+    c.execute(f"CREATE TRIGGER trg_activity_count_del {STAT_TRIGGERS['trg_activity_count_del']}")
+
+@migration(10, "per-mode student stats")
+def migrate_mode_stats(c):
+    install_mode_stats(c)
+    # Recent and weak sessions walk a student's rows newest first and stop at the LIMIT.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_activity_user_date ON activity_log(user_id_code, date)')
+
+@migration(11, "shard directory")
+def migrate_shard_directory(c):
+    # Only the global database's directory is ever filled; shards carry the empty table so
+    # every file has the same schema.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS shard_directory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id_code TEXT NOT NULL UNIQUE,
+            shard TEXT NOT NULL
+        )
+    ''')
+
+@migration(12, "badge bitmask")
+def migrate_badge_mask(c):
+    if not col_exists(c, 'student_progress', 'badge_mask'):
+        c.execute('ALTER TABLE student_progress ADD COLUMN badge_mask INTEGER NOT NULL DEFAULT 0')
+    for badge_id, bit in BADGE_BITS.items():
+        c.execute('''
+            UPDATE student_progress SET badge_mask = badge_mask | ?
+            WHERE user_id_code IN (SELECT user_id_code FROM student_badges WHERE badge_id = ?)
+        ''', (bit, badge_id))
+
+@migration(13, "stored feature unlocks")
+def migrate_unlock_mask(c):
+    if not col_exists(c, 'student_progress', 'unlock_mask'):
+        c.execute(f'ALTER TABLE student_progress ADD COLUMN unlock_mask INTEGER NOT NULL DEFAULT {UNLOCK_MASK_BASE}')
+    c.execute(f'UPDATE student_progress SET unlock_mask = {UNLOCK_MASK_SQL}')
+
+@migration(14, "state versions")
+def migrate_state_versions(c):
+    install_state_versions(c)
+
+def applied_schema_version(conn):
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+def init_db(path=DB_PATH):
+    latest = max(version for version, _, _ in SCHEMA_MIGRATIONS)
+    # Autocommit mode so BEGIN/COMMIT below are the only transaction boundaries. Foreign keys
+    # stay off here: table rebuilds must not cascade.
+    conn = sqlite3.connect(path, timeout=DB_MIGRATION_TIMEOUT_SECS, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if applied_schema_version(conn) >= latest:
+            return
+        conn.execute("BEGIN EXCLUSIVE")
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            current = applied_schema_version(conn)
+            for version, name, fn in sorted(SCHEMA_MIGRATIONS):
+                if version <= current:
+                    continue
+                started = time.perf_counter()
+                fn(conn)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                print(f"Migration {version} ({name}) applied to {path} in {time.perf_counter() - started:.2f}s")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+_ready_shards = {""}
+_shards_lock  = threading.Lock()
 
-init_db()
+def ensure_shard(shard):
+    """Create and migrate a class shard before its first student is written to it. A new shard
+    is built under a temporary name and linked into place, so no worker ever opens one that is
+    half migrated, and a worker that loses the race simply uses the winner's file."""
+    if shard in _ready_shards:
+        return
+    with _shards_lock:
+        if shard in _ready_shards:
+            return
+        path = shard_path(shard)
+        if not os.path.exists(path):
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                init_db(tmp)
+                try:
+                    os.link(tmp, path)
+                except FileExistsError:
+                    pass
+            finally:
+                os.remove(tmp)
+        init_db(path)
+        _ready_shards.add(shard)
+
+def live_shards():
+    """The global database and every class shard created so far, by any worker."""
+    return [""] + [s for s in CLASS_SHARDS if s in _ready_shards or os.path.exists(shard_path(s))]
+
+init_db(DB_PATH)
+for shard in live_shards()[1:]:
+    ensure_shard(shard)
 
 # ================= AUTHENTICATION HELPERS =================
 def login_required(f):
@@ -1073,26 +1746,546 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_db_connection():
-    conn = sqlite3.connect('students.db')
+# ================= DATABASE CONNECTIONS =================
+# One long-lived connection per thread. Callers keep their usual get/commit/close pattern:
+# close() is a no-op, so helpers called mid-request (calculate_streak, has_completed_daily,
+# log_admin_action) share the caller's connection instead of opening their own.
+#
+# WAL lets readers carry on while one worker writes; synchronous=NORMAL is durable across
+# app crashes in WAL mode and only risks the last commits on power loss.
+DB_JOURNAL_MODE     = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+DB_SYNCHRONOUS      = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_BUSY_TIMEOUT_MS  = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_BUSY_RETRIES     = int(os.getenv("DB_BUSY_RETRIES", 3))
+DB_CHECKPOINT_SECS  = int(os.getenv("DB_CHECKPOINT_SECS", 300))
+DB_WAL_LIMIT_BYTES  = 64 * 1024 * 1024
+
+_db_local = threading.local()
+
+class PooledConnection(sqlite3.Connection):
+    def close(self):
+        pass
+
+    def really_close(self):
+        super().close()
+
+def _configure_connection(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA journal_size_limit = {DB_WAL_LIMIT_BYTES}")
+    conn.execute("PRAGMA cache_size = -8000")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+def _thread_connections():
+    conns = getattr(_db_local, "conns", None)
+    if conns is None:
+        conns = _db_local.conns = {}
+    return conns
+
+def get_db_connection(shard=""):
+    conns = _thread_connections()
+    conn = conns.get(shard)
+    if conn is None:
+        conn = sqlite3.connect(shard_path(shard), timeout=DB_BUSY_TIMEOUT_MS / 1000, factory=PooledConnection)
+        _configure_connection(conn)
+        conns[shard] = conn
+    return conn
+
+def close_db_connection():
+    """Really close this thread's connections (worker shutdown, tools)."""
+    conns = _thread_connections()
+    while conns:
+        _, conn = conns.popitem()
+        conn.really_close()
+    close_read_connections()
+
+def lookup_shard(user_id_code=None, student_id=None):
+    """Shard holding a student, by User ID or users.id. Students the directory doesn't know
+    (everyone, when sharding is off) are in the global database."""
+    if not SHARD_BY:
+        return ""
+    # The logged-in student's own requests skip the directory.
+    if has_request_context() and user_id_code and session.get('user_id_code') == user_id_code \
+            and 'shard' in session:
+        return session['shard']
+    column, value = ("user_id_code", user_id_code) if user_id_code else ("id", student_id)
+    row = get_db_connection().execute(
+        f"SELECT shard FROM shard_directory WHERE {column}=?", (value,)
+    ).fetchone()
+    return row["shard"] if row else ""
+
+def student_connection(user_id_code=None, student_id=None):
+    return get_db_connection(lookup_shard(user_id_code, student_id))
+
+def student_connections(class_name=None, snapshot=False):
+    """Connections to every database that can hold students of class_name (or of any class).
+    With snapshot, reporting connections from get_read_connection instead."""
+    shards = live_shards()
+    if class_name and shard_for_class(class_name):
+        shards = [shard for shard in ("", shard_for_class(class_name)) if shard in shards]
+    connect = get_read_connection if snapshot else get_db_connection
+    return [connect(shard) for shard in shards]
+
+def register_student(conn, user_id_code, shard):
+    """Reserve a users.id for a new student in the global directory. Commits on conn (the
+    global connection) and returns the id, or None when sharding is off and users assigns it.
+
+    Ids continue past the global users table so they never collide with students created
+    there before sharding was switched on."""
+    if not shard:
+        return None
+    cur = conn.execute('''
+        INSERT INTO shard_directory (id, user_id_code, shard)
+        VALUES (MAX(IFNULL((SELECT MAX(id) FROM users), 0),
+                    IFNULL((SELECT seq FROM sqlite_sequence WHERE name='shard_directory'), 0)) + 1, ?, ?)
+    ''', (user_id_code, shard))
+    conn.commit()
+    return cur.lastrowid
+
+def forget_students(conn, user_id_codes):
+    """Drop deleted students from the directory; foreign keys can't reach it from a shard.
+    Joins the caller's transaction on conn (the global connection)."""
+    if SHARD_BY:
+        for batch, ids in in_batches(list(user_id_codes)):
+            conn.execute(f"DELETE FROM shard_directory WHERE user_id_code IN ({ids})", batch)
+
+def students_by_shard(student_ids):
+    """Group users.id values by the shard holding them."""
+    if not SHARD_BY:
+        return {"": list(student_ids)}
+    conn, grouped = get_db_connection(), defaultdict(list)
+    for batch, ids in in_batches(list(student_ids)):
+        for row in conn.execute(f"SELECT id, shard FROM shard_directory WHERE id IN ({ids})", batch):
+            grouped[row["shard"]].append(row["id"])
+    # Anything the directory doesn't know can only be a global student.
+    known = {sid for ids in grouped.values() for sid in ids}
+    grouped[""] += [sid for sid in student_ids if sid not in known]
+    return grouped
+
+def _is_busy_error(e):
+    msg = str(e).lower()
+    return "database is locked" in msg or "database is busy" in msg
+
+def retry_on_busy(f):
+    """Re-run a write path when SQLite stays busy past busy_timeout.
+
+    The failed attempt is rolled back first, so the wrapped function must do its DB writes
+    in one go (read, write, commit) and have no other side effects before committing.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        for attempt in range(DB_BUSY_RETRIES + 1):
+            try:
+                return f(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt == DB_BUSY_RETRIES:
+                    raise
+                for conn in _thread_connections().values():
+                    if conn.in_transaction:
+                        conn.rollback()
+                delay = 0.05 * (2 ** attempt) + random.uniform(0, 0.05)
+                logger.warning("%s: database busy, retry %d in %.2fs", f.__name__, attempt + 1, delay)
+                time.sleep(delay)
+    return decorated_function
+
+def begin_immediate_all(conns):
+    """BEGIN IMMEDIATE on each connection in turn (one per shard), retrying like retry_on_busy
+    while one stays busy. On return every write lock is held; when it gives up, none is held
+    and nothing has been written, so multi-shard writers take their locks with this instead
+    of being wrapped in retry_on_busy."""
+    for attempt in range(DB_BUSY_RETRIES + 1):
+        held = []
+        try:
+            for conn in conns:
+                conn.execute("BEGIN IMMEDIATE")
+                held.append(conn)
+            return
+        except sqlite3.OperationalError as e:
+            for conn in held:
+                conn.rollback()
+            if not _is_busy_error(e) or attempt == DB_BUSY_RETRIES:
+                raise
+            delay = 0.05 * (2 ** attempt) + random.uniform(0, 0.05)
+            logger.warning("Taking shard write locks: database busy, retry %d in %.2fs", attempt + 1, delay)
+            time.sleep(delay)
+
+def checkpoint_wal():
+    """Fold the WAL back into the main file without blocking readers or writers."""
+    if DB_JOURNAL_MODE != "WAL":
+        return
+    try:
+        for shard in live_shards():
+            busy, log_frames, checkpointed = get_db_connection(shard).execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            if busy or checkpointed < log_frames:
+                logger.info("WAL checkpoint partial on %s: %d/%d frames", shard_path(shard), checkpointed, log_frames)
+    except sqlite3.Error as e:
+        logger.warning("WAL checkpoint failed: %s", e)
+    finally:
+        close_db_connection()
+
+def schedule_wal_checkpoint():
+    checkpoint_wal()
+    t = threading.Timer(DB_CHECKPOINT_SECS, schedule_wal_checkpoint)
+    t.daemon = True
+    t.start()
+
+@app.teardown_request
+def release_db_connection(exc):
+    # A handler that returned early or raised must not leave its writes pending on the
+    # shared connection for the next request.
+    for conn in _thread_connections().values():
+        if conn.in_transaction:
+            conn.rollback()
+
+# ================= READ SNAPSHOTS =================
+# Teacher and admin reporting (student listings, the admin top students) reads from a
+# copy of each database refreshed every READ_SNAPSHOT_SECS, so its joins and scans never hold
+# pages or locks that a student's /update_xp wants during class.
+#
+# A refresh is one online-backup step into a temp file, switched to a plain rollback-journal
+# database and renamed over the old snapshot. In WAL mode the backup is an ordinary read
+# transaction, so writers carry on while it runs. Readers open the snapshot immutable (no
+# locking at all) and notice a rename by its inode. A snapshot older than
+# READ_SNAPSHOT_MAX_AGE_SECS (refreshes failing) is ignored and reads go to the live database,
+# which is also where they go with READ_SNAPSHOT_SECS=0.
+READ_SNAPSHOT_SECS         = int(os.getenv("READ_SNAPSHOT_SECS", 60))
+READ_SNAPSHOT_MAX_AGE_SECS = int(os.getenv("READ_SNAPSHOT_MAX_AGE_SECS", 3 * READ_SNAPSHOT_SECS))
+
+_snapshot_local = threading.local()
+
+def snapshot_path(shard=""):
+    return os.path.splitext(shard_path(shard))[0] + ".snapshot.db"
+
+def _snapshot_connections():
+    conns = getattr(_snapshot_local, "conns", None)
+    if conns is None:
+        conns = _snapshot_local.conns = {}
+    return conns
+
+def get_read_connection(shard=""):
+    """Connection for reporting reads: the shard's snapshot while it is fresh, else live."""
+    if READ_SNAPSHOT_SECS <= 0:
+        return get_db_connection(shard)
+    path = snapshot_path(shard)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return get_db_connection(shard)
+    if time.time() - st.st_mtime > READ_SNAPSHOT_MAX_AGE_SECS:
+        return get_db_connection(shard)
+    conns  = _snapshot_connections()
+    cached = conns.get(shard)
+    if cached and cached[1] == st.st_ino:
+        return cached[0]
+    if cached:
+        cached[0].really_close()
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?immutable=1", uri=True, factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    conns[shard] = (conn, st.st_ino)
     return conn
 
-def log_admin_action(action, target_type=None, target_id=None, target_name=None, details=None):
+def close_read_connections():
+    conns = _snapshot_connections()
+    while conns:
+        _, (conn, _) = conns.popitem()
+        conn.really_close()
+
+def refresh_read_snapshot(shard=""):
+    path = snapshot_path(shard)
+    try:
+        # Every worker runs this job; skip the copy another one has just made.
+        if time.time() - os.stat(path).st_mtime < READ_SNAPSHOT_SECS / 2:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = f"{path}.{os.getpid()}.tmp"
+    src = sqlite3.connect(shard_path(shard), timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    try:
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst)
+            dst.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dst.close()
+        os.replace(tmp, path)
+    finally:
+        src.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return True
+
+def refresh_read_snapshots():
+    for shard in live_shards():
+        started = time.perf_counter()
+        try:
+            if refresh_read_snapshot(shard):
+                logger.info("Read snapshot of %s refreshed in %.2fs", shard_path(shard), time.perf_counter() - started)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("Read snapshot of %s failed: %s", shard_path(shard), e)
+
+def schedule_read_snapshots():
+    refresh_read_snapshots()
+    t = threading.Timer(READ_SNAPSHOT_SECS, schedule_read_snapshots)
+    t.daemon = True
+    t.start()
+
+# ================= ACTIVITY WRITE-BEHIND =================
+# Optional. When enabled, practice activity rows are buffered per worker and group-committed by
+# a background thread instead of being written inside every /update_xp transaction. XP, badges
+# and streaks still commit synchronously; only the activity history is deferred.
+#
+# Durability bound: a buffered row is committed within ACTIVITY_FLUSH_SECS (sooner once
+# ACTIVITY_FLUSH_ROWS are pending), and the buffer is drained at exit. A hard crash of the
+# worker loses at most that window of history.
+#
+# The buffer is per worker. Readers of a student's activity, and the paths that delete it, call
+# flush_pending_activity(uid) first, but that only drains this worker's buffer: a student sees
+# their own answers at once when the read lands on the worker that took the write, and within
+# ACTIVITY_FLUSH_SECS otherwise. Rows another worker still holds for a deleted student fail the
+# users foreign key when that worker flushes, and are dropped there.
+ACTIVITY_WRITE_BEHIND = os.getenv("ACTIVITY_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+ACTIVITY_FLUSH_SECS   = float(os.getenv("ACTIVITY_FLUSH_SECS", 1.0))
+ACTIVITY_FLUSH_ROWS   = int(os.getenv("ACTIVITY_FLUSH_ROWS", 200))
+
+ACTIVITY_INSERT_SQL = (
+    "INSERT INTO activity_log (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned, date, day) "
+    "VALUES (?,?,?,?,?,?,?,?,?,?)"
+)
+
+class ActivityWriteBehind:
+    def __init__(self, flush_secs, flush_rows):
+        self.flush_secs = flush_secs
+        self.flush_rows = flush_rows
+        self.lock       = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake       = threading.Event()
+        self.rows       = []
+        self.pending    = defaultdict(int)
+        self.thread     = None
+
+    def add(self, rows):
+        """Queue (user_id_code, roll_no, class_name, division, mode, score, xp, stars) tuples."""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            # The flusher starts with the first row rather than at import, so it is created in
+            # the worker process that serves requests.
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="activity-write-behind", daemon=True)
+                self.thread.start()
+            for row in rows:
+                self.rows.append((*row, now, now[:10]))
+                self.pending[row[0]] += 1
+            if len(self.rows) >= self.flush_rows:
+                self.wake.set()
+
+    def has_pending(self, user_id_code=None):
+        with self.lock:
+            return bool(self.pending.get(user_id_code) if user_id_code else self.rows)
+
+    def flush(self):
+        # flush_lock makes a reader wait for an in-flight flush, so "nothing pending" really
+        # means "committed".
+        with self.flush_lock:
+            with self.lock:
+                rows, self.rows = self.rows, []
+            if not rows:
+                return
+            by_shard = defaultdict(list)
+            for row in rows:
+                by_shard[lookup_shard(row[0])].append(row)
+            committed, failed = [], []
+            for shard, shard_rows in by_shard.items():
+                conn = get_db_connection(shard)
+                try:
+                    try:
+                        conn.executemany(ACTIVITY_INSERT_SQL, shard_rows)
+                    except sqlite3.IntegrityError:
+                        # A student deleted while their rows sat here fails the users foreign key.
+                        conn.rollback()
+                        live = {uid for uid in {row[0] for row in shard_rows}
+                                if conn.execute("SELECT 1 FROM users WHERE user_id_code=?", (uid,)).fetchone()}
+                        conn.executemany(ACTIVITY_INSERT_SQL, [row for row in shard_rows if row[0] in live])
+                    conn.commit()
+                    committed += shard_rows
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    logger.error("Activity flush of %d rows failed, will retry: %s", len(shard_rows), e)
+                    failed += shard_rows
+            with self.lock:
+                self.rows[:0] = failed
+                for row in committed:
+                    self.pending[row[0]] -= 1
+                    if self.pending[row[0]] <= 0:
+                        del self.pending[row[0]]
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_secs)
+            self.wake.clear()
+            self.flush()
+
+activity_buffer = ActivityWriteBehind(ACTIVITY_FLUSH_SECS, ACTIVITY_FLUSH_ROWS) if ACTIVITY_WRITE_BEHIND else None
+
+def flush_pending_activity(user_id_code=None):
+    """Commit buffered activity (for one student, or everyone) before reading or deleting it."""
+    if activity_buffer and activity_buffer.has_pending(user_id_code):
+        activity_buffer.flush()
+
+if activity_buffer:
+    atexit.register(activity_buffer.flush)
+
+# ================= ACTIVITY ARCHIVE =================
+# Raw activity rows older than ACTIVITY_RETENTION_DAYS move to a separate archive database, so
+# activity_log (and every query that still reads raw rows: recent sessions, weak sessions, the
+# teacher's activity list) stays proportional to the retention window. Their aggregates stay
+# behind in activity_daily_rollup.
+#
+# Each batch is copied with INSERT OR IGNORE keyed on the original id before it is deleted,
+# so a crash between the two commits leaves a duplicate attempt, never a lost row; the next
+# run finishes the job. Every worker runs the job; concurrent runs are harmless for the
+# same reason. Each student shard archives to its own file next to it, since activity ids
+# are only unique within one database.
+ACTIVITY_ARCHIVE_PATH   = os.getenv("ACTIVITY_ARCHIVE_PATH", "archive.db")
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", 180))
+ACTIVITY_ARCHIVE_SECS   = int(os.getenv("ACTIVITY_ARCHIVE_SECS", 6 * 3600))
+ACTIVITY_ARCHIVE_BATCH  = 2000
+
+ARCHIVE_COLUMNS = "id, user_id_code, roll_no, class_name, division, date, mode, score, xp_earned, stars_earned, day"
+
+def archive_path(shard=""):
+    return os.path.join(SHARD_DIR, f"class_{shard}.archive.db") if shard else ACTIVITY_ARCHIVE_PATH
+
+def _archive_connection(shard=""):
+    conn = sqlite3.connect(archive_path(shard), timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY,
+            user_id_code TEXT,
+            roll_no TEXT,
+            class_name TEXT,
+            division TEXT,
+            date TIMESTAMP,
+            mode TEXT,
+            score REAL,
+            xp_earned INTEGER,
+            stars_earned INTEGER,
+            day TEXT,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_user_day ON activity_log(user_id_code, day)')
+    conn.commit()
+    return conn
+
+def archive_activity():
+    """Move raw activity rows past the retention window into the archive databases."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=ACTIVITY_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    try:
+        moved = sum(_archive_shard_activity(shard, cutoff) for shard in live_shards())
+    finally:
+        close_db_connection()
+    if moved:
+        logger.info("Archived %d activity rows older than %s", moved, cutoff)
+    return moved
+
+def _archive_shard_activity(shard, cutoff):
+    conn  = get_db_connection(shard)
+    moved = 0
+    try:
+        archive = _archive_connection(shard)
+        try:
+            while True:
+                rows = conn.execute(
+                    f"SELECT {ARCHIVE_COLUMNS} FROM activity_log WHERE day < ? LIMIT ?",
+                    (cutoff, ACTIVITY_ARCHIVE_BATCH)
+                ).fetchall()
+                if not rows:
+                    break
+                archive.executemany(
+                    f"INSERT OR IGNORE INTO activity_log ({ARCHIVE_COLUMNS}) VALUES ({','.join('?' * 11)})",
+                    [tuple(r) for r in rows]
+                )
+                archive.commit()
+                moved += _delete_archived_rows(conn, [r["id"] for r in rows])
+        finally:
+            archive.close()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.warning("Activity archival of %s stopped after %d rows: %s", shard_path(shard), moved, e)
+    return moved
+
+def _delete_archived_rows(conn, ids):
+    """Delete one archived batch, with the counter and version updates its triggers would have
+    made row by row done once per day and student. Counts only rows this run actually deleted,
+    so a concurrent run can't subtract them twice."""
+    conn.execute("INSERT INTO activity_archiving (active) VALUES (1)")
+    deleted = []
+    for batch, marks in in_batches(ids):
+        deleted += conn.execute(
+            f"DELETE FROM activity_log WHERE id IN ({marks}) RETURNING user_id_code, day", batch
+        ).fetchall()
+    per_day = defaultdict(int)
+    for row in deleted:
+        if row["day"] is not None:
+            per_day[row["day"]] += 1
+    conn.executemany("UPDATE stat_counters SET value = value - ? WHERE name = 'activity:' || ?",
+                     [(n, day) for day, n in per_day.items()])
+    conn.executemany("UPDATE student_progress SET version = version + 1 WHERE user_id_code = ?",
+                     [(uid,) for uid in {row["user_id_code"] for row in deleted}])
+    conn.execute("DELETE FROM activity_archiving")
+    conn.commit()
+    return len(deleted)
+
+def purge_archived_activity(user_id_codes, shard=""):
+    """Archived rows sit outside the users foreign key; erase them explicitly."""
+    if not user_id_codes or not os.path.exists(archive_path(shard)):
+        return
+    archive = _archive_connection(shard)
+    try:
+        for batch, ids in in_batches(list(user_id_codes)):
+            archive.execute(f"DELETE FROM activity_log WHERE user_id_code IN ({ids})", batch)
+        archive.commit()
+    except sqlite3.Error as e:
+        logger.warning("Purging archived activity failed: %s", e)
+    finally:
+        archive.close()
+
+def schedule_activity_archive():
+    archive_activity()
+    t = threading.Timer(ACTIVITY_ARCHIVE_SECS, schedule_activity_archive)
+    t.daemon = True
+    t.start()
+
+AUDIT_INSERT_SQL = '''INSERT INTO admin_audit_log
+           (admin_username, action, target_type, target_id, target_name, details)
+           VALUES (?,?,?,?,?,?)'''
+
+def log_admin_action(action, target_type=None, target_id=None, target_name=None, details=None, conn=None):
+    log_admin_actions([(action, target_type, target_id, target_name, details)], conn=conn)
+
+def log_admin_actions(entries, conn=None):
+    """Audit (action, target_type, target_id, target_name, details) entries in one executemany.
+
+    With conn, the rows join the caller's open transaction and the caller commits."""
     admin_username = session.get('admin_username', 'admin')
+    rows = [(admin_username, action, target_type, str(target_id) if target_id else None, target_name, details)
+            for action, target_type, target_id, target_name, details in entries]
+    if conn is not None:
+        conn.executemany(AUDIT_INSERT_SQL, rows)
+        return
     conn = get_db_connection()
-    conn.execute(
-        '''INSERT INTO admin_audit_log
-           (admin_username, action, target_type, target_id, target_name, details)
-           VALUES (?,?,?,?,?,?)''',
-        (admin_username, action, target_type, str(target_id) if target_id else None,
-         target_name, details)
-    )
+    conn.executemany(AUDIT_INSERT_SQL, rows)
     conn.commit()
     conn.close()
 
 # ================= TTS =================
 def speak_to_file(text, slow=False, max_retries=3):
+    if DISABLE_TTS:
+        return None
     if len(text) > 300:
         text = text[:300]
     cached_audio = get_cached_audio(text, slow)
@@ -1423,85 +2616,28 @@ def roleplay_coach(child_text, roleplay_type, *, model="llama-3.1-8b-instant",
     return response
 
 # ================= REPEAT AFTER ME =================
+def repeat_corpus(category, difficulty):
+    """Resolve (category, difficulty) with the usual fallbacks; returns (bag_key, items)."""
+    corpus = current_content().repeat
+    if (category, "easy") not in corpus:
+        category = "civic_sense"
+    if (category, difficulty) not in corpus:
+        difficulty = "easy"
+    return f"repeat:{category}:{difficulty}", corpus[(category, difficulty)]
+
+def spell_corpus(difficulty):
+    corpus = current_content().spell
+    if difficulty not in corpus:
+        difficulty = "easy"
+    return f"spell:{difficulty}", corpus[difficulty]
+
 def generate_repeat_sentence(category="civic_sense", difficulty="easy"):
-    category_details = {
-        "civic_sense": {
-            "easy": ["Keep your city clean","Do not litter on roads","Help old people cross","Wait for your turn please","Say thank you always","Be kind to others","Do not waste water","Turn off lights please","Respect your neighbours always","Use dustbin for waste"],
-            "medium": ["We should not throw waste on the road","Always stand in a queue patiently","Help keep our neighbourhood clean and tidy","Switch off fans when leaving the room","We must respect traffic rules always","Plant trees to keep our earth green","Save water for the future generations","Be polite and greet everyone around you","Do not make noise in public places","Always use the zebra crossing safely"],
-            "hard": ["We should always keep our surroundings clean and free from litter","Respecting public property is the duty of every good citizen","Saving electricity and water helps protect our environment for the future","Every citizen must follow traffic rules to keep roads safe for all","Being kind and helpful to others makes our community a better place"]
-        },
-        "animals": {
-            "easy": ["Dogs bark loudly","Cats drink milk","Birds sing songs","Fish swim fast","Cows eat grass","Horses run quick","Ducks say quack","Lions roar loud","Bears sleep long","Monkeys climb trees"],
-            "medium": ["The brown dog plays with a ball","My pet cat sleeps on the sofa","Colorful birds fly in the sky","Little fish swim in the pond","The white rabbit hops around happily","Elephants have very long trunks","Tigers are big striped cats","Dolphins jump in the ocean"],
-            "hard": ["The big elephant uses its trunk to drink water every day","My pet dog loves to chase butterflies in the garden","The clever monkey climbs trees very quickly and easily","Beautiful peacocks spread their colorful feathers when dancing","Tiny hummingbirds can fly backwards and hover in the air"]
-        },
-        "food": {
-            "easy": ["I eat apples","Pizza tastes good","Milk is white","Bread is soft","Ice cream melts","Cookies are sweet","Juice is cold","Cake is yummy","Soup is hot","Eggs are round"],
-            "medium": ["I enjoy eating chocolate ice cream","Fresh vegetables are good for health","Mom makes delicious pasta for lunch","Orange juice is my favorite drink","Hot soup warms me up quickly","Strawberries taste sweet and juicy","I love eating crunchy potato chips","Sandwiches are perfect for picnics"],
-            "hard": ["My grandmother makes the most delicious cookies in the whole world","We should eat healthy fruits and vegetables every single day","The restaurant serves fresh and tasty food to all customers","Drinking water keeps our body healthy and strong always","Breakfast is the most important meal of the entire day"]
-        },
-        "sports": {
-            "easy": ["I play football","Run very fast","Jump rope daily","Swim in pool","Kick the ball","Throw the ball","Catch it quick","Hit the target","Race with friends","Climb the rope"],
-            "medium": ["I practice basketball every single day","Running in the park is fun","My friends play cricket together happily","Swimming keeps us healthy and fit","The team won the match yesterday","Soccer is played with feet","Tennis players use special rackets always","Cycling helps build strong muscles"],
-            "hard": ["Playing outdoor games helps us stay healthy and active always","My favorite sport is basketball because it's exciting and fun","The athletes train very hard to win the championship trophy","Regular exercise makes our bodies stronger and more energetic daily","Teamwork is very important when playing any sport together"]
-        },
-        "feelings": {
-            "easy": ["I feel happy","Mom is sad","Brother is angry","Sister feels tired","I am excited","Dad is proud","I feel scared","She is brave","He seems worried","We are cheerful"],
-            "medium": ["I feel very happy when playing","My friend is feeling sad today","The movie made everyone laugh loudly","I get excited about birthday parties","Helping others makes me feel good","Sometimes I feel nervous before tests","My sister feels proud of her artwork","The surprise made him very happy"],
-            "hard": ["When I help my friends I feel very proud and happy","My little sister gets scared during thunderstorms at night","Winning the competition made the entire team feel wonderful","Sharing toys with others shows that we care about them","Being kind to everyone makes the world a better place"]
-        },
-        "colors": {
-            "easy": ["Sky is blue","Grass is green","Sun is yellow","Roses are red","Clouds are white","Night is black","Orange is bright","Purple flowers bloom","Pink is pretty","Brown dirt falls"],
-            "medium": ["The beautiful rainbow has many colors","My favorite color is bright blue","Red roses bloom in the garden","The green leaves look very fresh","Yellow butterflies fly near flowers happily","White snow covers the ground","Orange pumpkins grow in the field","Purple grapes taste very sweet"],
-            "hard": ["The colorful painting has red blue yellow and green colors","My room walls are painted in light blue color","The sunset sky shows beautiful orange and pink shades","Rainbows appear when sunlight passes through water droplets magically","Artists mix different colors together to create new beautiful shades"]
-        },
-        "family": {
-            "easy": ["I love mom","Dad helps me","Sister is kind","Brother plays games","Grandma tells stories","Grandpa is funny","Baby cries loud","Uncle visits us","Aunt bakes cake","Cousin is fun"],
-            "medium": ["My mother cooks delicious food daily","Dad takes me to school everyday","My sister helps with homework always","Brother plays video games with me","Grandparents visit us every weekend regularly","My aunt makes tasty cookies","Uncle tells us funny jokes","Cousins play together at parties"],
-            "hard": ["My entire family goes on vacation together every summer season","Mom and dad work very hard to give us everything","I love spending quality time with all my family members","Grandparents always share interesting stories from their childhood days","Family dinners are special times when everyone talks and laughs"]
-        },
-        "school": {
-            "easy": ["I go school","Teacher is nice","Books are heavy","Math is hard","I study daily","Tests are scary","Lunch is yummy","Friends play together","Pencils write words","Classes start early"],
-            "medium": ["My teacher explains lessons very clearly","I carry my school bag everyday","Math homework is quite challenging today","The library has many interesting books","Science class is really fun and exciting","Friends help each other with studies","Reading improves our vocabulary and knowledge","Art class lets us be creative"],
-            "hard": ["My school has a big playground where we play games","Every morning I wake up early to catch the bus","The teacher gives us homework to practice at home daily","Learning new things at school makes us smarter every day","Good students always pay attention and complete their work on time"]
-        }
-    }
-    cat_info = category_details.get(category, category_details["civic_sense"])
-    examples = cat_info.get(difficulty, cat_info["easy"])
-    recent = get_session_recent_sentences()
-    available = [ex for ex in examples if ex not in recent]
-    if not available:
-        recent = recent[-5:] if len(recent) > 5 else []
-        available = [ex for ex in examples if ex not in recent]
-    if not available:
-        available = examples
-    selected = random.choice(available)
-    recent.append(selected)
-    if len(recent) > MAX_HISTORY:
-        recent = recent[-MAX_HISTORY:]
-    set_session_recent_sentences(recent)
-    return selected
+    item, _ = draw_item(*repeat_corpus(category, difficulty))
+    return item.text
 
 def generate_spell_word(difficulty="easy"):
-    word_pools = {
-        "easy": ["cat","dog","sun","run","fun","hat","bat","rat","pen","hen","cup","bus","bed","red","leg","bag","fan","can","ten","net","wet","jet","pet","set","box","fox","six","mix","pig","big","hot","pot","top","hop","mop","zip","tip","dip","cut","nut"],
-        "medium": ["apple","table","happy","money","water","tiger","banana","flower","garden","winter","summer","mother","father","sister","better","letter","number","dinner","butter","purple","yellow","orange","Monday","Friday","Sunday","pencil","window","rabbit","market","simple","castle","people","circle","middle","bottle","little","bubble","double","jungle","candle","handle","puzzle","turtle"],
-        "hard": ["beautiful","wonderful","elephant","tomorrow","yesterday","chocolate","hamburger","basketball","butterfly","strawberry","restaurant","dictionary","adventure","delicious","important","different","incredible","vegetables","understand","comfortable","celebration","imagination","encyclopedia","refrigerator","spectacular","communication","responsibility","extraordinary","accomplishment"]
-    }
-    words = word_pools.get(difficulty, word_pools["easy"])
-    recent = get_session_recent_words()
-    available = [w for w in words if w not in recent]
-    if not available:
-        recent = recent[-10:] if len(recent) > 10 else []
-        available = [w for w in words if w not in recent]
-    if not available:
-        available = words
-    selected = random.choice(available)
-    recent.append(selected)
-    if len(recent) > MAX_HISTORY:
-        recent = recent[-MAX_HISTORY:]
-    set_session_recent_words(recent)
-    return selected
+    item, _ = draw_item(*spell_corpus(difficulty))
+    return item.text
 
 def get_word_sentence_usage(word):
     prompt = f"""Write ONE simple sentence using the word "{word}" for children aged 6-15.
@@ -1583,71 +2719,7 @@ def compare_spelling(student_spelling, correct_word):
                 comparison.append({"letter": correct_letter, "status": "missing"})
     return comparison
 
-# ================= WORD PUZZLE DATA & LOGIC =================
-WORD_PUZZLE_WORDS = {
-    "easy": [
-        {"word": "CAT",   "hint": "A furry pet that meows",           "category": "Animals"},
-        {"word": "DOG",   "hint": "A loyal pet that barks",           "category": "Animals"},
-        {"word": "SUN",   "hint": "It shines in the sky during day",  "category": "Nature"},
-        {"word": "BUS",   "hint": "A big vehicle for many people",    "category": "Transport"},
-        {"word": "CUP",   "hint": "You drink tea or coffee from this","category": "Objects"},
-        {"word": "MAP",   "hint": "Shows you directions and places",  "category": "Objects"},
-        {"word": "HEN",   "hint": "A female chicken that lays eggs",  "category": "Animals"},
-        {"word": "PEN",   "hint": "You write with this",             "category": "Objects"},
-        {"word": "NET",   "hint": "Used to catch fish or play tennis","category": "Objects"},
-        {"word": "FAN",   "hint": "Spins to keep you cool",          "category": "Objects"},
-        {"word": "JAM",   "hint": "Sweet spread on bread",           "category": "Food"},
-        {"word": "MUD",   "hint": "Wet dirty earth",                 "category": "Nature"},
-        {"word": "OWL",   "hint": "A wise bird that hoots at night", "category": "Animals"},
-        {"word": "ANT",   "hint": "A tiny insect that lives in colonies", "category": "Animals"},
-        {"word": "EGG",   "hint": "Oval food laid by a bird",        "category": "Food"},
-        {"word": "BAG",   "hint": "You carry your books in this",    "category": "Objects"},
-        {"word": "COW",   "hint": "Farm animal that gives milk",     "category": "Animals"},
-        {"word": "FOX",   "hint": "A clever wild animal with a bushy tail", "category": "Animals"},
-        {"word": "BEE",   "hint": "Insect that makes honey",        "category": "Animals"},
-        {"word": "ICE",   "hint": "Frozen water",                   "category": "Nature"},
-    ],
-    "medium": [
-        {"word": "TIGER",  "hint": "A big striped wild cat",              "category": "Animals"},
-        {"word": "APPLE",  "hint": "A red or green fruit",               "category": "Food"},
-        {"word": "TABLE",  "hint": "Furniture you eat or work on",       "category": "Objects"},
-        {"word": "WATER",  "hint": "Liquid we drink every day",          "category": "Nature"},
-        {"word": "CLOUD",  "hint": "White fluffy thing in the sky",      "category": "Nature"},
-        {"word": "BREAD",  "hint": "Baked food made from flour",         "category": "Food"},
-        {"word": "FLOWER", "hint": "Pretty plant with colourful petals", "category": "Nature"},
-        {"word": "BRIDGE", "hint": "Structure built over a river",       "category": "Places"},
-        {"word": "CANDLE", "hint": "Gives light when it burns",          "category": "Objects"},
-        {"word": "JUNGLE", "hint": "Dense tropical forest",              "category": "Nature"},
-        {"word": "MARKET", "hint": "Place where things are bought/sold", "category": "Places"},
-        {"word": "PENCIL", "hint": "Used to write and can be erased",    "category": "Objects"},
-        {"word": "RABBIT", "hint": "Fluffy animal with long ears",       "category": "Animals"},
-        {"word": "CASTLE", "hint": "A large old fortress of kings",      "category": "Places"},
-        {"word": "BUTTER", "hint": "Yellow spread made from milk",       "category": "Food"},
-        {"word": "GARDEN", "hint": "Outdoor space to grow plants",       "category": "Nature"},
-        {"word": "MIRROR", "hint": "You see your reflection in this",    "category": "Objects"},
-        {"word": "FINGER", "hint": "Part of your hand",                  "category": "Body"},
-        {"word": "PLANET", "hint": "A large object orbiting a star",     "category": "Space"},
-        {"word": "ROCKET", "hint": "Vehicle that travels to space",      "category": "Space"},
-    ],
-    "hard": [
-        {"word": "ELEPHANT",    "hint": "Largest land animal with a trunk",          "category": "Animals"},
-        {"word": "BEAUTIFUL",   "hint": "Very pleasing to look at",                  "category": "Adjectives"},
-        {"word": "CHOCOLATE",   "hint": "Sweet brown treat loved by children",       "category": "Food"},
-        {"word": "BUTTERFLY",   "hint": "Insect with colourful wings",               "category": "Animals"},
-        {"word": "ADVENTURE",   "hint": "An exciting journey or experience",         "category": "Concepts"},
-        {"word": "DICTIONARY",  "hint": "A book that explains word meanings",        "category": "Objects"},
-        {"word": "STRAWBERRY",  "hint": "Small red fruit with seeds on outside",     "category": "Food"},
-        {"word": "RESTAURANT",  "hint": "A place where you eat and pay for food",    "category": "Places"},
-        {"word": "IMAGINATION", "hint": "Ability to form pictures in your mind",     "category": "Concepts"},
-        {"word": "CELEBRATION", "hint": "A happy event to mark a special occasion",  "category": "Concepts"},
-        {"word": "BASKETBALL",  "hint": "Sport played by throwing a ball into a hoop","category": "Sports"},
-        {"word": "COMFORTABLE", "hint": "Feeling relaxed and at ease",               "category": "Adjectives"},
-        {"word": "SPECTACULAR", "hint": "Extremely impressive or dramatic",          "category": "Adjectives"},
-        {"word": "INCREDIBLE",  "hint": "Impossible to believe; amazing",            "category": "Adjectives"},
-        {"word": "UNDERSTAND",  "hint": "To know the meaning of something",          "category": "Concepts"},
-    ],
-}
-
+# ================= WORD PUZZLE LOGIC =================
 def scramble_word(word):
     letters = list(word)
     for _ in range(20):
@@ -1657,143 +2729,190 @@ def scramble_word(word):
             return scrambled
     return word[::-1]
 
-# ================= GRAMMAR DATA & LOGIC =================
-GRAMMAR_QUESTIONS = {
-    "easy": [
-        ("She ___ to school every day.",
-         ["go", "goes", "going", "gone"], 1,
-         "'She' is third-person singular, so we use 'goes'."),
-        ("They ___ playing in the park.",
-         ["is", "am", "are", "be"], 2,
-         "'They' takes 'are' as the helping verb."),
-        ("I ___ a student.",
-         ["is", "am", "are", "be"], 1,
-         "Use 'am' with 'I'."),
-        ("He ___ not eat vegetables.",
-         ["do", "does", "did", "doing"], 1,
-         "Use 'does' with third-person singular (he/she/it)."),
-        ("The cat ___ on the mat.",
-         ["sit", "sits", "sitting", "sat"], 1,
-         "Third-person singular present uses 'sits'."),
-        ("We ___ happy today.",
-         ["is", "am", "are", "be"], 2,
-         "'We' takes 'are'."),
-        ("___ you like ice cream?",
-         ["Do", "Does", "Did", "Is"], 0,
-         "Use 'Do' for questions with 'you'."),
-        ("There ___ two apples on the table.",
-         ["is", "am", "are", "were"], 2,
-         "Two apples is plural, so use 'are'."),
-        ("She has ___ brothers.",
-         ["two", "a", "an", "much"], 0,
-         "'Two' is correct for countable nouns like brothers."),
-        ("The dog ___ loudly.",
-         ["bark", "barks", "barking", "barked"], 1,
-         "Third-person singular present: 'barks'."),
-        ("My mother ___ tea every morning.",
-         ["drink", "drinks", "drinking", "drank"], 1,
-         "Third-person singular present: 'drinks'."),
-        ("The children ___ in the garden.",
-         ["play", "plays", "playing", "played"], 0,
-         "'Children' is plural, so use 'play'."),
-    ],
-    "medium": [
-        ("Neither John nor his friends ___ coming.",
-         ["is", "are", "was", "were"], 1,
-         "When 'neither…nor' pairs singular with plural, the verb agrees with the nearer subject ('friends' → 'are')."),
-        ("She has been waiting ___ two hours.",
-         ["since", "for", "from", "during"], 1,
-         "Use 'for' with a period of time (two hours)."),
-        ("If I ___ rich, I would travel the world.",
-         ["am", "was", "were", "be"], 2,
-         "In hypothetical conditionals, use 'were' for all persons."),
-        ("The teacher, along with the students, ___ going on a trip.",
-         ["are", "is", "were", "have"], 1,
-         "The subject is 'teacher' (singular); 'along with' is a phrase, not a conjunction."),
-        ("He asked me where I ___ going.",
-         ["am", "was", "were", "have"], 1,
-         "Reported speech shifts tense: present 'am' → past 'was'."),
-        ("They have ___ their homework already.",
-         ["finish", "finishing", "finished", "finishes"], 2,
-         "'Have' + past participle forms present perfect: 'have finished'."),
-        ("___ of the two books is yours?",
-         ["Which", "What", "Who", "Whom"], 0,
-         "Use 'Which' when choosing between a limited set."),
-        ("She is ___ than her sister.",
-         ["tall", "more tall", "taller", "tallest"], 2,
-         "Comparative of a one-syllable adjective: add '-er'."),
-        ("The news ___ surprising.",
-         ["were", "are", "is", "have"], 2,
-         "'News' is uncountable and takes a singular verb."),
-        ("I wish I ___ a bird.",
-         ["am", "was", "were", "be"], 2,
-         "After 'wish', use subjunctive 'were' for all persons."),
-        ("He is good ___ mathematics.",
-         ["in", "at", "on", "for"], 1,
-         "We say 'good at' a subject."),
-        ("She ___ in this city since 2010.",
-         ["lives", "is living", "has lived", "lived"], 2,
-         "Use present perfect for an action that started in the past and continues now."),
-    ],
-    "hard": [
-        ("___ he studied harder, he would have passed.",
-         ["If", "Had", "Has", "Have"], 1,
-         "Inverted third conditional: 'Had he studied…' = 'If he had studied…'"),
-        ("The committee ___ divided in their opinions.",
-         ["is", "are", "was", "were"], 1,
-         "When a collective noun acts as individuals, use the plural verb."),
-        ("No sooner ___ he left than it started raining.",
-         ["had", "has", "have", "did"], 0,
-         "'No sooner…than' takes the past perfect: 'had he left'."),
-        ("She is one of those students who ___ always on time.",
-         ["is", "are", "was", "were"], 1,
-         "The antecedent of 'who' is 'students' (plural), so use 'are'."),
-        ("It is high time we ___ the meeting.",
-         ["start", "started", "have started", "starts"], 1,
-         "'It is high time' is followed by past tense (subjunctive mood)."),
-        ("The data ___ been analysed by the research team.",
-         ["has", "have", "had", "is"], 1,
-         "'Data' is treated as plural in formal usage → 'have'."),
-        ("Hardly ___ she entered when the phone rang.",
-         ["had", "has", "did", "does"], 0,
-         "'Hardly…when' inverts subject and auxiliary: 'Hardly had she entered…'"),
-        ("Each of the boys ___ done his homework.",
-         ["have", "has", "had", "having"], 1,
-         "'Each' is singular → 'has'."),
-        ("The police ___ arrested the suspect.",
-         ["has", "have", "is", "was"], 1,
-         "'Police' is a plural noun → 'have'."),
-        ("___ you arrive early, please wait outside.",
-         ["Should", "Would", "Could", "Shall"], 0,
-         "Conditional inversion: 'Should you arrive…' = 'If you should arrive…'"),
-        ("The jury ___ unable to reach a verdict.",
-         ["was", "were", "is", "are"], 1,
-         "Here 'jury' refers to members acting individually → plural 'were'."),
-        ("He suggested that she ___ a doctor.",
-         ["see", "sees", "saw", "would see"], 0,
-         "After 'suggest that', use bare infinitive (subjunctive): 'she see'."),
-    ],
-}
+# ================= PRECOMPILED CORPORA =================
+# Every practice corpus is compiled once per content load into immutable, indexed tuples.
+# Request handlers only do a dict lookup — nothing is rebuilt per call.
+class CorpusItem(NamedTuple):
+    text: str
+    normalized: str
+    length: int
+    word_count: int
+
+class PuzzleItem(NamedTuple):
+    word: str
+    hint: str
+    category: str
+    length: int
+
+class GrammarItem(NamedTuple):
+    question: str
+    options: tuple
+    correct_index: int
+    explanation: str
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s']", "", text.lower()).split())
+
+def compile_text_corpus(texts):
+    return tuple(CorpusItem(t, normalize_text(t), len(t), len(t.split())) for t in texts)
+
+def compile_puzzle_corpus(items):
+    return tuple(PuzzleItem(w["word"], w["hint"], w["category"], len(w["word"])) for w in items)
+
+def compile_grammar_corpus(items):
+    return tuple(GrammarItem(q, tuple(opts), correct, expl) for q, opts, correct, expl in items)
+
+# ================= CONTENT STORE =================
+# Sentences, spell words, puzzles, grammar questions, roleplay prompts and mode tips live in
+# versioned JSON files under CONTENT_DIR. They are compiled into an immutable ContentSnapshot
+# and swapped in atomically when the files change, so content edits need no redeploy.
+CONTENT_DIR         = os.getenv("CONTENT_DIR", "content")
+CONTENT_RELOAD_SECS = int(os.getenv("CONTENT_RELOAD_SECS", 30))
+CONTENT_WARM_TTS    = os.getenv("CONTENT_WARM_TTS", "").lower() in ("1", "true", "yes")
+
+@dataclass(frozen=True)
+class ContentSnapshot:
+    version: str
+    signature: tuple
+    repeat: MappingProxyType
+    spell: MappingProxyType
+    roleplay: MappingProxyType
+    puzzle: MappingProxyType
+    grammar: MappingProxyType
+    mode_meta: MappingProxyType
+
+def _read_manifest():
+    with open(os.path.join(CONTENT_DIR, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def _content_signature(manifest):
+    paths = [os.path.join(CONTENT_DIR, "manifest.json")] + [
+        os.path.join(CONTENT_DIR, name) for name in sorted(manifest["files"].values())
+    ]
+    return tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+
+def _require(condition, message):
+    if not condition:
+        raise ValueError(f"Invalid content: {message}")
+
+def load_content():
+    """Read, validate and compile every content file into a fresh ContentSnapshot."""
+    manifest  = _read_manifest()
+    signature = _content_signature(manifest)
+    raw = {}
+    for key, name in manifest["files"].items():
+        with open(os.path.join(CONTENT_DIR, name), encoding="utf-8") as f:
+            raw[key] = json.load(f)
+
+    _require("civic_sense" in raw["repeat"], "repeat needs a civic_sense category")
+    for category, levels in raw["repeat"].items():
+        _require(levels.get("easy"), f"repeat category {category} needs easy sentences")
+    for name in ("spell", "puzzle", "grammar"):
+        _require(raw[name].get("easy"), f"{name} needs an easy list")
+    _require(raw["roleplay"].get("friend"), "roleplay needs friend questions")
+    for difficulty, items in raw["grammar"].items():
+        for q in items:
+            _require(0 <= q["answer"] < len(q["options"]), f"grammar answer out of range: {q['question']}")
+
+    return ContentSnapshot(
+        version=str(manifest.get("version", "0")),
+        signature=signature,
+        repeat=MappingProxyType({
+            (category, difficulty): compile_text_corpus(texts)
+            for category, levels in raw["repeat"].items()
+            for difficulty, texts in levels.items() if texts
+        }),
+        spell=MappingProxyType({d: compile_text_corpus(w) for d, w in raw["spell"].items() if w}),
+        roleplay=MappingProxyType({r: compile_text_corpus(q) for r, q in raw["roleplay"].items() if q}),
+        puzzle=MappingProxyType({d: compile_puzzle_corpus(w) for d, w in raw["puzzle"].items() if w}),
+        grammar=MappingProxyType({
+            d: compile_grammar_corpus((q["question"], q["options"], q["answer"], q["explanation"]) for q in items)
+            for d, items in raw["grammar"].items() if items
+        }),
+        mode_meta=MappingProxyType(raw["mode_meta"]),
+    )
+
+_content       = load_content()
+_content_lock  = threading.Lock()
+_content_hooks = []
+
+def current_content():
+    """The live snapshot. Grab it once per request; it never changes underneath you."""
+    return _content
+
+def register_content_hook(fn):
+    """Register fn(snapshot, added) to run after a reload; added maps corpus -> new texts."""
+    _content_hooks.append(fn)
+    return fn
+
+def _content_keys(snapshot):
+    return {
+        "repeat":   {it.text for items in snapshot.repeat.values() for it in items},
+        "spell":    {it.text for items in snapshot.spell.values() for it in items},
+        "roleplay": {it.text for items in snapshot.roleplay.values() for it in items},
+        "puzzle":   {it.hint for items in snapshot.puzzle.values() for it in items},
+        "grammar":  {it.question for items in snapshot.grammar.values() for it in items},
+    }
+
+def reload_content(force=False):
+    """Swap in a new snapshot if the files changed. Returns True when a reload happened."""
+    global _content
+    with _content_lock:
+        try:
+            if not force and _content_signature(_read_manifest()) == _content.signature:
+                return False
+            new = load_content()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("Content reload failed, keeping version %s: %s", _content.version, e)
+            return False
+        old, _content = _content, new
+    old_keys, new_keys = _content_keys(old), _content_keys(new)
+    added = {name: sorted(new_keys[name] - old_keys[name]) for name in new_keys}
+    logger.info("Content reloaded: %s -> %s", old.version, new.version)
+    for hook in list(_content_hooks):
+        try:
+            hook(new, added)
+        except Exception as e:
+            logger.error("Content hook %s failed: %s", getattr(hook, "__name__", hook), e)
+    return True
+
+@register_content_hook
+def warm_tts_cache(snapshot, added):
+    """Pre-generate audio for newly added items so the first student doesn't wait on gTTS."""
+    if not CONTENT_WARM_TTS or DISABLE_TTS:
+        return
+    def run():
+        for text in added.get("repeat", ()):
+            speak_to_file(text, slow=False)
+            speak_to_file(text, slow=True)
+        for word in added.get("spell", ()):
+            speak_to_file(word, slow=True)
+        for hint in added.get("puzzle", ()):
+            speak_to_file(hint, slow=False)
+    threading.Thread(target=run, daemon=True).start()
+
+def schedule_content_reload():
+    reload_content()
+    t = threading.Timer(CONTENT_RELOAD_SECS, schedule_content_reload)
+    t.daemon = True
+    t.start()
+
+def puzzle_corpus(difficulty):
+    corpus = current_content().puzzle
+    if difficulty not in corpus:
+        difficulty = "easy"
+    return f"puzzle:{difficulty}", corpus[difficulty]
 
 def get_grammar_question(difficulty="easy"):
-    questions = GRAMMAR_QUESTIONS.get(difficulty, GRAMMAR_QUESTIONS["easy"])
-    recent_key = f"recent_grammar_{difficulty}"
-    recent = session.get(recent_key, [])
-    available = [i for i in range(len(questions)) if i not in recent]
-    if not available:
-        recent = []
-        available = list(range(len(questions)))
-    idx = random.choice(available)
-    recent.append(idx)
-    if len(recent) > 6:
-        recent = recent[-6:]
-    session[recent_key] = recent
-    q = questions[idx]
+    corpus = current_content().grammar
+    if difficulty not in corpus:
+        difficulty = "easy"
+    q, idx = draw_item(f"grammar:{difficulty}", corpus[difficulty])
     return {
-        "question":      q[0],
-        "options":       q[1],
-        "correct_index": q[2],
-        "explanation":   q[3],
+        "question":      q.question,
+        "options":       list(q.options),
+        "correct_index": q.correct_index,
+        "explanation":   q.explanation,
         "difficulty":    difficulty,
         "index":         idx,
     }
@@ -1821,6 +2940,14 @@ def login_page():
         return redirect(url_for('home'))
     return render_template("login.html")
 
+@retry_on_busy
+def record_student_session(student_id, user_id_code):
+    conn = student_connection(user_id_code)
+    conn.execute('INSERT INTO student_sessions (student_id) VALUES (?)', (student_id,))
+    add_missing_progress_rows(conn, user_id_code)
+    conn.commit()
+    conn.close()
+
 @app.route("/login", methods=["POST"])
 def login():
     # FIX #2: Rate limit login attempts
@@ -1838,6 +2965,8 @@ def login():
         if not user_id_code or not password:
             conn.close()
             return jsonify({"success": False, "message": "Please provide your User ID and password."})
+        shard = lookup_shard(user_id_code)
+        conn  = get_db_connection(shard)
         user = conn.execute(
             'SELECT * FROM users WHERE role=? AND user_id_code=?', (role, user_id_code)
         ).fetchone()
@@ -1869,13 +2998,12 @@ def login():
 
         # Successful login — clear rate limit counter
         clear_attempts(ip)
+        regenerate_session_id()
         session['user_id']  = user['id']
         session['name']     = user['name']
         session['role']     = user['role']
         session.pop('conversation_context', None)
-        session.pop('recent_sentences', None)
-        session.pop('recent_words', None)
-        session.pop('recent_puzzle_words', None)
+        session.pop('item_bags', None)
         session.pop('conversation_turn_count', None)
         session.pop('conversation_topic', None)
         session.pop('current_roleplay_type', None)
@@ -1885,10 +3013,8 @@ def login():
             session['division']     = user['division']
             session['student_name'] = user['name']
             session['user_id_code'] = user['user_id_code']
-            conn2 = get_db_connection()
-            conn2.execute('INSERT INTO student_sessions (student_id) VALUES (?)', (user['id'],))
-            conn2.commit()
-            conn2.close()
+            session['shard']        = shard
+            record_student_session(user['id'], user['user_id_code'])
         else:
             session['email'] = user['email']
         return jsonify({"success": True, "message": "Login successful", "name": user['name']})
@@ -1922,27 +3048,38 @@ def signup():
             if division not in VALID_DIVISIONS:
                 conn.close()
                 return jsonify({"success": False, "message": "Please select a valid division (A–E)"})
-            existing = conn.execute(
-                'SELECT id FROM users WHERE roll_no=? AND class_name=? AND division=?',
-                (roll_no, class_name, division)
-            ).fetchone()
-            if existing:
-                conn.close()
-                return jsonify({"success": False, "message": f"Roll number {roll_no} is already registered in Class {class_name}-{division}"})
+            for class_conn in student_connections(class_name):
+                existing = class_conn.execute(
+                    'SELECT id FROM users WHERE roll_no=? AND class_name=? AND division=?',
+                    (roll_no, class_name, division)
+                ).fetchone()
+                if existing:
+                    conn.close()
+                    return jsonify({"success": False, "message": f"Roll number {roll_no} is already registered in Class {class_name}-{division}"})
+            shard       = shard_for_class(class_name)
+            ensure_shard(shard)
             new_user_id = generate_unique_user_id(conn)
-            conn.execute(
-                'INSERT INTO users (role, name, user_id_code, roll_no, class_name, division, password_hash, is_approved, is_active) VALUES (?,?,?,?,?,?,?,1,1)',
-                (role, name, new_user_id, roll_no, class_name, division, password_hash)
-            )
-            conn.execute(
-                '''INSERT INTO student_progress
-                   (user_id_code, roll_no, class_name, division, xp, conversation_xp, roleplay_xp,
-                    repeat_xp, spellbee_xp, meanings_xp, wordpuzzle_xp, grammar_xp,
-                    total_stars, streak, total_sessions)
-                   VALUES (?,?,?,?,0,0,0,0,0,0,0,0,0,0,0)''',
-                (new_user_id, roll_no, class_name, division)
-            )
-            conn.commit()
+            student_id  = register_student(conn, new_user_id, shard)
+            shard_conn  = get_db_connection(shard)
+            try:
+                shard_conn.execute(
+                    'INSERT INTO users (id, role, name, user_id_code, roll_no, class_name, division, password_hash, is_approved, is_active) VALUES (?,?,?,?,?,?,?,?,1,1)',
+                    (student_id, role, name, new_user_id, roll_no, class_name, division, password_hash)
+                )
+                shard_conn.execute(
+                    '''INSERT INTO student_progress
+                       (user_id_code, roll_no, class_name, division, xp, conversation_xp, roleplay_xp,
+                        repeat_xp, spellbee_xp, meanings_xp, wordpuzzle_xp, grammar_xp,
+                        total_stars, streak, total_sessions)
+                       VALUES (?,?,?,?,0,0,0,0,0,0,0,0,0,0,0)''',
+                    (new_user_id, roll_no, class_name, division)
+                )
+                shard_conn.commit()
+            except Exception:
+                shard_conn.rollback()
+                forget_students(conn, [new_user_id])
+                conn.commit()
+                raise
             conn.close()
             return jsonify({"success": True, "message": "Account created successfully", "userIdCode": new_user_id})
         else:
@@ -1996,7 +3133,7 @@ def verify_identity():
         return jsonify({"success": False, "message": "Please enter your roll number."})
     if not class_name or not division:
         return jsonify({"success": False, "message": "Please select your class and division."})
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     user = conn.execute(
         '''SELECT id, name, roll_no, class_name, division
            FROM users WHERE user_id_code = ? AND role = 'student'
@@ -2025,7 +3162,7 @@ def reset_password_request():
         return jsonify({"success": False, "message": "User ID and new password are required"})
     if len(new_password) < 4:
         return jsonify({"success": False, "message": "Password must be at least 4 characters"})
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     user = conn.execute(
         'SELECT * FROM users WHERE user_id_code=? AND role=?', (user_id_code, 'student')
     ).fetchone()
@@ -2047,21 +3184,153 @@ def delete_account():
         return jsonify({'success': False, 'message': 'Not logged in'})
     user_id_code = session['user_id_code']
     user_id      = session['user_id']
-    conn = get_db_connection()
+    flush_pending_activity(user_id_code)
+    shard = lookup_shard(user_id_code)
+    conn  = get_db_connection(shard)
     try:
-        conn.execute('DELETE FROM activity_log WHERE user_id_code=?', (user_id_code,))
-        conn.execute('DELETE FROM student_progress WHERE user_id_code=?', (user_id_code,))
-        conn.execute('DELETE FROM student_badges WHERE user_id_code=?', (user_id_code,))
-        conn.execute('DELETE FROM student_sessions WHERE student_id=?', (user_id,))
+        # Progress, activity, badges, sessions and XP sequence rows cascade from users.
         conn.execute('DELETE FROM users WHERE user_id_code=? AND role=?', (user_id_code, 'student'))
         conn.commit()
         conn.close()
+        directory = get_db_connection()
+        forget_students(directory, [user_id_code])
+        directory.commit()
+        invalidate_student_info(user_id_code)
+        purge_archived_activity([user_id_code], shard)
         session.clear()
         return jsonify({'success': True, 'message': 'Account deleted successfully'})
     except Exception as e:
         conn.close()
         return jsonify({'success': False, 'message': f'Error deleting account: {str(e)}'})
 
+# ================= STUDENT LISTING PAGES =================
+# /admin/students and /get_all_students hand out one page at a time. The cursor is the sort
+# key of the last row sent, so every page is an index seek plus LIMIT rows however deep the
+# dashboard has scrolled. Each sort key is a tuple of ascending expressions that one index
+# covers column for column, which lets the row-value comparison seek straight to the cursor.
+STUDENT_PAGE_SIZE = int(os.getenv("STUDENT_PAGE_SIZE", "50"))
+STUDENT_PAGE_MAX  = 200
+
+STUDENT_SORTS = {
+    # class, division, name (admin default) — idx_users_student_order
+    "class": {
+        "source":   "users u LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code",
+        "key":      ("u.class_num", "u.division", "u.name", "u.id"),
+    },
+    # class, division, highest XP first (teacher default) — idx_progress_class_rank. Walks
+    # student_progress, which holds a row for every student (see add_missing_progress_rows).
+    "rank": {
+        "source":   "student_progress sp CROSS JOIN users u ON u.user_id_code=sp.user_id_code",
+        "key":      ("sp.class_num", "sp.division", "sp.xp_rank", "sp.id"),
+    },
+}
+
+class StudentPage(NamedTuple):
+    rows: list
+    next_cursor: Optional[str]
+    sort: str
+    source: str
+    filters: str
+    params: dict
+
+def encode_page_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+def decode_page_cursor(cursor, width):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != width:
+        raise ValueError("Invalid cursor")
+    return key
+
+def page_limit(args):
+    try:
+        limit = int(args.get("limit", STUDENT_PAGE_SIZE))
+    except ValueError:
+        limit = STUDENT_PAGE_SIZE
+    return max(1, min(limit, STUDENT_PAGE_MAX))
+
+def student_page(conn, columns, args, default_sort):
+    """One page of students for the listing routes.
+
+    Filters: class, division, active (1/0), search (substring of name, roll no or
+    User ID). Raises ValueError for a cursor this sort didn't issue."""
+    sort = args.get("sort", default_sort)
+    if sort not in STUDENT_SORTS:
+        sort = default_sort
+    spec  = STUDENT_SORTS[sort]
+    limit = page_limit(args)
+
+    class_col, division_col = spec["key"][:2]
+    where, params, fixed = ["u.role='student'"], {}, 0
+    if args.get("class") in VALID_CLASSES:
+        where.append(f"{class_col} = :class_num")
+        params["class_num"] = int(args["class"])
+        fixed = 1
+    if args.get("division") in VALID_DIVISIONS:
+        where.append(f"{division_col} = :division")
+        params["division"] = args["division"]
+        fixed += 1 if fixed else 0
+    if args.get("active") in ("0", "1"):
+        where.append("u.is_active = :active")
+        params["active"] = int(args["active"])
+    search = args.get("search", "").strip()[:64]
+    if search:
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("(u.name LIKE :search ESCAPE '\\' OR u.roll_no LIKE :search ESCAPE '\\'"
+                     " OR u.user_id_code LIKE :search ESCAPE '\\')")
+        params["search"] = f"%{escaped}%"
+    filters = " AND ".join(where)
+
+    # Key columns pinned by an equality filter drop out of the cursor comparison so the
+    # seek continues inside the pinned class/division.
+    key_names = [f"page_k{i}" for i in range(len(spec["key"]))]
+    page_where, page_params = filters, dict(params, limit=limit + 1)
+    if args.get("cursor"):
+        key = decode_page_cursor(args["cursor"], len(key_names))
+        page_where += (f" AND ({', '.join(spec['key'][fixed:])}) > "
+                       f"({', '.join(':' + k for k in key_names[fixed:])})")
+        page_params.update(zip(key_names[fixed:], key[fixed:]))
+
+    key_columns = ", ".join(f"{expr} AS {name}" for expr, name in zip(spec["key"], key_names))
+    rows = conn.execute(f'''
+        SELECT {columns}, {key_columns}
+        FROM {spec["source"]}
+        WHERE {page_where}
+        ORDER BY {", ".join(spec["key"])}
+        LIMIT :limit
+    ''', page_params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_page_cursor(rows[-1][k] for k in key_names)
+    return StudentPage(rows, next_cursor, sort, spec["source"], filters, params)
+
+def _sql_order(values):
+    # SQLite sorts NULL before everything else.
+    return tuple((0, 0) if v is None else (1, v) for v in values)
+
+def student_pages(columns, args, default_sort, snapshot=False):
+    """student_page across every shard that can hold the requested class, merged in key order.
+
+    Each shard seeks from the same cursor, so the first `limit` rows of the merge are the
+    page. Returns the merged page and the (conn, page) per shard for the callers' totals."""
+    parts = [(conn, student_page(conn, columns, args, default_sort))
+             for conn in student_connections(args.get("class"), snapshot)]
+    if len(parts) == 1:
+        return parts[0][1], parts
+    limit     = page_limit(args)
+    key_names = [f"page_k{i}" for i in range(len(STUDENT_SORTS[parts[0][1].sort]["key"]))]
+    rows = sorted((row for _, page in parts for row in page.rows),
+                  key=lambda row: _sql_order(row[k] for k in key_names))
+    next_cursor = None
+    if len(rows) > limit or any(page.next_cursor for _, page in parts):
+        rows = rows[:limit]
+        next_cursor = encode_page_cursor(rows[-1][k] for k in key_names)
+    return parts[0][1]._replace(rows=rows, next_cursor=next_cursor), parts
+
 # ======================================================
 # ================= ADMIN ROUTES =======================
 # ======================================================
@@ -2087,6 +3356,7 @@ def admin_login():
     if username == ADMIN_USERNAME and check_password_hash(ADMIN_PASSWORD_HASH, password):
         clear_attempts(ip)
         session.clear()
+        regenerate_session_id()
         session['is_admin']       = True
         session['admin_username'] = username
         log_admin_action("ADMIN_LOGIN", details="Successful admin login")
@@ -2105,47 +3375,66 @@ def admin_logout():
 def admin_dashboard():
     return render_template("admin_dashboard.html")
 
+# The counters are a handful of primary-key rows kept exact by triggers, so they are always
+# read live. Only the top-students scan goes to the read snapshots, behind a short per-worker
+# cache since the dashboard polls.
+ADMIN_STATS_TTL_SECS = float(os.getenv("ADMIN_STATS_TTL_SECS", 5))
+_admin_stats_cache   = {"at": 0.0, "top_students": None}
+_admin_stats_lock    = threading.Lock()
+
+def admin_top_students():
+    now = time.time()
+    with _admin_stats_lock:
+        if _admin_stats_cache["top_students"] is not None and now - _admin_stats_cache["at"] < ADMIN_STATS_TTL_SECS:
+            return _admin_stats_cache["top_students"]
+    top_students = []
+    for conn in student_connections(snapshot=True):
+        top_students += conn.execute(f'''
+            SELECT u.name, u.class_name, u.division, sp.xp, sp.total_stars, {STREAK_COLUMN}
+            FROM student_progress sp CROSS JOIN users u ON u.user_id_code=sp.user_id_code
+            WHERE u.role='student'
+            ORDER BY sp.xp DESC LIMIT 5
+        ''').fetchall()
+        conn.close()
+    top_students = [
+        {
+            "name":    row["name"],
+            "class":   f"Class {row['class_name']}-{row['division']}",
+            "xp":      row["xp"] or 0,
+            "stars":   row["total_stars"] or 0,
+            "streak":  row["streak"] or 0,
+        } for row in sorted(top_students, key=lambda row: row["xp"] or 0, reverse=True)[:5]
+    ]
+    with _admin_stats_lock:
+        _admin_stats_cache.update(at=now, top_students=top_students)
+    return top_students
+
 @app.route("/admin/stats")
 @admin_required
 def admin_stats():
-    conn = get_db_connection()
-    total_students    = conn.execute("SELECT COUNT(*) FROM users WHERE role='student'").fetchone()[0]
-    total_teachers    = conn.execute("SELECT COUNT(*) FROM users WHERE role='teacher'").fetchone()[0]
-    pending_teachers  = conn.execute("SELECT COUNT(*) FROM users WHERE role='teacher' AND is_approved=0").fetchone()[0]
-    active_students   = conn.execute("SELECT COUNT(*) FROM users WHERE role='student' AND is_active=1").fetchone()[0]
-    inactive_students = conn.execute("SELECT COUNT(*) FROM users WHERE role='student' AND is_active=0").fetchone()[0]
-    total_xp          = conn.execute("SELECT SUM(xp) FROM student_progress").fetchone()[0] or 0
-    total_sessions    = conn.execute("SELECT COUNT(*) FROM student_sessions").fetchone()[0]
-    activity_today    = conn.execute(
-        "SELECT COUNT(*) FROM activity_log WHERE date(date)=date('now')"
-    ).fetchone()[0]
-    top_students = conn.execute('''
-        SELECT u.name, u.class_name, u.division, sp.xp, sp.total_stars, sp.streak
-        FROM users u JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-        WHERE u.role='student'
-        ORDER BY sp.xp DESC LIMIT 5
-    ''').fetchall()
-    conn.close()
+    # Every user lives in exactly one database, so the shards' counters simply add up.
+    counters = defaultdict(int)
+    for conn in student_connections():
+        for name, value in conn.execute(
+            f"SELECT name, value FROM stat_counters WHERE name IN ({','.join('?' * len(STAT_COUNTER_NAMES))}) "
+            "OR name = 'activity:' || date('now')",
+            STAT_COUNTER_NAMES
+        ):
+            counters[name] += value
+        conn.close()
+    activity_today = sum(v for k, v in counters.items() if k.startswith("activity:"))
     return jsonify({
         "success": True,
         "stats": {
-            "totalStudents":   total_students,
-            "totalTeachers":   total_teachers,
-            "pendingTeachers": pending_teachers,
-            "activeStudents":  active_students,
-            "inactiveStudents": inactive_students,
-            "totalXP":         total_xp,
-            "totalSessions":   total_sessions,
+            "totalStudents":   counters.get("students_total", 0),
+            "totalTeachers":   counters.get("teachers_total", 0),
+            "pendingTeachers": counters.get("teachers_pending", 0),
+            "activeStudents":  counters.get("students_active", 0),
+            "inactiveStudents": counters.get("students_inactive", 0),
+            "totalXP":         counters.get("total_xp", 0),
+            "totalSessions":   counters.get("total_sessions", 0),
             "activityToday":   activity_today,
-            "topStudents": [
-                {
-                    "name":    row["name"],
-                    "class":   f"Class {row['class_name']}-{row['division']}",
-                    "xp":      row["xp"] or 0,
-                    "stars":   row["total_stars"] or 0,
-                    "streak":  row["streak"] or 0,
-                } for row in top_students
-            ]
+            "topStudents":     admin_top_students(),
         }
     })
 
@@ -2287,19 +3576,22 @@ def admin_reset_teacher_password():
 @app.route("/admin/students")
 @admin_required
 def admin_get_students():
-    conn = get_db_connection()
-    students = conn.execute('''
-        SELECT u.id, u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
-               u.is_active, u.created_at,
-               sp.xp, sp.total_stars, sp.streak, sp.last_active
-        FROM users u
-        LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-        WHERE u.role='student'
-        ORDER BY u.class_name*1 ASC, u.division ASC, u.name ASC
-    ''').fetchall()
-    conn.close()
+    try:
+        page, parts = student_pages(f'''
+            u.id, u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
+            u.is_active, u.created_at,
+            sp.xp, sp.total_stars, {STREAK_COLUMN}, sp.last_active''', request.args, "class")
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)})
+    total = None
+    if not request.args.get("cursor"):
+        total = sum(conn.execute(f"SELECT COUNT(*) FROM {p.source} WHERE {p.filters}", p.params).fetchone()[0]
+                    for conn, p in parts)
     return jsonify({
         "success": True,
+        "sort": page.sort,
+        "nextCursor": page.next_cursor,
+        "total": total,
         "students": [
             {
                 "id":         s["id"],
@@ -2315,7 +3607,7 @@ def admin_get_students():
                 "totalStars": s["total_stars"] or 0,
                 "streak":     s["streak"] or 0,
                 "lastActive": s["last_active"],
-            } for s in students
+            } for s in page.rows
         ]
     })
 
@@ -2326,7 +3618,7 @@ def admin_toggle_student_active():
     student_id = data.get("studentId")
     if not student_id:
         return jsonify({"success": False, "message": "Student ID required"})
-    conn = get_db_connection()
+    conn = student_connection(student_id=student_id)
     student = conn.execute("SELECT * FROM users WHERE id=? AND role='student'", (student_id,)).fetchone()
     if not student:
         conn.close()
@@ -2348,21 +3640,27 @@ def admin_delete_student():
     student_id = data.get("studentId")
     if not student_id:
         return jsonify({"success": False, "message": "Student ID required"})
-    conn = get_db_connection()
+    shard = lookup_shard(student_id=student_id)
+    conn  = get_db_connection(shard)
     student = conn.execute("SELECT * FROM users WHERE id=? AND role='student'", (student_id,)).fetchone()
     if not student:
         conn.close()
         return jsonify({"success": False, "message": "Student not found"})
     uid = student["user_id_code"]
-    conn.execute("DELETE FROM activity_log WHERE user_id_code=?", (uid,))
-    conn.execute("DELETE FROM student_progress WHERE user_id_code=?", (uid,))
-    conn.execute("DELETE FROM student_badges WHERE user_id_code=?", (uid,))
-    conn.execute("DELETE FROM student_sessions WHERE student_id=?", (student_id,))
+    flush_pending_activity(uid)
     conn.execute("DELETE FROM users WHERE id=?", (student_id,))
+    # The directory entry and audit row live in the global database, which is conn itself
+    # unless the student is in a class shard.
+    directory = get_db_connection()
+    forget_students(directory, [uid])
+    log_admin_action("DELETE_STUDENT", "student", student_id, student["name"],
+                     f"UserID: {uid}, Roll: {student['roll_no']}, Class: {student['class_name']}-{student['division']}",
+                     conn=directory)
     conn.commit()
+    directory.commit()
     conn.close()
-    log_admin_action("DELETE_STUDENT", "student", student_id, student["name"],
-                     f"UserID: {uid}, Roll: {student['roll_no']}, Class: {student['class_name']}-{student['division']}")
+    invalidate_student_info(uid)
+    purge_archived_activity([uid], shard)
     return jsonify({"success": True, "message": f"Student '{student['name']}' and all their data deleted."})
 
 @app.route("/admin/students/reset_password", methods=["POST"])
@@ -2375,7 +3673,7 @@ def admin_reset_student_password():
         return jsonify({"success": False, "message": "Student ID and new password required"})
     if len(new_password) < 4:
         return jsonify({"success": False, "message": "Password must be at least 4 characters"})
-    conn = get_db_connection()
+    conn = student_connection(student_id=student_id)
     student = conn.execute("SELECT * FROM users WHERE id=? AND role='student'", (student_id,)).fetchone()
     if not student:
         conn.close()
@@ -2394,23 +3692,29 @@ def admin_reset_student_progress():
     student_id = data.get("studentId")
     if not student_id:
         return jsonify({"success": False, "message": "Student ID required"})
-    conn = get_db_connection()
+    conn = student_connection(student_id=student_id)
     student = conn.execute("SELECT * FROM users WHERE id=? AND role='student'", (student_id,)).fetchone()
     if not student:
         conn.close()
         return jsonify({"success": False, "message": "Student not found"})
     uid = student["user_id_code"]
+    flush_pending_activity(uid)
     conn.execute('''
         UPDATE student_progress SET
             xp=0, conversation_xp=0, roleplay_xp=0, repeat_xp=0,
             spellbee_xp=0, meanings_xp=0, wordpuzzle_xp=0, grammar_xp=0,
-            total_stars=0, total_sessions=0, average_accuracy=0, streak=0
+            total_stars=0, total_sessions=0, average_accuracy=0, streak=0,
+            last_active_day=NULL, badge_mask=0, unlock_mask=?
         WHERE user_id_code=?
-    ''', (uid,))
+    ''', (UNLOCK_MASK_BASE, uid))
     conn.execute("DELETE FROM activity_log WHERE user_id_code=?", (uid,))
+    conn.execute("DELETE FROM activity_daily_rollup WHERE user_id_code=?", (uid,))
+    conn.execute("DELETE FROM student_mode_stats WHERE user_id_code=?", (uid,))
     conn.execute("DELETE FROM student_badges WHERE user_id_code=?", (uid,))
     conn.commit()
     conn.close()
+    invalidate_student_info(uid)
+    purge_archived_activity([uid], lookup_shard(uid))
     log_admin_action("RESET_STUDENT_PROGRESS", "student", student_id, student["name"],
                      f"All XP, badges, and activity log cleared for {uid}")
     return jsonify({"success": True, "message": f"Progress for '{student['name']}' has been reset."})
@@ -2458,6 +3762,22 @@ def admin_change_password():
         "newPassword": new_password
     })
 
+# Bulk actions work on the id list in IN batches (kept under SQLite's bound-variable limit),
+# all inside one write transaction, with one executemany for the audit rows.
+BULK_BATCH_SIZE = 500
+
+BULK_ACTIONS = {
+    # action: (statement on the batch, audit action)
+    "activate":   ("UPDATE users SET is_active=1 WHERE role='student' AND id IN ({ids})", "BULK_ACTIVATE_STUDENT"),
+    "deactivate": ("UPDATE users SET is_active=0 WHERE role='student' AND id IN ({ids})", "BULK_DEACTIVATE_STUDENT"),
+    "delete":     ("DELETE FROM users WHERE role='student' AND id IN ({ids})",            "BULK_DELETE_STUDENT"),
+}
+
+def in_batches(values, size=BULK_BATCH_SIZE):
+    for i in range(0, len(values), size):
+        batch = values[i:i + size]
+        yield batch, ",".join("?" * len(batch))
+
 @app.route("/admin/students/bulk_action", methods=["POST"])
 @admin_required
 def admin_bulk_student_action():
@@ -2466,32 +3786,94 @@ def admin_bulk_student_action():
     student_ids = data.get("studentIds", [])
     if not action or not student_ids:
         return jsonify({"success": False, "message": "Action and student IDs required"})
-    if action not in ("activate", "deactivate", "delete"):
+    if action not in BULK_ACTIONS:
         return jsonify({"success": False, "message": "Invalid action"})
-    conn = get_db_connection()
-    affected = 0
-    for sid in student_ids:
-        student = conn.execute("SELECT * FROM users WHERE id=? AND role='student'", (sid,)).fetchone()
-        if not student:
-            continue
-        uid = student["user_id_code"]
-        if action == "activate":
-            conn.execute("UPDATE users SET is_active=1 WHERE id=?", (sid,))
-            log_admin_action("BULK_ACTIVATE_STUDENT", "student", sid, student["name"])
-        elif action == "deactivate":
-            conn.execute("UPDATE users SET is_active=0 WHERE id=?", (sid,))
-            log_admin_action("BULK_DEACTIVATE_STUDENT", "student", sid, student["name"])
-        elif action == "delete":
-            conn.execute("DELETE FROM activity_log WHERE user_id_code=?", (uid,))
-            conn.execute("DELETE FROM student_progress WHERE user_id_code=?", (uid,))
-            conn.execute("DELETE FROM student_badges WHERE user_id_code=?", (uid,))
-            conn.execute("DELETE FROM student_sessions WHERE student_id=?", (sid,))
-            conn.execute("DELETE FROM users WHERE id=?", (sid,))
-            log_admin_action("BULK_DELETE_STUDENT", "student", sid, student["name"])
-        affected += 1
-    conn.commit()
-    conn.close()
-    return jsonify({"success": True, "message": f"Bulk {action} applied to {affected} students."})
+    try:
+        student_ids = sorted({int(sid) for sid in student_ids})
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Student IDs must be numbers"})
+    statement, audit_action = BULK_ACTIONS[action]
+    if action == "delete":
+        flush_pending_activity()
+    # Every write lock is taken before anything is written, the global one (directory, audit
+    # rows and any global students) last, so a busy database fails the action with nothing
+    # done. Unsharded, that is the single transaction it always was. Shard transactions then
+    # commit ahead of the global one; should a commit still fail part-way, the students whose
+    # shards did commit get their directory and audit rows in a fresh global transaction.
+    by_shard  = students_by_shard(student_ids)
+    order     = sorted(shard for shard in by_shard if shard) + [""]
+    conns     = {shard: get_db_connection(shard) for shard in order}
+    directory = conns[""]
+    begin_immediate_all([conns[shard] for shard in order])
+    students = {}
+    try:
+        for shard in order:
+            students[shard] = []
+            for batch, ids in in_batches(by_shard.get(shard, [])):
+                students[shard] += conns[shard].execute(
+                    f"SELECT id, name, user_id_code FROM users WHERE role='student' AND id IN ({ids})", batch
+                ).fetchall()
+                conns[shard].execute(statement.format(ids=ids), batch)
+    except Exception:
+        for conn in conns.values():
+            conn.rollback()
+        raise
+
+    def record(shards):
+        rows = [s for shard in shards for s in students[shard]]
+        if action == "delete":
+            forget_students(directory, [s["user_id_code"] for s in rows])
+        log_admin_actions([(audit_action, "student", s["id"], s["name"], None) for s in rows], conn=directory)
+
+    committed = []
+    try:
+        for shard in order[:-1]:
+            conns[shard].commit()
+            committed.append(shard)
+        record(order)
+        directory.commit()
+        committed.append("")
+    except sqlite3.Error:
+        logger.exception("Bulk %s failed after shards %s committed", action, committed)
+        for conn in conns.values():
+            if conn.in_transaction:
+                conn.rollback()
+        begin_immediate_all([directory])
+        record(committed)
+        directory.commit()
+    directory.close()
+
+    applied = [s for shard in committed for s in students[shard]]
+    invalidate_student_info(*[s["user_id_code"] for s in applied])
+    if action == "delete":
+        for shard in committed:
+            purge_archived_activity([s["user_id_code"] for s in students[shard]], shard)
+    if len(committed) < len(order):
+        return jsonify({"success": False,
+                        "message": f"Bulk {action} applied to {len(applied)} of {sum(map(len, students.values()))} students; the rest failed, please retry."})
+    return jsonify({"success": True, "message": f"Bulk {action} applied to {len(applied)} students."})
+
+@app.route("/admin/content/reload", methods=["POST"])
+@admin_required
+def admin_reload_content():
+    previous = current_content().version
+    reloaded = reload_content(force=True)
+    content  = current_content()
+    if not reloaded:
+        return jsonify({"success": False, "message": f"Content files are invalid; still serving version {content.version}.", "version": content.version})
+    log_admin_action("RELOAD_CONTENT", details=f"{previous} -> {content.version}")
+    return jsonify({
+        "success": True,
+        "message": f"Content version {content.version} loaded.",
+        "version": content.version,
+        "counts": {
+            "repeat":   sum(len(v) for v in content.repeat.values()),
+            "spell":    sum(len(v) for v in content.spell.values()),
+            "roleplay": sum(len(v) for v in content.roleplay.values()),
+            "puzzle":   sum(len(v) for v in content.puzzle.values()),
+            "grammar":  sum(len(v) for v in content.grammar.values()),
+        }
+    })
 
 # ================= STUDENT ROUTES =================
 @app.route("/dashboard")
@@ -2655,26 +4037,14 @@ def get_meaning():
 def word_puzzle():
     data       = request.json or {}
     difficulty = data.get("difficulty", "easy")
-    pool      = WORD_PUZZLE_WORDS.get(difficulty, WORD_PUZZLE_WORDS["easy"])
-    recent    = get_session_recent_puzzle_words()
-    available = [w for w in pool if w["word"] not in recent]
-    if not available:
-        recent    = recent[-5:] if len(recent) > 5 else []
-        available = [w for w in pool if w["word"] not in recent]
-    if not available:
-        available = pool
-    chosen    = random.choice(available)
-    scrambled = scramble_word(chosen["word"])
-    recent.append(chosen["word"])
-    if len(recent) > MAX_HISTORY:
-        recent = recent[-MAX_HISTORY:]
-    set_session_recent_puzzle_words(recent)
-    hint_audio = speak_to_file(chosen["hint"], slow=False)
+    chosen, _  = draw_item(*puzzle_corpus(difficulty))
+    scrambled  = scramble_word(chosen.word)
+    hint_audio = speak_to_file(chosen.hint, slow=False)
     return jsonify({
         "scrambled":  scrambled,
-        "hint":       chosen["hint"],
-        "category":   chosen["category"],
-        "length":     len(chosen["word"]),
+        "hint":       chosen.hint,
+        "category":   chosen.category,
+        "length":     chosen.length,
         "difficulty": difficulty,
         "hint_audio": hint_audio,
     })
@@ -2684,28 +4054,16 @@ def word_puzzle():
 def word_puzzle_start():
     data       = request.json or {}
     difficulty = data.get("difficulty", "easy")
-    pool      = WORD_PUZZLE_WORDS.get(difficulty, WORD_PUZZLE_WORDS["easy"])
-    recent    = get_session_recent_puzzle_words()
-    available = [w for w in pool if w["word"] not in recent]
-    if not available:
-        recent    = recent[-5:] if len(recent) > 5 else []
-        available = [w for w in pool if w["word"] not in recent]
-    if not available:
-        available = pool
-    chosen    = random.choice(available)
-    scrambled = scramble_word(chosen["word"])
-    recent.append(chosen["word"])
-    if len(recent) > MAX_HISTORY:
-        recent = recent[-MAX_HISTORY:]
-    set_session_recent_puzzle_words(recent)
-    session['current_puzzle_word']       = chosen["word"]
+    chosen, _  = draw_item(*puzzle_corpus(difficulty))
+    scrambled  = scramble_word(chosen.word)
+    session['current_puzzle_word']       = chosen.word
     session['current_puzzle_difficulty'] = difficulty
-    hint_audio = speak_to_file(chosen["hint"], slow=False)
+    hint_audio = speak_to_file(chosen.hint, slow=False)
     return jsonify({
         "scrambled":  scrambled,
-        "hint":       chosen["hint"],
-        "category":   chosen["category"],
-        "length":     len(chosen["word"]),
+        "hint":       chosen.hint,
+        "category":   chosen.category,
+        "length":     chosen.length,
         "difficulty": difficulty,
         "hint_audio": hint_audio,
     })
@@ -2815,6 +4173,7 @@ def get_daily_challenge_route():
 
 @app.route("/complete_daily", methods=["POST"])
 @student_required
+@retry_on_busy
 def complete_daily():
     user_id_code = session.get('user_id_code')
     roll_no      = session.get('roll_no')
@@ -2822,33 +4181,74 @@ def complete_daily():
     division     = session.get('division')
     if has_completed_daily(user_id_code):
         return jsonify({"success": False, "message": "Already completed today's challenge!"})
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     conn.execute(
-        "INSERT INTO activity_log (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned) VALUES (?,?,?,?,?,?,?,?)",
+        "INSERT INTO activity_log (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned, day) VALUES (?,?,?,?,?,?,?,?,date('now'))",
         (user_id_code, roll_no, class_name, division, 'daily', 100, 3, 1)
     )
     conn.execute(
-        "UPDATE student_progress SET xp=xp+3, total_sessions=total_sessions+1, last_active=? WHERE user_id_code=?",
+        f"UPDATE student_progress SET xp=xp+3, total_sessions=total_sessions+1, last_active=?, {STREAK_BUMP} WHERE user_id_code=?",
         (datetime.now(), user_id_code)
     )
     conn.commit()
     conn.close()
+    invalidate_student_info(user_id_code)
     return jsonify({"success": True, "message": "Daily challenge complete! +3 XP", "xp_earned": 3})
 
 # ================= LEADERBOARD =================
+# Rankings come straight off the (scope..., xp) indexes on student_progress: top-N is an index
+# walk of N entries and "my rank" is a count over the covering index, so no sort ever runs.
+# CROSS JOIN pins student_progress as the outer table so SQLite can't start from users.
+# With shards, each shard's top N are merged and the counts of students ahead summed.
+LEADERBOARD_SCOPES = ("global", "class", "division")
+LEADERBOARD_SIZE   = 10
+
+def leaderboard_scope_filter(scope, class_name, division):
+    if scope == "division":
+        return "sp.class_name=? AND sp.division=?", (class_name, division)
+    if scope == "class":
+        return "sp.class_name=?", (class_name,)
+    return "1=1", ()
+
 @app.route("/get_leaderboard")
-@student_required
 def get_leaderboard():
-    conn = get_db_connection()
-    rows = conn.execute('''
-        SELECT u.name, u.class_name, u.division,
-               sp.xp, sp.total_stars, sp.streak
-        FROM users u
-        JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-        WHERE u.role='student'
-        ORDER BY sp.xp DESC LIMIT 10
-    ''').fetchall()
-    conn.close()
+    """Students may pick any scope and get their own rank; teachers and admins see the global board."""
+    is_student = 'user_id' in session and session.get('role') == 'student'
+    if not is_student and 'user_id' not in session and not session.get('is_admin'):
+        return redirect(url_for('login_page'))
+    scope = request.args.get("scope", "global")
+    if scope not in LEADERBOARD_SCOPES or not is_student:
+        scope = "global"
+    return jsonify({"success": True, **load_leaderboard(scope)})
+
+def load_leaderboard(scope):
+    where, params = leaderboard_scope_filter(scope, session.get('class_name'), session.get('division'))
+    my_uid = session.get('user_id_code') if session.get('role') == 'student' else None
+
+    # No progress row means no place on the board, so no rank; a legacy NULL counts as 0 XP.
+    my_xp = None
+    if my_uid:
+        row = student_connection(my_uid).execute(
+            "SELECT xp FROM student_progress WHERE user_id_code=?", (my_uid,)
+        ).fetchone()
+        my_xp = (row["xp"] or 0) if row else None
+    # Each shard's own top N and count of students ahead; merged, those are the board and rank.
+    rows, ahead = [], 0
+    for conn in student_connections(None if scope == "global" else session.get('class_name')):
+        rows += conn.execute(f'''
+            SELECT u.name, u.class_name, u.division,
+                   sp.xp, sp.total_stars, {STREAK_COLUMN}
+            FROM student_progress sp
+            CROSS JOIN users u ON u.user_id_code=sp.user_id_code
+            WHERE {where} AND u.role='student'
+            ORDER BY sp.xp DESC LIMIT ?
+        ''', params + (LEADERBOARD_SIZE,)).fetchall()
+        if my_xp is not None:
+            ahead += conn.execute(
+                f"SELECT COUNT(*) FROM student_progress sp WHERE {where} AND sp.xp > ?", params + (my_xp,)
+            ).fetchone()[0]
+        conn.close()
+    rows = sorted(rows, key=lambda row: row['xp'] or 0, reverse=True)[:LEADERBOARD_SIZE]
     leaderboard = []
     for i, row in enumerate(rows):
         leaderboard.append({
@@ -2856,15 +4256,8 @@ def get_leaderboard():
             "class": f"Class {row['class_name']}-{row['division']}",
             "xp": row['xp'] or 0, "stars": row['total_stars'] or 0, "streak": row['streak'] or 0
         })
-    my_uid = session.get('user_id_code')
-    conn = get_db_connection()
-    my_rank_row = conn.execute('''
-        SELECT COUNT(*)+1 as rank FROM student_progress
-        WHERE xp > (SELECT xp FROM student_progress WHERE user_id_code=?)
-    ''', (my_uid,)).fetchone()
-    conn.close()
-    my_rank = my_rank_row['rank'] if my_rank_row else '?'
-    return jsonify({"success": True, "leaderboard": leaderboard, "my_rank": my_rank})
+    my_rank = ahead + 1 if my_xp is not None else None
+    return {"scope": scope, "leaderboard": leaderboard, "my_rank": my_rank}
 
 # ================= PROGRESS DETAILS (Mistake Tracker + Suggestions) =================
 @app.route("/get_progress_details")
@@ -2874,20 +4267,22 @@ def get_progress_details():
     user_id_code = session.get('user_id_code')
     if not user_id_code:
         return jsonify({'success': False, 'message': 'Not logged in'})
+    return jsonify({'success': True, **load_progress_details(user_id_code)})
 
-    conn = get_db_connection()
+def load_progress_details(user_id_code):
+    flush_pending_activity(user_id_code)
+    conn = student_connection(user_id_code)
 
-    # Per-mode aggregated stats (exclude daily)
+    # Per-mode lifetime stats (exclude daily), kept current by trg_activity_mode_stats
     mode_rows = conn.execute('''
         SELECT mode,
-               COUNT(*) as total_attempts,
-               AVG(score) as avg_score,
-               SUM(CASE WHEN score >= 80 THEN 1 ELSE 0 END) as high_score_count,
-               SUM(CASE WHEN score < 60 THEN 1 ELSE 0 END) as low_score_count,
-               SUM(stars_earned) as total_stars
-        FROM activity_log
+               attempts as total_attempts,
+               score_sum * 1.0 / attempts as avg_score,
+               high_count as high_score_count,
+               low_count as low_score_count,
+               stars as total_stars
+        FROM student_mode_stats
         WHERE user_id_code = ? AND mode NOT IN ('daily')
-        GROUP BY mode
     ''', (user_id_code,)).fetchall()
 
     # 10 most recent low-score sessions (score < 70)
@@ -2956,18 +4351,18 @@ def get_progress_details():
             'grammar_xp':      progress_row['grammar_xp']      or 0,
             'total_stars':     progress_row['total_stars']      or 0,
             'total_sessions':  progress_row['total_sessions']   or 0,
+            'unlock_mask':     progress_row['unlock_mask'],
         }
-        streak = calculate_streak(user_id_code)
+        streak = live_streak(progress_row['streak'], progress_row['last_active_day'])
 
     suggestions = generate_personal_suggestions(mode_stats, weak_sessions, progress_data, streak)
 
-    return jsonify({
-        'success': True,
+    return {
         'modeStats':      mode_stats,
         'weakSessions':   weak_sessions,
         'recentSessions': recent_sessions,
         'suggestions':    suggestions,
-    })
+    }
 
 # ================= XP SYSTEM =================
 @app.route("/get_student_info")
@@ -2976,7 +4371,18 @@ def get_student_info():
     if 'user_id_code' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
     user_id_code = session['user_id_code']
-    conn = get_db_connection()
+    info = cached_student_info(user_id_code)
+    if info is None:
+        info = load_student_info(user_id_code)
+        if info is None:
+            return jsonify({'success': False, 'message': 'Student not found'})
+        cache_student_info(user_id_code, info)
+    # The challenge comes from the content store, not the database, so it is never cached.
+    return jsonify({'success': True, 'student': {**info, 'dailyChallenge': get_daily_challenge()}})
+
+def load_student_info(user_id_code):
+    """Build the /get_student_info payload (less the daily challenge), or None if the student is gone."""
+    conn = student_connection(user_id_code)
     student = conn.execute(
         'SELECT name, roll_no, class_name, division, user_id_code FROM users WHERE user_id_code=?',
         (user_id_code,)
@@ -2992,14 +4398,7 @@ def get_student_info():
     conn.close()
 
     if student and progress:
-        streak = calculate_streak(user_id_code)
-        conn = get_db_connection()
-        conn.execute(
-            'UPDATE student_progress SET streak=? WHERE user_id_code=?',
-            (streak, user_id_code)
-        )
-        conn.commit()
-        conn.close()
+        streak = live_streak(progress['streak'], progress['last_active_day'])
 
         progress_data = {
             'xp':              progress['xp'] or 0,
@@ -3012,6 +4411,7 @@ def get_student_info():
             'grammar_xp':      progress['grammar_xp']      or 0,
             'total_stars':     progress['total_stars']      or 0,
             'streak':          streak,
+            'unlock_mask':     progress['unlock_mask'],
         }
         unlocked_features = get_unlocked_features(progress_data)
         next_unlock       = get_next_unlock(progress_data)
@@ -3025,154 +4425,290 @@ def get_student_info():
                 'earned_at': next((row['earned_at'] for row in badges_rows if row['badge_id'] == b['id']), None)
             })
 
-        daily_challenge = get_daily_challenge()
         daily_completed = has_completed_daily(user_id_code)
 
-        return jsonify({
-            'success': True,
-            'student': {
-                'name':             student['name'],
-                'rollNo':           student['roll_no'],
-                'className':        student['class_name'],
-                'division':         student['division'],
-                'classLabel':       f"Class {student['class_name']}-{student['division']}",
-                'userIdCode':       student['user_id_code'],
-                'xp':               progress['xp'],
-                'conversationXp':   progress_data['conversation_xp'],
-                'roleplayXp':       progress_data['roleplay_xp'],
-                'repeatXp':         progress_data['repeat_xp'],
-                'spellbeeXp':       progress_data['spellbee_xp'],
-                'meaningsXp':       progress_data['meanings_xp'],
-                'wordpuzzleXp':     progress_data['wordpuzzle_xp'],
-                'grammarXp':        progress_data['grammar_xp'],
-                'totalStars':       progress['total_stars'],
-                'totalSessions':    progress['total_sessions'],
-                'averageAccuracy':  round(progress['average_accuracy'], 1),
-                'streak':           streak,
-                'unlockedFeatures': unlocked_features,
-                'nextUnlock':       next_unlock,
-                'badges':           badges_detail,
-                'earnedBadgeCount': len(earned_badge_ids),
-                'totalBadgeCount':  len(ALL_BADGES),
-                'dailyChallenge':   daily_challenge,
-                'dailyCompleted':   daily_completed,
-            }
-        })
-    else:
-        return jsonify({'success': False, 'message': 'Student not found'})
+        return {
+            'name':             student['name'],
+            'rollNo':           student['roll_no'],
+            'className':        student['class_name'],
+            'division':         student['division'],
+            'classLabel':       f"Class {student['class_name']}-{student['division']}",
+            'userIdCode':       student['user_id_code'],
+            'xp':               progress['xp'],
+            'conversationXp':   progress_data['conversation_xp'],
+            'roleplayXp':       progress_data['roleplay_xp'],
+            'repeatXp':         progress_data['repeat_xp'],
+            'spellbeeXp':       progress_data['spellbee_xp'],
+            'meaningsXp':       progress_data['meanings_xp'],
+            'wordpuzzleXp':     progress_data['wordpuzzle_xp'],
+            'grammarXp':        progress_data['grammar_xp'],
+            'totalStars':       progress['total_stars'],
+            'totalSessions':    progress['total_sessions'],
+            'averageAccuracy':  round(progress['average_accuracy'], 1),
+            'streak':           streak,
+            'unlockedFeatures': unlocked_features,
+            'nextUnlock':       next_unlock,
+            'badges':           badges_detail,
+            'earnedBadgeCount': len(earned_badge_ids),
+            'totalBadgeCount':  len(ALL_BADGES),
+            'dailyCompleted':   daily_completed,
+            'version':          progress['version'],
+        }
+    return None
+
+# ================= XP EVENTS =================
+# Whitelist of per-mode XP columns; the mode from the request never reaches SQL otherwise.
+MODE_XP_COLUMNS    = {mode: f"{mode}_xp" for mode in FEATURE_SEQUENCE}
+PROGRESS_XP_FIELDS = ['xp', *MODE_XP_COLUMNS.values(), 'total_stars']
+XP_BATCH_MAX       = 50
+# The largest single award the client makes: a perfect five-stage round on hard, plus its bonus.
+XP_EVENT_MAX       = 5 * DIFFICULTY_XP["hard"] + 5
+STARS_EVENT_MAX    = 15
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def parse_xp_event(data):
+    """The scored event in a client payload, or None if it isn't one the client could send."""
+    event = {
+        'xp':         data.get('xpEarned', 0),
+        'mode':       str(data.get('mode') or '').lower(),
+        'score':      data.get('score', 0),
+        'stars':      data.get('starsEarned', 0),
+        'difficulty': data.get('difficulty', 'easy'),
+        'attempt':    data.get('attempt', None),
+    }
+    if not (isinstance(event['xp'], int) and not isinstance(event['xp'], bool)
+            and 0 <= event['xp'] <= XP_EVENT_MAX):
+        return None
+    if event['mode'] not in MODE_XP_COLUMNS:
+        return None
+    if not (is_number(event['score']) and 0 <= event['score'] <= 100):
+        return None
+    if not (is_number(event['stars']) and 0 <= event['stars'] <= STARS_EVENT_MAX):
+        return None
+    return event
+
+def progress_snapshot(row):
+    snapshot = {col: row[col] or 0 for col in PROGRESS_XP_FIELDS}
+    snapshot['streak']      = live_streak(row['streak'], row['last_active_day'])
+    snapshot['unlock_mask'] = row['unlock_mask']
+    return snapshot
+
+def apply_xp_events(conn, student, events):
+    """Apply scored events for one student inside the caller's write transaction.
+
+    Every counter is bumped in place, so concurrent submissions can't read the same total
+    and lose an award. Returns None if the student has no progress row.
+    """
+    uid = student['user_id_code']
+    old_progress, new_progress, row, earned_mask = None, None, None, None
+    activity_rows, badge_ids, mode_xp = [], [], {}
+
+    for ev in events:
+        mode_xp_column = MODE_XP_COLUMNS.get(ev['mode'])
+        mode_xp_set    = f"{mode_xp_column} = COALESCE({mode_xp_column}, 0) + :xp," if mode_xp_column else ""
+        # Legacy rows can hold NULLs, and an all-integer average would truncate: COALESCE and
+        # * 1.0 keep the "or 0" float arithmetic the Python version did.
+        row = conn.execute(f'''
+            UPDATE student_progress
+            SET xp = COALESCE(xp, 0) + :xp, {mode_xp_set}
+                total_stars      = COALESCE(total_stars, 0) + :stars,
+                average_accuracy = (COALESCE(average_accuracy, 0) * 1.0 * COALESCE(total_sessions, 0) + :score)
+                                   / (COALESCE(total_sessions, 0) + 1),
+                total_sessions   = COALESCE(total_sessions, 0) + 1,
+                last_active      = :now, {STREAK_BUMP}
+            WHERE user_id_code = :uid
+            RETURNING *
+        ''', {"xp": ev['xp'], "stars": ev['stars'], "score": ev['score'],
+              "now": datetime.now(), "uid": uid}).fetchone()
+        if not row:
+            return None
+
+        new_progress = progress_snapshot(row)
+        if old_progress is None:
+            old_progress = dict(new_progress, xp=new_progress['xp'] - ev['xp'],
+                                total_stars=new_progress['total_stars'] - ev['stars'])
+            if mode_xp_column:
+                old_progress[mode_xp_column] -= ev['xp']
+        if mode_xp_column:
+            mode_xp[ev['mode']] = new_progress[mode_xp_column]
+        if earned_mask is None:
+            earned_mask = row['badge_mask']
+
+        activity_rows.append((uid, student['roll_no'], student['class_name'], student['division'],
+                              ev['mode'], ev['score'], ev['xp'], ev['stars']))
+        changed = {'streak', f"event:{ev['mode']}"}
+        if ev['xp']:
+            changed.update(['xp', mode_xp_column] if mode_xp_column else ['xp'])
+        if ev['stars']:
+            changed.add('total_stars')
+        earned = check_earned_badges(new_progress, earned_mask, changed, ev)
+        earned_mask |= badge_mask_of(earned)
+        badge_ids += earned
+
+    # With write-behind on, the caller queues outcome['activityRows'] once its transaction commits.
+    if not activity_buffer:
+        conn.executemany(
+            "INSERT INTO activity_log (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned, day) VALUES (?,?,?,?,?,?,?,?,date('now'))",
+            activity_rows
+        )
+    # old_progress still carries the stored mask; the one for new_progress is recomputed here.
+    new_progress['unlock_mask'] = unlock_mask_for(new_progress)
+    if badge_ids or new_progress['unlock_mask'] != old_progress['unlock_mask']:
+        conn.execute('UPDATE student_progress SET badge_mask = badge_mask | ?, unlock_mask = ? WHERE user_id_code=?',
+                     (badge_mask_of(badge_ids), new_progress['unlock_mask'], uid))
+    if badge_ids:
+        # The rows keep each badge's earned_at for the badge lists.
+        conn.executemany(
+            'INSERT OR IGNORE INTO student_badges (user_id_code, roll_no, class_name, division, badge_id) VALUES (?,?,?,?,?)',
+            [(uid, student['roll_no'], student['class_name'], student['division'], bid) for bid in badge_ids]
+        )
+    old_unlocked = get_unlocked_features(old_progress)
+    new_unlocked = get_unlocked_features(new_progress)
+    return {
+        'progress':              new_progress,
+        'activityRows':          activity_rows,
+        'modeXP':                mode_xp,
+        'averageAccuracy':       round(row['average_accuracy'], 1),
+        'unlockedFeatures':      new_unlocked,
+        'newlyUnlockedFeatures': [f for f in new_unlocked if f not in old_unlocked],
+        'newlyEarnedBadges':     [{**BADGE_MAP[bid], 'earned': True} for bid in badge_ids if bid in BADGE_MAP],
+    }
+
+def session_student():
+    return {
+        'user_id_code': session['user_id_code'],
+        'roll_no':      session.get('roll_no'),
+        'class_name':   session.get('class_name'),
+        'division':     session.get('division'),
+    }
 
 @app.route("/update_xp", methods=["POST"])
 @student_required
+@retry_on_busy
 def update_xp():
     if 'user_id_code' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
-    data         = request.json
-    user_id_code = session['user_id_code']
-    roll_no      = session.get('roll_no')
-    class_name   = session.get('class_name')
-    division     = session.get('division')
-    xp_earned    = data.get('xpEarned', 0)
-    mode         = data.get('mode', '').lower()
-    score        = data.get('score', 0)
-    stars_earned = data.get('starsEarned', 0)
-    difficulty   = data.get('difficulty', 'easy')
-    attempt      = data.get('attempt', None)
+    event = parse_xp_event(request.get_json(silent=True) or {})
+    if event is None:
+        return jsonify({'success': False, 'message': 'Invalid XP event'}), 400
 
-    conn = get_db_connection()
-    progress = conn.execute(
-        'SELECT * FROM student_progress WHERE user_id_code=?',
-        (user_id_code,)
-    ).fetchone()
+    conn = student_connection(session['user_id_code'])
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        outcome = apply_xp_events(conn, session_student(), [event])
+        if outcome is None:
+            conn.rollback()
+            return jsonify({'success': False, 'message': 'Progress not found'})
+        conn.commit()
+        invalidate_student_info(session['user_id_code'])
+        if activity_buffer:
+            activity_buffer.add(outcome['activityRows'])
+    except Exception:
+        conn.rollback()
+        raise
+    conn.close()
 
-    if progress:
-        old_progress = {
-            'xp':              progress['xp'] or 0,
-            'conversation_xp': progress['conversation_xp'] or 0,
-            'roleplay_xp':     progress['roleplay_xp']     or 0,
-            'repeat_xp':       progress['repeat_xp']       or 0,
-            'spellbee_xp':     progress['spellbee_xp']     or 0,
-            'meanings_xp':     progress['meanings_xp']     or 0,
-            'wordpuzzle_xp':   progress['wordpuzzle_xp']   or 0,
-            'grammar_xp':      progress['grammar_xp']      or 0,
-            'total_stars':     progress['total_stars']      or 0,
-            'streak':          progress['streak']           or 0,
-        }
-        old_unlocked   = get_unlocked_features(old_progress)
-        new_total_xp   = old_progress['xp'] + xp_earned
-        mode_xp_column = f"{mode}_xp"
+    progress = outcome['progress']
+    return jsonify({
+        'success':               True,
+        'newXP':                 progress['xp'],
+        'newModeXP':             outcome['modeXP'].get(event['mode'], 0),
+        'mode':                  event['mode'],
+        'streak':                progress['streak'],
+        'newlyUnlockedFeatures': outcome['newlyUnlockedFeatures'],
+        'unlockedFeatures':      outcome['unlockedFeatures'],
+        'nextUnlock':            get_next_unlock(progress),
+        'averageAccuracy':       outcome['averageAccuracy'],
+        'newlyEarnedBadges':     outcome['newlyEarnedBadges']
+    })
 
-        if mode_xp_column in old_progress:
-            new_mode_xp = old_progress[mode_xp_column] + xp_earned
-            old_progress[mode_xp_column] = new_mode_xp
+@app.route("/update_xp_batch", methods=["POST"])
+@student_required
+@retry_on_busy
+def update_xp_batch():
+    """Apply a queue of scored events in one transaction.
+
+    Body: {"clientId": str, "events": [{"seq": int, "xpEarned", "mode", "score", ...}]}.
+    seq increases per clientId; events at or below the last seq applied for that client are
+    skipped, so a client can safely resend its queue after a lost response. Events that fail
+    parse_xp_event are rejected but still consume their seq, so the client drops them.
+    """
+    data      = request.get_json(silent=True) or {}
+    client_id = str(data.get('clientId') or '')[:64]
+    raw       = data.get('events')
+    if not client_id or not isinstance(raw, list):
+        return jsonify({'success': False, 'message': 'clientId and events are required'})
+    if len(raw) > XP_BATCH_MAX:
+        return jsonify({'success': False, 'message': f'At most {XP_BATCH_MAX} events per batch'})
+
+    by_seq = {}
+    for e in raw:
+        seq = e.get('seq') if isinstance(e, dict) else None
+        # bool is an int subclass: true would otherwise pass as seq 1.
+        if isinstance(seq, int) and not isinstance(seq, bool) and seq > 0:
+            by_seq.setdefault(seq, parse_xp_event(e))
+    student = session_student()
+    uid     = student['user_id_code']
+
+    conn = student_connection(uid)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            'SELECT last_seq FROM xp_event_seq WHERE user_id_code=? AND client_id=?', (uid, client_id)
+        ).fetchone()
+        last_seq = row['last_seq'] if row else 0
+        new_seqs = [seq for seq in sorted(by_seq) if seq > last_seq]
+        fresh    = [by_seq[seq] for seq in new_seqs if by_seq[seq]]
+        outcome, progress_row = None, None
+        if fresh:
+            outcome = apply_xp_events(conn, student, fresh)
+            if outcome is None:
+                conn.rollback()
+                return jsonify({'success': False, 'message': 'Progress not found'})
+        if new_seqs:
+            last_seq = new_seqs[-1]
+            conn.execute(
+                '''INSERT INTO xp_event_seq (user_id_code, client_id, last_seq) VALUES (?,?,?)
+                   ON CONFLICT(user_id_code, client_id) DO UPDATE SET last_seq=excluded.last_seq''',
+                (uid, client_id, last_seq)
+            )
+            conn.commit()
         else:
-            new_mode_xp = 0
-
-        old_progress['xp']          = new_total_xp
-        old_progress['total_stars'] = old_progress['total_stars'] + stars_earned
-        new_unlocked = get_unlocked_features(old_progress)
-        newly_unlocked_features = [f for f in new_unlocked if f not in old_unlocked]
-
-        streak = calculate_streak(user_id_code)
-        old_progress['streak'] = streak
-
-        old_avg        = progress['average_accuracy'] or 0
-        total_sessions = progress['total_sessions'] or 0
-        new_sessions   = total_sessions + 1
-        new_avg        = ((old_avg * total_sessions) + score) / new_sessions
-
-        update_query = f'''
-            UPDATE student_progress
-            SET xp=?, {mode_xp_column}=?,
-                total_stars=total_stars+?,
-                total_sessions=total_sessions+1,
-                average_accuracy=?, streak=?, last_active=?
-            WHERE user_id_code=?
-        '''
-        conn.execute(update_query,
-                     (new_total_xp, new_mode_xp, stars_earned, new_avg, streak,
-                      datetime.now(), user_id_code))
-        conn.execute(
-            'INSERT INTO activity_log (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned) VALUES (?,?,?,?,?,?,?,?)',
-            (user_id_code, roll_no, class_name, division, mode, score, xp_earned, stars_earned)
-        )
-
-        newly_earned_badge_ids = check_earned_badges(
-            user_id_code, old_progress,
-            mode=mode, difficulty=difficulty,
-            score=score, stars_earned=stars_earned,
-            attempt=attempt
-        )
-        for badge_id in newly_earned_badge_ids:
-            try:
-                conn.execute(
-                    'INSERT OR IGNORE INTO student_badges (user_id_code, roll_no, class_name, division, badge_id) VALUES (?,?,?,?,?)',
-                    (user_id_code, roll_no, class_name, division, badge_id)
-                )
-            except Exception as e:
-                print(f"Badge insert error: {e}")
-
-        conn.commit()
-        conn.close()
+            conn.rollback()
+        if outcome:
+            invalidate_student_info(uid)
+            if activity_buffer:
+                activity_buffer.add(outcome['activityRows'])
+        else:
+            progress_row = conn.execute('SELECT * FROM student_progress WHERE user_id_code=?', (uid,)).fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.close()
 
-        newly_earned_badges_detail = [
-            {**BADGE_MAP[bid], 'earned': True} for bid in newly_earned_badge_ids if bid in BADGE_MAP
-        ]
-        next_unlock = get_next_unlock(old_progress)
-        return jsonify({
-            'success':               True,
-            'newXP':                 new_total_xp,
-            'newModeXP':             new_mode_xp,
-            'mode':                  mode,
-            'streak':                streak,
-            'newlyUnlockedFeatures': newly_unlocked_features,
-            'unlockedFeatures':      new_unlocked,
-            'nextUnlock':            next_unlock,
-            'averageAccuracy':       round(new_avg, 1),
-            'newlyEarnedBadges':     newly_earned_badges_detail
-        })
+    if outcome:
+        progress = outcome['progress']
+    elif progress_row:
+        progress = progress_snapshot(progress_row)
     else:
-        conn.close()
         return jsonify({'success': False, 'message': 'Progress not found'})
+    unlocked = outcome['unlockedFeatures'] if outcome else get_unlocked_features(progress)
+    return jsonify({
+        'success':               True,
+        'applied':               len(fresh),
+        'rejected':              len(new_seqs) - len(fresh),
+        'skipped':               len(raw) - len(new_seqs),
+        'lastSeq':               last_seq,
+        'newXP':                 progress['xp'],
+        'modeXP':                {mode: progress[col] for mode, col in MODE_XP_COLUMNS.items()},
+        'streak':                progress['streak'],
+        'newlyUnlockedFeatures': outcome['newlyUnlockedFeatures'] if outcome else [],
+        'unlockedFeatures':      unlocked,
+        'nextUnlock':            get_next_unlock(progress),
+        'newlyEarnedBadges':     outcome['newlyEarnedBadges'] if outcome else [],
+    })
 
 # ================= BADGE ROUTES =================
 @app.route("/get_badges")
@@ -3181,7 +4717,7 @@ def get_badges():
     if 'user_id_code' not in session:
         return jsonify({'success': False})
     user_id_code = session['user_id_code']
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     rows = conn.execute(
         'SELECT badge_id, earned_at FROM student_badges WHERE user_id_code=? ORDER BY earned_at DESC',
         (user_id_code,)
@@ -3191,6 +4727,97 @@ def get_badges():
     badges = [{**b, 'earned': b['id'] in earned_ids, 'earned_at': earned_ids.get(b['id'])} for b in ALL_BADGES]
     return jsonify({'success': True, 'badges': badges, 'earnedCount': len(earned_ids), 'totalCount': len(ALL_BADGES)})
 
+# ================= BOOTSTRAP =================
+# One request per page load: /bootstrap/main and /bootstrap/dashboard return everything the
+# page renders up front. The ETag comes from the state versions (see STATE VERSIONS) and the
+# day, read before the payload is built, so the payload is never older than its tag and a
+# revalidation that still matches is a 304 after a primary-key lookup or two. Every tag is
+# salted with the student's id (a shared classroom PC must never revalidate one student's
+# payload for another) and the content version (suggestion tips come from content). Tips are
+# picked at random, so they stay as they are until one of those next changes.
+BOOTSTRAP_FORMAT = 1   # bump when a bootstrap payload changes shape
+
+def student_state_version(user_id_code):
+    row = student_connection(user_id_code).execute(
+        'SELECT version FROM student_progress WHERE user_id_code=?', (user_id_code,)
+    ).fetchone()
+    return row['version'] if row else None
+
+def students_state_version():
+    total = 0
+    for conn in student_connections():
+        total += conn.execute("SELECT value FROM state_versions WHERE name='students'").fetchone()[0]
+        conn.close()
+    return total
+
+def bootstrap_day():
+    # The daily challenge turns over on the server's date, streaks on the UTC one.
+    return f"{date.today().isoformat()}/{datetime.now(timezone.utc).date().isoformat()}"
+
+def bootstrap_student_info(user_id_code, version):
+    info = cached_student_info(user_id_code)
+    if info is None or info.get('version', -1) < version:
+        info = load_student_info(user_id_code)
+        if info is not None:
+            cache_student_info(user_id_code, info)
+    return info
+
+def bootstrap_response(user_id_code, etag_parts, build):
+    parts = (user_id_code, current_content().version, *etag_parts)
+    etag  = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route("/bootstrap/main")
+@student_required
+def bootstrap_main():
+    """Student info with the daily challenge, plus the school leaderboard, for main.html."""
+    user_id_code = session.get('user_id_code')
+    version = student_state_version(user_id_code) if user_id_code else None
+    if version is None:
+        return jsonify({'success': False, 'message': 'Student not found'})
+
+    def build():
+        info = bootstrap_student_info(user_id_code, version)
+        if info is None:
+            return {'success': False, 'message': 'Student not found'}
+        return {
+            'success':     True,
+            'student':     {**info, 'dailyChallenge': get_daily_challenge()},
+            'leaderboard': load_leaderboard("global"),
+        }
+
+    return bootstrap_response(user_id_code, ("main", BOOTSTRAP_FORMAT, bootstrap_day(), version, students_state_version()), build)
+
+@app.route("/bootstrap/dashboard")
+@student_required
+def bootstrap_dashboard():
+    """Student info with the daily challenge, plus progress details, for dashboard.html."""
+    user_id_code = session.get('user_id_code')
+    if user_id_code:
+        # Buffered activity would bump the version while the payload is built; land it first.
+        flush_pending_activity(user_id_code)
+    version = student_state_version(user_id_code) if user_id_code else None
+    if version is None:
+        return jsonify({'success': False, 'message': 'Student not found'})
+
+    def build():
+        info = bootstrap_student_info(user_id_code, version)
+        if info is None:
+            return {'success': False, 'message': 'Student not found'}
+        return {
+            'success':  True,
+            'student':  {**info, 'dailyChallenge': get_daily_challenge()},
+            'progress': load_progress_details(user_id_code),
+        }
+
+    return bootstrap_response(user_id_code, ("dashboard", BOOTSTRAP_FORMAT, bootstrap_day(), version), build)
+
 # ================= TEACHER ROUTES =================
 @app.route("/teacher-dashboard")
 @teacher_required
@@ -3207,27 +4834,43 @@ def get_teacher_info():
 @app.route("/get_all_students")
 @teacher_required
 def get_all_students():
-    conn = get_db_connection()
-    # FIX #5: Single query with badge counts via GROUP BY — eliminates N+1 queries
-    students = conn.execute('''
-        SELECT u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
-               sp.xp, sp.conversation_xp, sp.roleplay_xp,
-               sp.repeat_xp, sp.spellbee_xp, sp.meanings_xp,
-               sp.wordpuzzle_xp, sp.grammar_xp,
-               sp.total_stars, sp.total_sessions, sp.average_accuracy,
-               sp.last_active, sp.streak,
-               COUNT(sb.id) AS badge_count
-        FROM users u
-        LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-        LEFT JOIN student_badges sb   ON u.user_id_code=sb.user_id_code
-        WHERE u.role='student'
-        GROUP BY u.id
-        ORDER BY u.class_name*1 ASC, u.division ASC, sp.xp DESC
-    ''').fetchall()
-    conn.close()
+    # One page per call; badge counts are the popcount of badge_mask.
+    try:
+        page, parts = student_pages(f'''
+            u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
+            sp.xp, sp.conversation_xp, sp.roleplay_xp,
+            sp.repeat_xp, sp.spellbee_xp, sp.meanings_xp,
+            sp.wordpuzzle_xp, sp.grammar_xp,
+            sp.total_stars, sp.total_sessions, sp.average_accuracy,
+            sp.last_active, {STREAK_COLUMN},
+            sp.badge_mask, sp.unlock_mask''',
+            request.args, "rank", snapshot=True)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    summary = None
+    if not request.args.get('cursor'):
+        # Sums rather than averages, so the shards' figures add up.
+        students = xp = stars = accuracy = 0
+        for conn, p in parts:
+            row = conn.execute(f'''
+                SELECT COUNT(*) AS students, SUM(COALESCE(sp.xp, 0)) AS xp,
+                       SUM(COALESCE(sp.total_stars, 0)) AS total_stars,
+                       SUM(COALESCE(sp.average_accuracy, 0)) AS accuracy
+                FROM {p.source} WHERE {p.filters}
+            ''', p.params).fetchone()
+            students += row['students']
+            xp       += row['xp'] or 0
+            stars    += row['total_stars'] or 0
+            accuracy += row['accuracy'] or 0
+        summary = {
+            'totalStudents':   students,
+            'averageXP':       round(xp / students) if students else 0,
+            'totalStars':      stars,
+            'averageAccuracy': round(accuracy / students) if students else 0,
+        }
 
     students_list = []
-    for s in students:
+    for s in page.rows:
         progress_data = {
             'conversation_xp': s['conversation_xp'] or 0,
             'roleplay_xp':     s['roleplay_xp']     or 0,
@@ -3236,6 +4879,7 @@ def get_all_students():
             'meanings_xp':     s['meanings_xp']     or 0,
             'wordpuzzle_xp':   s['wordpuzzle_xp']   or 0,
             'grammar_xp':      s['grammar_xp']       or 0,
+            'unlock_mask':     s['unlock_mask'],
         }
         unlocked_features = get_unlocked_features(progress_data)
         students_list.append({
@@ -3259,57 +4903,51 @@ def get_all_students():
             'lastActive':       s['last_active'],
             'streak':           s['streak'] or 0,
             'unlockedFeatures': unlocked_features,
-            'earnedBadgeCount': s['badge_count'] or 0,
+            'earnedBadgeCount': (s['badge_mask'] or 0).bit_count(),
             'totalBadgeCount':  len(ALL_BADGES),
         })
-    return jsonify({'success': True, 'students': students_list})
+    return jsonify({'success': True, 'sort': page.sort, 'nextCursor': page.next_cursor,
+                    'summary': summary, 'students': students_list})
 
 @app.route("/get_student_details/<user_id_code>")
 @teacher_required
 def get_student_details(user_id_code):
-    conn = get_db_connection()
+    """One student, read live: a teacher opening a student expects their latest sessions, and
+    every query here is an indexed lookup, so the snapshots buy nothing."""
     if user_id_code.startswith('GSS-'):
-        student = conn.execute('''
+        where, params = "u.user_id_code=?", (user_id_code,)
+        conns = [get_db_connection(lookup_shard(user_id_code))]
+    else:
+        class_name = request.args.get('class_name', '')
+        division   = request.args.get('division', '')
+        if class_name and division:
+            where, params = "u.roll_no=? AND u.class_name=? AND u.division=?", (user_id_code, class_name, division)
+            conns = student_connections(class_name)
+        else:
+            where, params = "u.roll_no=?", (user_id_code,)
+            conns = student_connections()
+
+    student = None
+    for conn in conns:
+        student = conn.execute(f'''
             SELECT u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
                    sp.xp, sp.conversation_xp, sp.roleplay_xp,
                    sp.repeat_xp, sp.spellbee_xp, sp.meanings_xp,
                    sp.wordpuzzle_xp, sp.grammar_xp,
-                   sp.total_stars, sp.total_sessions, sp.average_accuracy, sp.last_active, sp.streak
+                   sp.total_stars, sp.total_sessions, sp.average_accuracy, sp.last_active, sp.unlock_mask, {STREAK_COLUMN}
             FROM users u
             LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-            WHERE u.user_id_code=? AND u.role='student'
-        ''', (user_id_code,)).fetchone()
-    else:
-        class_name = request.args.get('class_name', '')
-        division   = request.args.get('division', '')
-        if class_name and division:
-            student = conn.execute('''
-                SELECT u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
-                       sp.xp, sp.conversation_xp, sp.roleplay_xp,
-                       sp.repeat_xp, sp.spellbee_xp, sp.meanings_xp,
-                       sp.wordpuzzle_xp, sp.grammar_xp,
-                       sp.total_stars, sp.total_sessions, sp.average_accuracy, sp.last_active, sp.streak
-                FROM users u
-                LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-                WHERE u.roll_no=? AND u.class_name=? AND u.division=? AND u.role='student'
-            ''', (user_id_code, class_name, division)).fetchone()
-        else:
-            student = conn.execute('''
-                SELECT u.name, u.roll_no, u.user_id_code, u.class_name, u.division,
-                       sp.xp, sp.conversation_xp, sp.roleplay_xp,
-                       sp.repeat_xp, sp.spellbee_xp, sp.meanings_xp,
-                       sp.wordpuzzle_xp, sp.grammar_xp,
-                       sp.total_stars, sp.total_sessions, sp.average_accuracy, sp.last_active, sp.streak
-                FROM users u
-                LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
-                WHERE u.roll_no=? AND u.role='student' LIMIT 1
-            ''', (user_id_code,)).fetchone()
+            WHERE {where} AND u.role='student' LIMIT 1
+        ''', params).fetchone()
+        if student:
+            break
 
     if not student:
         conn.close()
         return jsonify({'success': False, 'message': 'Student not found'})
 
     uid = student['user_id_code']
+    flush_pending_activity(uid)
     activities = conn.execute('''
         SELECT date, mode, score, xp_earned, stars_earned
         FROM activity_log WHERE user_id_code=?
@@ -3331,6 +4969,7 @@ def get_student_details(user_id_code):
         'meanings_xp':     student['meanings_xp']     or 0,
         'wordpuzzle_xp':   student['wordpuzzle_xp']   or 0,
         'grammar_xp':      student['grammar_xp']       or 0,
+        'unlock_mask':     student['unlock_mask'],
     }
     unlocked_features = get_unlocked_features(progress_data)
     next_unlock       = get_next_unlock(progress_data)
@@ -3373,7 +5012,7 @@ def teacher_reset_student_password():
     new_password = data.get("newPassword", "").strip()
     if not user_id_code or not new_password:
         return jsonify({"success": False, "message": "User ID and new password are required"})
-    conn = get_db_connection()
+    conn = student_connection(user_id_code)
     user = conn.execute(
         'SELECT * FROM users WHERE user_id_code=? AND role=?', (user_id_code, 'student')
     ).fetchone()
@@ -3388,6 +5027,37 @@ def teacher_reset_student_password():
     conn.close()
     return jsonify({"success": True, "message": f"Password for {user['name']} (Class {user['class_name']}-{user['division']}) reset successfully"})
 
+# ================= BACKGROUND JOBS =================
+# Periodic maintenance runs on daemon timers, but nothing starts at import: tests, tools and
+# one-off scripts that import app get no threads, and a preloading server doesn't fork a master
+# whose timer threads died with the fork. Servers call start_background_jobs() once per
+# process; gunicorn.conf.py does it in post_worker_init, and `python app.py` before app.run.
+_background_jobs_lock    = threading.Lock()
+_background_jobs_started = False
+
+def start_background_jobs():
+    global _background_jobs_started
+    with _background_jobs_lock:
+        if _background_jobs_started:
+            return
+        _background_jobs_started = True
+    if kv_store:
+        schedule_session_purge()
+    schedule_audio_cleanup()
+    # (every, first run after, job). The first snapshot is taken right away: until it exists,
+    # reporting reads hit the live database.
+    for every, first, job in (
+        (DB_CHECKPOINT_SECS,    DB_CHECKPOINT_SECS,    schedule_wal_checkpoint),
+        (READ_SNAPSHOT_SECS,    0,                     schedule_read_snapshots),
+        (ACTIVITY_ARCHIVE_SECS, ACTIVITY_ARCHIVE_SECS, schedule_activity_archive),
+        (CONTENT_RELOAD_SECS,   CONTENT_RELOAD_SECS,   schedule_content_reload),
+    ):
+        if every > 0:
+            t = threading.Timer(first, job)
+            t.daemon = True
+            t.start()
+
 if __name__ == "__main__":
+    start_background_jobs()
     port = int(os.environ.get("PORT", 10000))  # Render provides PORT
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+gunicorn picks this file up from the working directory: `gunicorn app:app`.
+
+app.py starts no threads at import, so each worker starts its own background jobs (session
+purge, WAL checkpoints, read snapshots, activity archival, content reload) once it has
+booted, after any fork.
+"""
+
+
+def post_worker_init(worker):
+    import app
+
+    app.start_background_jobs()
@@ -0,0 +1,63 @@
+"""
+Shared fixtures. app.py configures itself from the environment at import time, so the
+environment is pinned here before anything imports it: a throwaway working directory, cookie
+sessions, no background timers and no TTS. Each test then gets its own database file.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK = tempfile.mkdtemp(prefix="esc-tests-")
+
+os.environ.update(
+    GROQ_API_KEY="stub", DB_PATH=os.path.join(WORK, "students.db"), SESSION_BACKEND="cookie",
+    CONTENT_DIR=os.path.join(ROOT, "content"), CONTENT_RELOAD_SECS="0", DB_CHECKPOINT_SECS="0",
+    READ_SNAPSHOT_SECS="0", ACTIVITY_ARCHIVE_SECS="0", DISABLE_TTS="1", ACTIVITY_WRITE_BEHIND="",
+    SHARD_BY="",
+)
+os.chdir(WORK)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import app as app_module  # noqa: E402
+
+BASELINE_DB = os.path.join(ROOT, "students.db")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """app.py pointed at a fresh, fully migrated database."""
+    app_module.close_db_connection()
+    path = str(tmp_path / "students.db")
+    monkeypatch.setattr(app_module, "DB_PATH", path)
+    app_module.init_db(path)
+    yield app_module
+    app_module.close_db_connection()
+
+
+@pytest.fixture
+def db(app):
+    return app.get_db_connection()
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """A copy of the checked-in database, still at the pre-migration schema."""
+    path = str(tmp_path / "baseline.db")
+    shutil.copy(BASELINE_DB, path)
+    return path
+
+
+@pytest.fixture
+def student(app):
+    """A signed-up, logged-in student: (test client, user_id_code)."""
+    client = app.app.test_client()
+    r = client.post("/signup", json={"name": "Test Kid", "password": "pw1234", "role": "student",
+                                     "rollNo": "1", "className": "5", "division": "B"}).get_json()
+    assert r["success"], r
+    client.post("/login", json={"role": "student", "userIdCode": r["userIdCode"], "password": "pw1234"})
+    return client, r["userIdCode"]
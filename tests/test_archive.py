@@ -0,0 +1,42 @@
+def counters(db):
+    return {r["name"]: r["value"] for r in db.execute("SELECT name, value FROM stat_counters") if r["value"]}
+
+
+def versions(db, uid):
+    return (db.execute("SELECT version FROM student_progress WHERE user_id_code=?", (uid,)).fetchone()[0],
+            db.execute("SELECT value FROM state_versions WHERE name='students'").fetchone()[0])
+
+
+def test_archival_adjusts_counters_and_versions_in_bulk(app, db, student, tmp_path, monkeypatch):
+    client, uid = student
+    monkeypatch.setattr(app, "ACTIVITY_ARCHIVE_PATH", str(tmp_path / "archive.db"))
+    client.post("/update_xp", json={"xpEarned": 5, "mode": "grammar", "score": 80})
+    db.executemany("INSERT INTO activity_log (user_id_code, mode, score, xp_earned, stars_earned, date, day) "
+                   "VALUES (?, 'grammar', 80, 1, 1, ?, ?)",
+                   [(uid, f"{day} 10:00:00", day) for day in ["2000-01-01"] * 3 + ["2000-01-02"] * 2])
+    db.commit()
+    rollup = db.execute("SELECT SUM(attempts) FROM activity_daily_rollup").fetchone()[0]
+    version, students_version = versions(db, uid)
+
+    assert app.archive_activity() == 5
+
+    db = app.get_db_connection()
+    assert "activity:2000-01-01" not in counters(db) and "activity:2000-01-02" not in counters(db)
+    stored = counters(db)
+    app.rebuild_stat_counters(db)
+    assert counters(db) == stored
+    db.rollback()
+    # One version bump for the student, none for the leaderboards; the rollup keeps the history.
+    assert versions(db, uid) == (version + 1, students_version)
+    assert db.execute("SELECT SUM(attempts) FROM activity_daily_rollup").fetchone()[0] == rollup
+    assert db.execute("SELECT COUNT(*) FROM activity_archiving").fetchone()[0] == 0
+
+
+def test_other_activity_deletes_still_fire_the_triggers(app, db, student):
+    client, uid = student
+    client.post("/update_xp", json={"xpEarned": 5, "mode": "grammar", "score": 80})
+    version, _ = versions(db, uid)
+    db.execute("DELETE FROM activity_log WHERE user_id_code=?", (uid,))
+    db.commit()
+    assert not [name for name in counters(db) if name.startswith("activity:")]
+    assert versions(db, uid)[0] == version + 1
@@ -0,0 +1,16 @@
+def test_importing_app_starts_no_jobs(app):
+    assert not app._background_jobs_started
+
+
+def test_jobs_start_once_per_process(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(app, "_background_jobs_started", False)
+    monkeypatch.setattr(app, "kv_store", object())
+    for name in ("schedule_session_purge", "schedule_audio_cleanup"):
+        monkeypatch.setattr(app, name, lambda name=name: started.append(name))
+    for setting in ("DB_CHECKPOINT_SECS", "READ_SNAPSHOT_SECS", "ACTIVITY_ARCHIVE_SECS", "CONTENT_RELOAD_SECS"):
+        monkeypatch.setattr(app, setting, 0)
+
+    app.start_background_jobs()
+    app.start_background_jobs()
+    assert started == ["schedule_session_purge", "schedule_audio_cleanup"]
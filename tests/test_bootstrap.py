@@ -0,0 +1,28 @@
+def sign_in(app, name):
+    client = app.app.test_client()
+    r = client.post("/signup", json={"name": name, "password": "pw1234", "role": "student",
+                                     "rollNo": "2", "className": "5", "division": "B"}).get_json()
+    client.post("/login", json={"role": "student", "userIdCode": r["userIdCode"], "password": "pw1234"})
+    return client
+
+
+def test_bootstrap_revalidates_until_the_student_changes(student):
+    client, _ = student
+    for page in ("/bootstrap/main", "/bootstrap/dashboard"):
+        first = client.get(page)
+        assert first.status_code == 200 and first.get_json()["success"]
+        assert client.get(page, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    tag = client.get("/bootstrap/dashboard").headers["ETag"]
+    client.post("/update_xp", json={"xpEarned": 5, "mode": "grammar", "score": 80})
+    changed = client.get("/bootstrap/dashboard", headers={"If-None-Match": tag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != tag
+
+
+def test_bootstrap_tags_never_match_across_students(app, student):
+    client, _ = student
+    other = sign_in(app, "Other Kid")
+    for page in ("/bootstrap/main", "/bootstrap/dashboard"):
+        tag = client.get(page).headers["ETag"]
+        # Same versions, same day, same browser: the other student still gets their own payload.
+        assert other.get(page, headers={"If-None-Match": tag}).status_code == 200
@@ -0,0 +1,50 @@
+def board(client, scope="global"):
+    return client.get(f"/get_leaderboard?scope={scope}").get_json()
+
+
+def test_student_gets_their_rank_in_any_scope(student):
+    client, _ = student
+    client.post("/update_xp", json={"xpEarned": 10, "mode": "conversation", "score": 90})
+    for scope in ("global", "class", "division"):
+        r = board(client, scope)
+        assert r["scope"] == scope and r["my_rank"] == 1
+        assert [row["name"] for row in r["leaderboard"]] == ["Test Kid"]
+
+
+def test_teachers_and_admins_see_the_global_board_without_a_rank(app, student):
+    teacher, admin = app.app.test_client(), app.app.test_client()
+    with teacher.session_transaction() as s:
+        s.update(user_id=99, role="teacher")
+    with admin.session_transaction() as s:
+        s["is_admin"] = True
+    for client in (teacher, admin):
+        r = board(client, "division")
+        assert r["scope"] == "global" and r["my_rank"] is None
+        assert [row["name"] for row in r["leaderboard"]] == ["Test Kid"]
+
+
+def test_leaderboard_requires_a_login(app):
+    assert app.app.test_client().get("/get_leaderboard").status_code == 302
+
+
+def test_student_without_a_progress_row_gets_no_rank(app, db, student):
+    client, uid = student
+    other = app.app.test_client()
+    other.post("/signup", json={"name": "Other Kid", "password": "pw1234", "role": "student",
+                                "rollNo": "2", "className": "5", "division": "B"})
+    db.execute("DELETE FROM student_progress WHERE user_id_code=?", (uid,))
+    db.commit()
+    r = board(client)
+    assert r["my_rank"] is None and [row["name"] for row in r["leaderboard"]] == ["Other Kid"]
+
+
+def test_legacy_null_xp_ranks_as_zero(app, db, student):
+    client, uid = student
+    other = app.app.test_client()
+    r = other.post("/signup", json={"name": "Other Kid", "password": "pw1234", "role": "student",
+                                    "rollNo": "2", "className": "5", "division": "B"}).get_json()
+    other.post("/login", json={"role": "student", "userIdCode": r["userIdCode"], "password": "pw1234"})
+    other.post("/update_xp", json={"xpEarned": 10, "mode": "conversation", "score": 90})
+    db.execute("UPDATE student_progress SET xp=NULL WHERE user_id_code=?", (uid,))
+    db.commit()
+    assert board(client)["my_rank"] == 2
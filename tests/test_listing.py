@@ -0,0 +1,25 @@
+def listed(app, db, sort):
+    return [r["name"] for r in app.student_page(db, "u.name", {"sort": sort}, sort).rows]
+
+
+def test_students_without_progress_rows_are_backfilled_and_listed(app, db):
+    db.execute("INSERT INTO users (role, name, user_id_code, roll_no, class_name, division, password_hash) "
+               "VALUES ('student', 'Legacy', 'GSS-LEGACY', '7', '4', 'C', 'x')")
+    db.commit()
+    app.add_missing_progress_rows(db)
+    db.commit()
+
+    row = db.execute("SELECT xp, class_name, division FROM student_progress WHERE user_id_code='GSS-LEGACY'").fetchone()
+    assert tuple(row) == (0, "4", "C")
+    assert listed(app, db, "rank") == listed(app, db, "class") == ["Legacy"]
+
+
+def test_login_recreates_a_missing_progress_row(app, db, student):
+    client, uid = student
+    db.execute("DELETE FROM student_progress WHERE user_id_code=?", (uid,))
+    db.commit()
+    assert listed(app, db, "rank") == []
+
+    r = client.post("/login", json={"role": "student", "userIdCode": uid, "password": "pw1234"}).get_json()
+    assert r["success"]
+    assert listed(app, db, "rank") == ["Test Kid"]
@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def columns(conn, table):
+    return {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def counters(conn):
+    return {r["name"]: r["value"] for r in conn.execute("SELECT name, value FROM stat_counters") if r["value"]}
+
+
+@pytest.fixture
+def migrated(app, baseline_db):
+    before = connect(baseline_db)
+    counts = {t: before.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("users", "student_progress", "student_badges")}
+    before.close()
+    app.init_db(baseline_db)
+    conn = connect(baseline_db)
+    yield conn, counts
+    conn.close()
+
+
+def test_fresh_database_records_every_migration(db, app):
+    versions = [r[0] for r in db.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == sorted(v for v, _, _ in app.SCHEMA_MIGRATIONS)
+    assert versions == list(range(1, len(app.SCHEMA_MIGRATIONS) + 1))
+
+
+def test_baseline_database_migrates_to_latest(app, migrated):
+    conn, counts = migrated
+    assert app.applied_schema_version(conn) == max(v for v, _, _ in app.SCHEMA_MIGRATIONS)
+    assert {"streak", "last_active_day", "badge_mask", "unlock_mask", "version"} <= columns(conn, "student_progress")
+    assert {"day"} <= columns(conn, "activity_log")
+    for table in ("stat_counters", "activity_daily_rollup", "student_mode_stats", "state_versions", "xp_event_seq"):
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone(), table
+    for table, n in counts.items():
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == n, table
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_migrating_twice_is_a_no_op(app, migrated):
+    conn, _ = migrated
+    schema = conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall()
+    app.init_db(conn.execute("PRAGMA database_list").fetchone()["file"])
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(app.SCHEMA_MIGRATIONS)
+    assert conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall() == schema
+
+
+def test_backfilled_counters_and_aggregates_match_base_tables(app, migrated):
+    conn, _ = migrated
+    stored = counters(conn)
+    app.rebuild_stat_counters(conn)
+    assert counters(conn) == stored
+    conn.rollback()
+
+    rollup = conn.execute("SELECT COALESCE(SUM(attempts), 0) FROM activity_daily_rollup").fetchone()[0]
+    raw = conn.execute('''SELECT COUNT(*) FROM activity_log
+                          WHERE day IS NOT NULL AND user_id_code IN (SELECT user_id_code FROM users)''').fetchone()[0]
+    assert rollup == raw
+    mode_stats = conn.execute("SELECT COALESCE(SUM(attempts), 0) FROM student_mode_stats").fetchone()[0]
+    assert mode_stats == rollup
+
+
+def test_backfilled_masks_match_badges_and_xp(app, migrated):
+    conn, _ = migrated
+    for row in conn.execute("SELECT * FROM student_progress"):
+        earned = [r[0] for r in conn.execute("SELECT badge_id FROM student_badges WHERE user_id_code=?",
+                                             (row["user_id_code"],)) if r[0] in app.BADGE_BITS]
+        assert row["badge_mask"] == app.badge_mask_of(earned)
+        assert row["unlock_mask"] == app.unlock_mask_for(dict(row))
@@ -0,0 +1,15 @@
+import pytest
+
+from check_query_plans import CHECKS, plan_ok, plan_of, seed
+
+
+@pytest.fixture
+def seeded(db):
+    seed(db)
+    return db
+
+
+@pytest.mark.parametrize("name, sql, params, expected", CHECKS, ids=[c[0] for c in CHECKS])
+def test_query_uses_index(seeded, name, sql, params, expected):
+    plan = plan_of(seeded, sql, params)
+    assert plan_ok(name, plan, expected), plan
@@ -0,0 +1,38 @@
+import pytest
+
+
+@pytest.fixture
+def server_sessions(app, tmp_path, monkeypatch):
+    """Server-side sessions backed by a throwaway kv store."""
+    store = app.SqliteKVStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(app, "kv_store", store)
+    monkeypatch.setattr(app.app, "session_interface", app.ServerSideSessionInterface(store, 3600))
+    return store
+
+
+def draws(app, bag_key, items, n):
+    return [app.draw_item(bag_key, items)[1] for _ in range(n)]
+
+
+def test_every_item_is_served_before_any_repeats(app):
+    items = list("abcdef")
+    with app.app.test_request_context():
+        seen = draws(app, "t:easy", items, 12)
+    assert sorted(seen[:6]) == sorted(seen[6:]) == list(range(6))
+    assert seen[5] != seen[6]
+
+
+def test_server_side_bags_live_outside_the_session(app, server_sessions):
+    items = list("abcdef")
+    with app.app.test_request_context():
+        first = draws(app, "t:easy", items, 3)
+        sid = app.session.sid
+        assert "item_bags" not in app.session and not app.session.modified
+        # Another request saving the whole session must not undo these draws.
+        app.session["name"] = "Kid"
+        app.app.session_interface.save_session(app.app, app.session, app.app.response_class())
+        rest = draws(app, "t:easy", items, 3)
+        other = draws(app, "t:hard", items, 1)
+    assert sorted(first + rest) == list(range(6))
+    assert server_sessions.get(app.SAMPLER_NAMESPACE, f"{sid}:t:easy")[0][2:] == []
+    assert server_sessions.get(app.SAMPLER_NAMESPACE, f"{sid}:t:hard")[0][1] == other[0]
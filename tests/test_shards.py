@@ -0,0 +1,161 @@
+import glob
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def sharded(app, tmp_path, monkeypatch):
+    """SHARD_BY=class, with shards under a throwaway directory. Returns that directory."""
+    shard_dir = str(tmp_path / "shards")
+    monkeypatch.setattr(app, "SHARD_BY", "class")
+    monkeypatch.setattr(app, "SHARD_DIR", shard_dir)
+    monkeypatch.setattr(app, "CLASS_SHARDS", app.VALID_CLASSES)
+    monkeypatch.setattr(app, "_ready_shards", {""})
+    monkeypatch.setattr(app, "ACTIVITY_ARCHIVE_PATH", str(tmp_path / "archive.db"))
+    return shard_dir
+
+
+@pytest.fixture
+def admin(app):
+    client = app.app.test_client()
+    with client.session_transaction() as s:
+        s["is_admin"] = True
+    return client
+
+
+def sign_up(app, name, class_name, division="A", roll="1"):
+    client = app.app.test_client()
+    r = client.post("/signup", json={"name": name, "password": "pw1234", "role": "student", "rollNo": roll,
+                                     "className": class_name, "division": division}).get_json()
+    assert r["success"], r
+    client.post("/login", json={"role": "student", "userIdCode": r["userIdCode"], "password": "pw1234"})
+    return client, r["userIdCode"]
+
+
+def xp(client, amount):
+    assert client.post("/update_xp", json={"xpEarned": amount, "mode": "grammar", "score": 80}).get_json()["success"]
+
+
+def shard_files(shard_dir):
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(shard_dir, "class_*[0-9].db")))
+
+
+def shard_db(shard_dir, class_name):
+    conn = sqlite3.connect(os.path.join(shard_dir, f"class_{class_name}.db"))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def user_ids(app, class_name, *uids):
+    conn = app.get_db_connection(class_name)
+    return [conn.execute("SELECT id FROM users WHERE user_id_code=?", (uid,)).fetchone()[0] for uid in uids]
+
+
+def test_importing_the_app_creates_no_shards(app, tmp_path):
+    env = {**os.environ, "SHARD_BY": "class", "SHARD_DIR": str(tmp_path / "shards"),
+           "DB_PATH": str(tmp_path / "students.db"), "SESSION_DB_PATH": str(tmp_path / "sessions.db"),
+           "PYTHONPATH": os.path.dirname(app.__file__)}
+    subprocess.run([sys.executable, "-c", "import app"], cwd=tmp_path, env=env, check=True, capture_output=True)
+    assert os.path.exists(tmp_path / "students.db")
+    assert not os.path.exists(tmp_path / "shards")
+
+
+def test_signup_creates_and_routes_to_its_class_shard(app, db, sharded):
+    client, uid = sign_up(app, "Asha", "5")
+    assert shard_files(sharded) == ["class_5.db"]
+    assert app.live_shards() == ["", "5"]
+
+    xp(client, 10)
+    shard = shard_db(sharded, "5")
+    assert shard.execute("SELECT xp FROM student_progress WHERE user_id_code=?", (uid,)).fetchone()[0] == 10
+    assert db.execute("SELECT COUNT(*) FROM users WHERE user_id_code=?", (uid,)).fetchone()[0] == 0
+    assert db.execute("SELECT shard FROM shard_directory WHERE user_id_code=?", (uid,)).fetchone()[0] == "5"
+    assert [r[0] for r in shard.execute("SELECT version FROM schema_version")] == \
+        [v for v, _, _ in sorted(app.SCHEMA_MIGRATIONS)]
+
+
+def test_leaderboard_merges_shards_and_ranks_across_them(app, student, sharded):
+    legacy, _ = student  # Class 5-B, created in the global database before sharding
+    a, _ = sign_up(app, "Asha", "3")
+    b, _ = sign_up(app, "Bilal", "5", roll="2")
+    c, _ = sign_up(app, "Chen", "5", roll="3")
+    for client, amount in ((a, 25), (b, 5), (c, 20), (legacy, 15)):
+        xp(client, amount)
+
+    r = b.get("/get_leaderboard?scope=global").get_json()
+    assert [row["name"] for row in r["leaderboard"]] == ["Asha", "Chen", "Test Kid", "Bilal"]
+    assert [row["rank"] for row in r["leaderboard"]] == [1, 2, 3, 4]
+    assert r["my_rank"] == 4
+    assert legacy.get("/get_leaderboard?scope=global").get_json()["my_rank"] == 3
+
+    r = b.get("/get_leaderboard?scope=class").get_json()
+    assert [row["name"] for row in r["leaderboard"]] == ["Chen", "Test Kid", "Bilal"]
+    assert r["my_rank"] == 3
+
+
+def test_admin_listing_pages_through_every_shard_in_order(app, admin, student, sharded):
+    for name, class_name, division in (("Zara", "2", "A"), ("Asha", "3", "B"), ("Omar", "3", "A"),
+                                       ("Bilal", "5", "A"), ("Chen", "10", "C")):
+        sign_up(app, name, class_name, division)
+
+    first = admin.get("/admin/students?limit=2").get_json()
+    assert first["total"] == 6
+    pages, page = [first], first
+    while page["nextCursor"]:
+        page = admin.get(f"/admin/students?limit=2&cursor={page['nextCursor']}").get_json()
+        pages.append(page)
+    names = [s["name"] for p in pages for s in p["students"]]
+    assert names == ["Zara", "Omar", "Asha", "Bilal", "Test Kid", "Chen"]
+    assert all(len(p["students"]) <= 2 for p in pages)
+
+
+def test_bulk_action_spans_shards_or_does_nothing(app, admin, sharded, monkeypatch):
+    _, three = sign_up(app, "Asha", "3")
+    _, five = sign_up(app, "Bilal", "5")
+    ids = user_ids(app, "3", three) + user_ids(app, "5", five)
+
+    assert admin.post("/admin/students/bulk_action", json={"action": "deactivate", "studentIds": ids}).get_json()["success"]
+    for class_name, uid in (("3", three), ("5", five)):
+        assert shard_db(sharded, class_name).execute(
+            "SELECT is_active FROM users WHERE user_id_code=?", (uid,)).fetchone()[0] == 0
+
+    # With class 5's write lock held elsewhere, the delete touches no shard at all.
+    monkeypatch.setattr(app, "DB_BUSY_TIMEOUT_MS", 50)
+    monkeypatch.setattr(app, "DB_BUSY_RETRIES", 0)
+    app.close_db_connection()
+    blocker = sqlite3.connect(os.path.join(sharded, "class_5.db"), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    r = admin.post("/admin/students/bulk_action", json={"action": "delete", "studentIds": ids})
+    assert r.status_code == 500
+    assert shard_db(sharded, "3").execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+    assert app.get_db_connection().execute("SELECT COUNT(*) FROM shard_directory").fetchone()[0] == 2
+    blocker.rollback()
+    blocker.close()
+
+    assert admin.post("/admin/students/bulk_action", json={"action": "delete", "studentIds": ids}).get_json()["success"]
+    for class_name in ("3", "5"):
+        assert shard_db(sharded, class_name).execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    directory = app.get_db_connection()
+    assert directory.execute("SELECT COUNT(*) FROM shard_directory").fetchone()[0] == 0
+    assert directory.execute("SELECT COUNT(*) FROM admin_audit_log WHERE action='BULK_DELETE_STUDENT'").fetchone()[0] == 2
+
+
+def test_delete_account_clears_the_directory_and_the_shard_archive(app, sharded):
+    client, uid = sign_up(app, "Asha", "5")
+    shard = app.get_db_connection("5")
+    shard.execute("INSERT INTO activity_log (user_id_code, mode, score, xp_earned, stars_earned, date, day) "
+                  "VALUES (?, 'grammar', 80, 1, 1, '2000-01-01 10:00:00', '2000-01-01')", (uid,))
+    shard.commit()
+    assert app.archive_activity() == 1
+    archive = sqlite3.connect(app.archive_path("5"))
+    assert archive.execute("SELECT COUNT(*) FROM activity_log WHERE user_id_code=?", (uid,)).fetchone()[0] == 1
+
+    assert client.post("/delete_account").get_json()["success"]
+    assert archive.execute("SELECT COUNT(*) FROM activity_log WHERE user_id_code=?", (uid,)).fetchone()[0] == 0
+    assert app.get_db_connection().execute("SELECT COUNT(*) FROM shard_directory").fetchone()[0] == 0
+    assert shard_db(sharded, "5").execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    archive.close()
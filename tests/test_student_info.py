@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def cache(app, tmp_path, monkeypatch):
+    store = app.SqliteKVStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(app, "student_info_cache", store)
+    return store
+
+
+def test_writes_drop_the_cached_payload(app, student, cache):
+    client, uid = student
+    assert client.get("/get_student_info").get_json()["student"]["xp"] == 0
+    assert app.cached_student_info(uid) is not None
+    client.post("/update_xp", json={"xpEarned": 5, "mode": "grammar", "score": 80})
+    assert app.cached_student_info(uid) is None
+    assert client.get("/get_student_info").get_json()["student"]["xp"] == 5
+
+
+def test_delete_account_drops_the_cached_payload(app, student, cache):
+    client, uid = student
+    client.get("/get_student_info")
+    assert client.post("/delete_account").get_json()["success"]
+    assert app.cached_student_info(uid) is None
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def buffered(app, monkeypatch):
+    """Turn on ACTIVITY_WRITE_BEHIND with the given flush thresholds."""
+    def enable(flush_secs=60, flush_rows=1000):
+        buffer = app.ActivityWriteBehind(flush_secs, flush_rows)
+        monkeypatch.setattr(app, "activity_buffer", buffer)
+        return buffer
+    return enable
+
+
+def xp(client):
+    return client.post("/update_xp", json={"xpEarned": 5, "mode": "grammar", "score": 80}).get_json()
+
+
+def logged(db, uid):
+    db.commit()  # end any read transaction, so the next count sees the flusher's commits
+    return db.execute("SELECT COUNT(*) FROM activity_log WHERE user_id_code=?", (uid,)).fetchone()[0]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_xp_commits_while_activity_waits_in_the_buffer(db, student, buffered):
+    client, uid = student
+    buffer = buffered()
+    assert xp(client)["success"]
+    assert db.execute("SELECT xp FROM student_progress WHERE user_id_code=?", (uid,)).fetchone()[0] == 5
+    assert logged(db, uid) == 0 and buffer.has_pending(uid)
+
+
+def test_buffer_flushes_once_enough_rows_are_pending(db, student, buffered):
+    client, uid = student
+    buffered(flush_rows=3)
+    for _ in range(2):
+        xp(client)
+    time.sleep(0.2)
+    assert logged(db, uid) == 0
+    xp(client)
+    wait_for(lambda: logged(db, uid) == 3)
+
+
+def test_buffer_flushes_on_its_interval(db, student, buffered):
+    client, uid = student
+    buffered(flush_secs=0.05)
+    xp(client)
+    wait_for(lambda: logged(db, uid) == 1)
+
+
+def test_progress_details_flush_the_students_rows_first(app, db, student, buffered):
+    client, uid = student
+    buffer = buffered()
+    xp(client)
+    details = client.get("/get_progress_details").get_json()
+    assert not buffer.has_pending(uid) and logged(db, uid) == 1
+    assert details["modeStats"]["grammar"]["totalAttempts"] == 1
+    assert [r["mode"] for r in details["recentSessions"]] == ["grammar"]
+
+
+def test_delete_account_flushes_before_deleting(app, db, student, buffered):
+    client, uid = student
+    buffer = buffered()
+    xp(client)
+    assert client.post("/delete_account").get_json()["success"]
+    assert not buffer.has_pending()
+    assert db.execute("SELECT COUNT(*) FROM users WHERE user_id_code=?", (uid,)).fetchone()[0] == 0
+    assert logged(db, uid) == 0
+
+
+def test_rows_for_a_student_deleted_meanwhile_are_dropped(app, db, student, buffered):
+    client, uid = student
+    other = app.app.test_client()
+    r = other.post("/signup", json={"name": "Other Kid", "password": "pw1234", "role": "student",
+                                    "rollNo": "2", "className": "5", "division": "B"}).get_json()
+    other.post("/login", json={"role": "student", "userIdCode": r["userIdCode"], "password": "pw1234"})
+    buffer = buffered()
+    xp(client)
+    xp(other)
+    # Deleted through another worker, whose flush_pending_activity can't see this buffer.
+    db.execute("DELETE FROM users WHERE user_id_code=?", (uid,))
+    db.commit()
+
+    buffer.flush()
+    assert not buffer.has_pending()
+    assert logged(db, uid) == 0 and logged(db, r["userIdCode"]) == 1
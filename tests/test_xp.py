@@ -0,0 +1,144 @@
+def xp(client, amount, mode="conversation", score=90, stars=1, **extra):
+    r = client.post("/update_xp", json={"xpEarned": amount, "mode": mode, "score": score,
+                                        "starsEarned": stars, "difficulty": "easy", **extra})
+    return r.get_json()
+
+
+def batch(client, client_id, events):
+    return client.post("/update_xp_batch", json={"clientId": client_id, "events": events}).get_json()
+
+
+def progress(db, uid):
+    return db.execute("SELECT * FROM student_progress WHERE user_id_code=?", (uid,)).fetchone()
+
+
+def counters(db):
+    return {r["name"]: r["value"] for r in db.execute("SELECT name, value FROM stat_counters") if r["value"]}
+
+
+def test_every_award_is_added_in_place(db, student):
+    client, uid = student
+    for _ in range(5):
+        assert xp(client, 4, mode="grammar")["success"]
+    row = progress(db, uid)
+    assert (row["xp"], row["grammar_xp"], row["total_sessions"], row["total_stars"]) == (20, 20, 5, 5)
+
+
+def test_accuracy_average_survives_legacy_nulls_and_integers(db, student):
+    client, uid = student
+    db.execute("UPDATE student_progress SET average_accuracy=NULL, total_sessions=NULL, xp=NULL WHERE user_id_code=?", (uid,))
+    db.commit()
+    r = xp(client, 5, score=85)
+    assert r["success"] and r["newXP"] == 5 and r["averageAccuracy"] == 85.0
+
+    # Integer accuracy and score: (80*1 + 85) / 2 must not truncate to 82.
+    db.execute("UPDATE student_progress SET average_accuracy=80, total_sessions=1 WHERE user_id_code=?", (uid,))
+    db.commit()
+    assert xp(client, 5, score=85)["averageAccuracy"] == 82.5
+
+
+def test_masks_follow_xp_writes(app, db, student):
+    client, uid = student
+    r = xp(client, 20)
+    assert {b["id"] for b in r["newlyEarnedBadges"]} == {"first_xp", "conv_10"}
+    for _ in range(2):
+        r = xp(client, 20)
+    assert "roleplay" in r["unlockedFeatures"]
+
+    row = progress(db, uid)
+    earned = [r[0] for r in db.execute("SELECT badge_id FROM student_badges WHERE user_id_code=?", (uid,))]
+    assert row["badge_mask"] == app.badge_mask_of(earned)
+    assert sorted(app.badge_ids_in(row["badge_mask"])) == sorted(earned)
+    assert row["unlock_mask"] == app.unlock_mask_for(dict(row))
+    assert app.get_unlocked_features(dict(row)) == app.get_unlocked_features({**dict(row), "unlock_mask": None})
+
+    # Badges are only ever awarded once.
+    again = xp(client, 20)
+    assert not {b["id"] for b in again["newlyEarnedBadges"]} & set(earned)
+
+
+def test_admin_reset_clears_masks(app, db, student):
+    client, uid = student
+    xp(client, 60)
+    admin = app.app.test_client()
+    with admin.session_transaction() as s:
+        s["is_admin"] = True
+    sid = db.execute("SELECT id FROM users WHERE user_id_code=?", (uid,)).fetchone()[0]
+    assert admin.post("/admin/students/reset_progress", json={"studentId": sid}).get_json()["success"]
+    row = progress(db, uid)
+    assert (row["xp"], row["badge_mask"], row["unlock_mask"]) == (0, 0, app.UNLOCK_MASK_BASE)
+
+
+def test_batch_skips_sequence_numbers_already_applied(db, student):
+    client, uid = student
+    events = [{"seq": n, "xpEarned": 5, "mode": "grammar", "score": 80} for n in (1, 2)]
+    r = batch(client, "tab-1", events)
+    assert (r["applied"], r["skipped"], r["lastSeq"], r["newXP"]) == (2, 0, 2, 10)
+
+    # A resend after a lost response, plus one new event.
+    r = batch(client, "tab-1", events + [{"seq": 3, "xpEarned": 5, "mode": "grammar", "score": 80}])
+    assert (r["applied"], r["skipped"], r["lastSeq"], r["newXP"]) == (1, 2, 3, 15)
+
+    # Sequence numbers are per client id.
+    r = batch(client, "tab-2", events[:1])
+    assert (r["applied"], r["newXP"]) == (1, 20)
+
+    assert db.execute("SELECT COUNT(*) FROM activity_log WHERE user_id_code=?", (uid,)).fetchone()[0] == 4
+    assert progress(db, uid)["grammar_xp"] == 20
+
+
+def test_batch_rejects_missing_client_id(student):
+    client, _ = student
+    assert not batch(client, "", [{"seq": 1, "xpEarned": 5, "mode": "grammar"}])["success"]
+
+
+def test_batch_ignores_events_without_an_integer_seq(db, student):
+    client, uid = student
+    r = batch(client, "tab-1", [{"seq": True, "xpEarned": 5, "mode": "grammar", "score": 80},
+                                {"seq": "2", "xpEarned": 5, "mode": "grammar", "score": 80},
+                                {"seq": 1.0, "xpEarned": 5, "mode": "grammar", "score": 80}])
+    assert (r["applied"], r["lastSeq"], r["newXP"]) == (0, 0, 0)
+
+    # The bool didn't use up seq 1.
+    r = batch(client, "tab-1", [{"seq": 1, "xpEarned": 5, "mode": "grammar", "score": 80}])
+    assert (r["applied"], r["lastSeq"], r["newXP"]) == (1, 1, 5)
+
+
+def test_trigger_counters_match_a_full_recount(app, db, student):
+    client, uid = student
+    for _ in range(3):
+        assert xp(client, 10)["success"]
+    assert client.post("/complete_daily").get_json()["success"]
+    other = app.app.test_client()
+    other.post("/signup", json={"name": "Gone", "password": "pw1234", "role": "student",
+                                "rollNo": "2", "className": "5", "division": "B"})
+    db.execute("DELETE FROM users WHERE name='Gone'")
+    db.commit()
+
+    stored = counters(db)
+    assert stored["students_total"] == 1
+    assert stored["total_xp"] == progress(db, uid)["xp"] == 33
+    app.rebuild_stat_counters(db)
+    assert counters(db) == stored
+    db.rollback()
+
+
+def test_out_of_range_awards_and_unknown_modes_are_rejected(app, db, student):
+    client, uid = student
+    for bad in ({"xpEarned": app.XP_EVENT_MAX + 1}, {"xpEarned": -5}, {"xpEarned": 2.5},
+                {"xpEarned": True}, {"mode": "daily"}, {"score": 1000}):
+        body = {"xpEarned": 5, "mode": "grammar", "score": 80, **bad}
+        assert client.post("/update_xp", json=body).status_code == 400, bad
+    assert progress(db, uid)["xp"] == 0
+
+
+def test_batch_rejects_bad_events_but_consumes_their_seq(db, student):
+    client, uid = student
+    r = batch(client, "tab-1", [{"seq": 1, "xpEarned": 5, "mode": "grammar", "score": 80},
+                                {"seq": 2, "xpEarned": 10 ** 6, "mode": "grammar", "score": 80},
+                                {"seq": 3, "xpEarned": 5, "mode": "nope", "score": 80}])
+    assert (r["applied"], r["rejected"], r["lastSeq"], r["newXP"]) == (1, 2, 3, 5)
+
+    r = batch(client, "tab-1", [{"seq": 4, "xpEarned": -1, "mode": "grammar"}])
+    assert (r["applied"], r["rejected"], r["lastSeq"], r["newXP"]) == (0, 1, 4, 5)
+    assert progress(db, uid)["xp"] == 5
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: per-request cost of picking a practice item.
+
+Compares the old approach (rebuilding the category/word-pool literals on every
+call, emulated here by copying every list out of the source dicts) with the
+precompiled corpora lookups now used by generate_repeat_sentence and
+generate_spell_word. Reports mean time and bytes allocated per call.
+
+Importing app runs its normal startup, so run this from a scratch copy:
+
+    GROQ_API_KEY=stub python tools/bench_corpora.py
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "stub")
+
+import app  # noqa: E402
+
+ROUNDS = 20000
+
+# The legacy code kept these as Python literals; load the same data from content/.
+with open(os.path.join(app.CONTENT_DIR, "repeat_sentences.json"), encoding="utf-8") as f:
+    REPEAT_SENTENCES = json.load(f)
+with open(os.path.join(app.CONTENT_DIR, "spell_words.json"), encoding="utf-8") as f:
+    SPELL_WORDS = json.load(f)
+
+
+def legacy_repeat_lookup(category="food", difficulty="medium"):
+    category_details = {c: {d: list(v) for d, v in levels.items()} for c, levels in REPEAT_SENTENCES.items()}
+    cat_info = category_details.get(category, category_details["civic_sense"])
+    return cat_info.get(difficulty, cat_info["easy"])
+
+
+def legacy_spell_lookup(difficulty="hard"):
+    word_pools = {d: list(w) for d, w in SPELL_WORDS.items()}
+    return word_pools.get(difficulty, word_pools["easy"])
+
+
+def compiled_repeat_lookup(category="food", difficulty="medium"):
+    return app.repeat_corpus(category, difficulty)
+
+
+def compiled_spell_lookup(difficulty="hard"):
+    return app.spell_corpus(difficulty)
+
+
+def measure(fn, rounds=ROUNDS):
+    """Return (microseconds per call, peak bytes allocated per call)."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - started
+
+    samples = 200
+    total_peak = 0
+    tracemalloc.start()
+    for _ in range(samples):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        total_peak += peak - current
+    tracemalloc.stop()
+    return elapsed / rounds * 1e6, total_peak / samples
+
+
+def main():
+    print(f"{'lookup':<28}{'us/call':>10}{'bytes/call':>14}")
+    for name, fn in [
+        ("repeat (legacy rebuild)", legacy_repeat_lookup),
+        ("repeat (precompiled)",    compiled_repeat_lookup),
+        ("spell (legacy rebuild)",  legacy_spell_lookup),
+        ("spell (precompiled)",     compiled_spell_lookup),
+    ]:
+        us, allocated = measure(fn)
+        print(f"{name:<28}{us:>10.2f}{allocated:>14.0f}")
+
+    with app.app.test_request_context():
+        for name, fn in [
+            ("generate_repeat_sentence", lambda: app.generate_repeat_sentence("food", "medium")),
+            ("generate_spell_word",      lambda: app.generate_spell_word("hard")),
+        ]:
+            us, allocated = measure(fn, rounds=5000)
+            print(f"{name:<28}{us:>10.2f}{allocated:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Concurrent-writer benchmark for students.db.
+
+Runs the real /update_xp route from several processes at once (one per
+simulated gunicorn worker), each hammering its own student, while a reader
+polls /get_student_info. The same workload runs under three configurations:
+
+    before   rollback journal (DELETE), synchronous=FULL, no busy retries
+    after    WAL, synchronous=NORMAL, busy retries (the app defaults)
+    sharded  "after" with SHARD_BY=class; the students are spread over the
+             ten classes, so writers mostly hold different write locks
+
+Each configuration gets a fresh database in a temp directory; nothing in the
+working tree is touched.
+
+    GROQ_API_KEY=stub python tools/bench_db_writers.py --workers 8 --writes 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "before": {"DB_JOURNAL_MODE": "DELETE", "DB_SYNCHRONOUS": "FULL", "DB_BUSY_RETRIES": "0"},
+    "after":  {"DB_JOURNAL_MODE": "WAL",    "DB_SYNCHRONOUS": "NORMAL", "DB_BUSY_RETRIES": "3"},
+    "sharded": {"DB_JOURNAL_MODE": "WAL",   "DB_SYNCHRONOUS": "NORMAL", "DB_BUSY_RETRIES": "3", "SHARD_BY": "class"},
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+# ================= CHILD: ONE PROFILE =================
+def _client_for(app_module, user_id_code):
+    client = app_module.app.test_client()
+    client.post("/login", json={"role": "student", "userIdCode": user_id_code, "password": "bench"})
+    return client
+
+
+def _writer(user_id_code, writes, out):
+    import app as app_module
+    client = _client_for(app_module, user_id_code)
+    latencies, errors = [], 0
+    for i in range(writes):
+        started = time.perf_counter()
+        try:
+            r = client.post("/update_xp", json={
+                "xpEarned": 2, "mode": "repeat", "score": 80 + i % 20,
+                "starsEarned": i % 3, "difficulty": "medium",
+            })
+            ok = r.status_code == 200 and r.get_json().get("success")
+        except Exception:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        errors += 0 if ok else 1
+    out.put(("write", latencies, errors))
+
+
+def _reader(user_id_code, deadline, out):
+    import app as app_module
+    client = _client_for(app_module, user_id_code)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            ok = client.get("/get_student_info").status_code == 200
+        except Exception:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        errors += 0 if ok else 1
+    out.put(("read", latencies, errors))
+
+
+def run_profile(workers, writes):
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.speak_to_file = lambda *a, **k: None
+
+    setup = app_module.app.test_client()
+    students = []
+    for i in range(workers + 1):
+        r = setup.post("/signup", json={
+            "name": f"Bench {i}", "password": "bench", "role": "student",
+            "rollNo": f"B{i}", "className": str(i % 10 + 1), "division": "A",
+        }).get_json()
+        students.append(r["userIdCode"])
+    # Children must open their own connections, not inherit the parent's.
+    app_module.close_db_connection()
+
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    started = time.time()
+    procs = [ctx.Process(target=_writer, args=(students[i], writes, out)) for i in range(workers)]
+    procs.append(ctx.Process(target=_reader, args=(students[-1], started + 3600, out)))
+    for p in procs[:-1]:
+        p.start()
+    procs[-1].start()
+
+    write_lat, write_err = [], 0
+    for _ in range(workers):
+        _, lat, err = out.get()
+        write_lat += lat
+        write_err += err
+    elapsed = time.time() - started
+    procs[-1].terminate()
+    for p in procs:
+        p.join()
+
+    write_lat.sort()
+    print(json.dumps({
+        "writes": len(write_lat), "errors": write_err, "elapsed": elapsed,
+        "p50": percentile(write_lat, 50), "p95": percentile(write_lat, 95), "p99": percentile(write_lat, 99),
+    }))
+
+
+# ================= PARENT: COMPARE PROFILES =================
+def main():
+    parser = argparse.ArgumentParser(description="Compare concurrent SQLite writers before/after WAL tuning and sharding")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent writer processes")
+    parser.add_argument("--writes", type=int, default=200, help="update_xp calls per writer")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        return run_profile(args.workers, args.writes)
+
+    print(f"{'profile':<10}{'writes':>8}{'err':>6}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, overrides in PROFILES.items():
+        with tempfile.TemporaryDirectory() as work:
+            env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY", "stub"), DISABLE_TTS="1",
+                       SESSION_BACKEND="cookie", CONTENT_RELOAD_SECS="0", DB_CHECKPOINT_SECS="0", READ_SNAPSHOT_SECS="0",
+                       CONTENT_DIR=os.path.join(ROOT, "content"), DB_PATH=os.path.join(work, "students.db"),
+                       **overrides)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--profile", name,
+                 "--workers", str(args.workers), "--writes", str(args.writes)],
+                cwd=work, env=env, capture_output=True, text=True,
+            )
+            lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+            if proc.returncode != 0 or not lines:
+                print(f"{name:<10} failed:\n{proc.stderr[-2000:]}")
+                continue
+            r = json.loads(lines[-1])
+            print(f"{name:<10}{r['writes']:>8}{r['errors']:>6}{r['writes'] / r['elapsed']:>10.1f}"
+                  f"{r['p50'] * 1000:>9.1f}{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Contention benchmark for the XP write path.
+
+Many processes submit XP for the SAME student at once (a student double-
+tapping, or several tabs open), which is where a read-compute-write
+update_xp loses awards. Two variants run against a fresh database:
+
+    legacy   the old pattern, emulated here: SELECT the progress row,
+             add in Python, UPDATE with the computed totals
+    atomic   the real /update_xp route (single BEGIN IMMEDIATE
+             transaction with in-place increments)
+
+For each it reports throughput, latency percentiles and how much XP went
+missing compared with what was submitted. The legacy emulation skips Flask
+and the badge/streak work, so its raw throughput is flattering; the number
+to compare is lost XP.
+
+    GROQ_API_KEY=stub python tools/bench_update_xp.py --submitters 16 --each 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK = tempfile.mkdtemp()
+
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.update(DB_PATH=os.path.join(WORK, "students.db"), SESSION_BACKEND="cookie",
+                  CONTENT_DIR=os.path.join(ROOT, "content"), CONTENT_RELOAD_SECS="0",
+                  DB_CHECKPOINT_SECS="0", READ_SNAPSHOT_SECS="0", DISABLE_TTS="1")
+os.chdir(WORK)
+sys.path.insert(0, ROOT)
+
+import multiprocessing  # noqa: E402
+
+import app  # noqa: E402
+
+XP_EACH = 2
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def legacy_submit(user_id_code, each, out):
+    conn = sqlite3.connect(app.DB_PATH, timeout=5)
+    latencies, errors = [], 0
+    for _ in range(each):
+        started = time.perf_counter()
+        try:
+            xp, repeat_xp = conn.execute(
+                "SELECT xp, repeat_xp FROM student_progress WHERE user_id_code=?", (user_id_code,)
+            ).fetchone()
+            time.sleep(0)  # the old handler did badge/streak work here, widening the window
+            conn.execute("UPDATE student_progress SET xp=?, repeat_xp=? WHERE user_id_code=?",
+                         (xp + XP_EACH, repeat_xp + XP_EACH, user_id_code))
+            conn.execute("INSERT INTO activity_log (user_id_code, mode, score, xp_earned) VALUES (?, 'repeat', 90, ?)",
+                         (user_id_code, XP_EACH))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    out.put((latencies, errors))
+
+
+def atomic_submit(user_id_code, each, out):
+    client = app.app.test_client()
+    client.post("/login", json={"role": "student", "userIdCode": user_id_code, "password": "bench"})
+    latencies, errors = [], 0
+    for _ in range(each):
+        started = time.perf_counter()
+        try:
+            r = client.post("/update_xp", json={"xpEarned": XP_EACH, "mode": "repeat", "score": 90,
+                                                "starsEarned": 0, "difficulty": "easy"})
+            errors += 0 if r.status_code == 200 and r.get_json()["success"] else 1
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    out.put((latencies, errors))
+
+
+def run(name, target, user_id_code, submitters, each):
+    app.close_db_connection()
+    ctx = multiprocessing.get_context("fork")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(user_id_code, each, out)) for _ in range(submitters)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        lat, err = out.get()
+        latencies += lat
+        errors += err
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    conn = app.get_db_connection()
+    xp = conn.execute("SELECT xp FROM student_progress WHERE user_id_code=?", (user_id_code,)).fetchone()[0]
+    rows = conn.execute("SELECT COUNT(*) FROM activity_log WHERE user_id_code=?", (user_id_code,)).fetchone()[0]
+    expected = rows * XP_EACH
+    latencies.sort()
+    print(f"{name:<8}{len(latencies):>8}{errors:>6}{len(latencies) / elapsed:>10.1f}"
+          f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 95) * 1000:>9.1f}"
+          f"{percentile(latencies, 99) * 1000:>9.1f}{expected - xp:>10}")
+
+
+def make_student(client, n):
+    r = client.post("/signup", json={"name": f"Bench {n}", "password": "bench", "role": "student",
+                                     "rollNo": f"X{n}", "className": "5", "division": "A"}).get_json()
+    return r["userIdCode"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel XP submissions for one student")
+    parser.add_argument("--submitters", type=int, default=16)
+    parser.add_argument("--each", type=int, default=50, help="submissions per submitter")
+    args = parser.parse_args()
+
+    client = app.app.test_client()
+    print(f"{'variant':<8}{'calls':>8}{'err':>6}{'calls/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'lost XP':>10}")
+    run("legacy", legacy_submit, make_student(client, 1), args.submitters, args.each)
+    run("atomic", atomic_submit, make_student(client, 2), args.submitters, args.each)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot activity_log, leaderboard and student listing queries.
+
+Builds a throwaway database through app.init_db, fills it with enough rows
+for the planner to care, runs ANALYZE, and asserts that each query below is
+answered from an index rather than a full scan or a sort. Exits
+non-zero if any plan regresses, so it can gate a deploy:
+
+    GROQ_API_KEY=stub python tools/check_query_plans.py
+
+Keep the SQL here in step with the queries in app.py it is named after. The same checks
+run under pytest as tests/test_query_plans.py.
+"""
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, sql, params, index the plan must mention)
+CHECKS = [
+    ("calculate_streak",
+     "SELECT DISTINCT day FROM activity_log WHERE user_id_code = ? ORDER BY day DESC",
+     ("GSS-00001",), "idx_activity_user_day"),
+    ("has_completed_daily",
+     "SELECT attempts FROM activity_daily_rollup WHERE user_id_code = ? AND day = date('now') AND mode = 'daily'",
+     ("GSS-00001",), "PRIMARY KEY (user_id_code=? AND day=? AND mode=?)"),
+    ("admin_stats.activity_today",
+     "SELECT COUNT(*) FROM activity_log WHERE day=date('now')",
+     (), "idx_activity_day"),
+    ("get_progress_details.mode_rows",
+     """SELECT mode, attempts, score_sum * 1.0 / attempts, high_count, low_count, stars
+        FROM student_mode_stats WHERE user_id_code = ? AND mode NOT IN ('daily')""",
+     ("GSS-00001",), "student_mode_stats USING PRIMARY KEY (user_id_code=?)"),
+    ("get_progress_details.weak_rows",
+     """SELECT mode, score, date FROM activity_log
+        WHERE user_id_code = ? AND score < 70 AND mode NOT IN ('daily') ORDER BY date DESC LIMIT 10""",
+     ("GSS-00001",), "idx_activity_user_date"),
+    ("get_progress_details.recent_rows",
+     """SELECT mode, score, xp_earned, stars_earned, date FROM activity_log
+        WHERE user_id_code = ? AND mode NOT IN ('daily') ORDER BY date DESC LIMIT 5""",
+     ("GSS-00001",), "idx_activity_user_date"),
+    ("get_student_details.activities",
+     "SELECT date, mode, score, xp_earned, stars_earned FROM activity_log WHERE user_id_code=? ORDER BY date DESC LIMIT 50",
+     ("GSS-00001",), "idx_activity_user_date"),
+    ("get_leaderboard.top (global)",
+     """SELECT u.name, sp.xp FROM student_progress sp CROSS JOIN users u ON u.user_id_code=sp.user_id_code
+        WHERE 1=1 AND u.role='student' ORDER BY sp.xp DESC LIMIT 10""",
+     (), "idx_progress_xp"),
+    ("get_leaderboard.top (division)",
+     """SELECT u.name, sp.xp FROM student_progress sp CROSS JOIN users u ON u.user_id_code=sp.user_id_code
+        WHERE sp.class_name=? AND sp.division=? AND u.role='student' ORDER BY sp.xp DESC LIMIT 10""",
+     ("5", "B"), "idx_progress_class_div_xp"),
+    ("get_leaderboard.my_rank (class)",
+     "SELECT COUNT(*) FROM student_progress sp WHERE sp.class_name=? AND sp.xp > ?",
+     ("5", 1200), "idx_progress_class_xp"),
+    ("student_page.class (cursor)",
+     """SELECT u.name FROM users u LEFT JOIN student_progress sp ON u.user_id_code=sp.user_id_code
+        WHERE u.role='student' AND (u.class_num, u.division, u.name, u.id) > (?, ?, ?, ?)
+        ORDER BY u.class_num, u.division, u.name, u.id LIMIT 51""",
+     (3, "C", "S42", 42), "idx_users_student_order (role=? AND (class_num,division,name)>"),
+    ("student_page.rank (class filter, cursor)",
+     """SELECT u.name FROM student_progress sp CROSS JOIN users u ON u.user_id_code=sp.user_id_code
+        WHERE u.role='student' AND sp.class_num = ? AND (sp.division, sp.xp_rank, sp.id) > (?, ?, ?)
+        ORDER BY sp.class_num, sp.division, sp.xp_rank, sp.id LIMIT 51""",
+     (5, "B", -1200, 42), "idx_progress_class_rank (class_num=? AND (division,xp_rank)>"),
+]
+
+MODES = ["conversation", "roleplay", "repeat", "spellbee", "wordpuzzle", "grammar", "meanings", "daily"]
+
+
+def seed(conn, students=200, rows_per_student=50):
+    rows = []
+    for s in range(students):
+        uid = f"GSS-{s:05d}"
+        for _ in range(rows_per_student):
+            rows.append((uid, random.choice(MODES), random.uniform(30, 100), random.randint(0, 3),
+                         f"2026-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"))
+    conn.executemany(
+        "INSERT INTO users (role, name, user_id_code, roll_no, class_name, division, password_hash) VALUES ('student',?,?,?,?,?,'x')",
+        [(f"S{s}", f"GSS-{s:05d}", str(s), str(s % 10 + 1), "ABCDE"[s % 5]) for s in range(students)]
+    )
+    conn.executemany(
+        "INSERT INTO activity_log (user_id_code, mode, score, stars_earned, day) VALUES (?,?,?,?,?)", rows
+    )
+    conn.executemany(
+        "INSERT INTO student_progress (user_id_code, class_name, division, xp) VALUES (?,?,?,?)",
+        [(f"GSS-{s:05d}", str(s % 10 + 1), "ABCDE"[s % 5], random.randint(0, 5000)) for s in range(students)]
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def plan_of(conn, sql, params):
+    return " | ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def plan_ok(name, plan, expected):
+    """The expected index is used, no table is fully scanned, and ordered reads don't sort."""
+    full_scan = any(step.startswith("SCAN") and "USING" not in step for step in plan.split(" | "))
+    sorts = name.startswith(("get_leaderboard", "student_page", "get_progress_details", "get_student_details")) \
+        and "TEMP B-TREE" in plan
+    return expected in plan and not full_scan and not sorts
+
+
+def main():
+    work = tempfile.mkdtemp()
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    os.environ.update(DB_PATH=os.path.join(work, "students.db"), SESSION_BACKEND="cookie",
+                      CONTENT_DIR=os.path.join(ROOT, "content"), CONTENT_RELOAD_SECS="0",
+                      DB_CHECKPOINT_SECS="0", READ_SNAPSHOT_SECS="0", DISABLE_TTS="1")
+    os.chdir(work)
+    sys.path.insert(0, ROOT)
+    import app
+
+    conn = app.get_db_connection()
+    seed(conn)
+    failures = 0
+    for name, sql, params, expected in CHECKS:
+        plan = plan_of(conn, sql, params)
+        ok = plan_ok(name, plan, expected)
+        failures += 0 if ok else 1
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<42} {plan}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the Groq chat-completions endpoint.
+
+Lets us load-test /process, /get_meaning and /spell_word without touching the
+real Groq API. Point the app at it with GROQ_BASE_URL (the Groq SDK reads it
+automatically) and disable TTS so gTTS is not hit either:
+
+    python tools/groq_stub.py --port 8001 --latency lognormal:-1.2,0.5
+    GROQ_BASE_URL=http://127.0.0.1:8001 GROQ_API_KEY=stub DISABLE_TTS=1 gunicorn app:app
+
+Latency specs (seconds):
+    fixed:0.3            always 0.3s
+    uniform:0.1,0.6      uniform between 0.1s and 0.6s
+    normal:0.4,0.1       gaussian mean/stddev (clamped at 0)
+    lognormal:-1.2,0.5   lognormal mu/sigma (long tail, closest to real LLM latency)
+    exp:0.3              exponential with the given mean
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ================= CANNED OUTPUTS =================
+COACH_REPLIES = [
+    ("I like playing cricket.",   "Cricket is such a fun game!",             "Great sentence!",        "Who do you play cricket with?"),
+    ("I went to the park today.", "The park is a lovely place to play.",     "Well done!",             "What did you do at the park?"),
+    ("My favourite food is rice.", "Rice is tasty and healthy too.",         "Nice work!",             "What do you eat with rice?"),
+    ("I am feeling happy.",       "I'm so glad to hear you're happy!",       "You spoke clearly!",     "What made you happy today?"),
+    ("I have a pet dog.",         "Dogs are wonderful friends.",             "Excellent English!",     "What is your dog's name?"),
+    ("I read a book yesterday.",  "Reading is a great habit.",               "Keep it up!",            "What was the book about?"),
+]
+
+MEANING_REPLY = (
+    "MEANING: {word} is a word we use to describe something.\n"
+    "EXAMPLE: I used the word {word} in class today.\n"
+    "TYPE: adjective\n"
+    "TIP: Say {word} aloud three times to remember it."
+)
+
+_WORD_IN_QUOTES = '"'
+
+
+def _quoted_word(text):
+    start = text.find(_WORD_IN_QUOTES)
+    if start == -1:
+        return "word"
+    end = text.find(_WORD_IN_QUOTES, start + 1)
+    return text[start + 1:end] if end != -1 else "word"
+
+
+def canned_reply(messages):
+    """Pick a reply shaped like the prompt that was sent (coach, meaning or usage)."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "MEANING:" in prompt:
+        return MEANING_REPLY.format(word=_quoted_word(prompt))
+    if "Write ONE simple sentence using the word" in prompt:
+        return f"I can use the word {_quoted_word(prompt)} in a sentence."
+    corrected, answer, praise, question = random.choice(COACH_REPLIES)
+    return (
+        f"CORRECT: {corrected}\n"
+        f"ANSWER: {answer}\n"
+        f"PRAISE: {praise}\n"
+        f"QUESTION: {question}"
+    )
+
+
+# ================= LATENCY MODELS =================
+def parse_latency(spec):
+    """Turn a 'kind:a,b' spec into a zero-argument sampler returning seconds."""
+    kind, _, args = spec.partition(":")
+    params = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(params[0], params[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / params[0])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+# ================= HTTP HANDLER =================
+class StubHandler(BaseHTTPRequestHandler):
+    latency = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    stats = {"requests": 0, "errors": 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.stats_lock:
+                return self._send_json(200, dict(self.stats))
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found"}})
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON"}})
+
+        time.sleep(self.latency())
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            failed = random.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if failed:
+            return self._send_json(503, {"error": {"message": "Stub injected failure", "type": "server_error"}})
+
+        content = canned_reply(payload.get("messages", []))
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in payload.get("messages", []))
+        completion_tokens = len(content.split())
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "llama-3.1-8b-instant"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Groq chat-completions stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:-1.2,0.5",
+                        help="latency distribution, e.g. fixed:0.3 or uniform:0.1,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with a 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    StubHandler.latency = staticmethod(parse_latency(args.latency))
+    StubHandler.error_rate = args.error_rate
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"Groq stub listening on http://{args.host}:{args.port} (latency={args.latency}, errors={args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
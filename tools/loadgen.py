@@ -0,0 +1,217 @@
+"""
+Classroom load generator.
+
+Simulates N students who sign up, log in and then walk through the practice
+modes in FEATURE_SEQUENCE order, the way a class does at the start of a
+lesson. Reports throughput and p50/p95/p99 latency per route.
+
+Run it against a server backed by tools/groq_stub.py:
+
+    python tools/groq_stub.py --port 8001 &
+    GROQ_BASE_URL=http://127.0.0.1:8001 GROQ_API_KEY=stub DISABLE_TTS=1 \\
+        gunicorn -w 4 -b 127.0.0.1:10000 app:app &
+    python tools/loadgen.py --base-url http://127.0.0.1:10000 --students 40 --duration 60
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+# Mirrors FEATURE_SEQUENCE in app.py
+FEATURE_SEQUENCE = ["conversation", "roleplay", "repeat", "spellbee", "wordpuzzle", "grammar", "meanings"]
+
+REPEAT_CATEGORIES = ["civic_sense", "animals", "food", "sports", "feelings", "colors", "family", "school"]
+DIFFICULTIES      = ["easy", "medium", "hard"]
+DIFFICULTY_XP     = {"easy": 1, "medium": 2, "hard": 5}
+ROLEPLAY_TYPES    = ["teacher", "friend", "interviewer", "viva"]
+SAMPLE_UTTERANCES = [
+    "i go to school yesterday", "my favourite colour is blue", "hello how are you",
+    "what is the biggest animal", "i am feel happy today", "we plays cricket",
+]
+MEANING_WORDS = ["brave", "curious", "generous", "enormous", "gentle", "swift"]
+
+
+# ================= RESULTS =================
+class Results:
+    def __init__(self):
+        self.lock      = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors    = defaultdict(int)
+
+    def record(self, route, seconds, ok):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+# ================= SIMULATED STUDENT =================
+class Student:
+    def __init__(self, base_url, results, index, think_time, xp_batch=0):
+        self.base_url   = base_url.rstrip("/")
+        self.results    = results
+        self.index      = index
+        self.think_time = think_time
+        self.xp_batch   = xp_batch
+        self.xp_queue   = []
+        self.xp_seq     = 0
+        self.opener     = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def call(self, route, payload=None, method=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req  = urllib.request.Request(self.base_url + route, data=data, method=method or ("POST" if data else "GET"))
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        started = time.perf_counter()
+        ok, body = True, None
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                raw = resp.read()
+                if resp.headers.get("Content-Type", "").startswith("application/json"):
+                    body = json.loads(raw)
+        except (urllib.error.URLError, OSError, ValueError):
+            ok = False
+        self.results.record(route, time.perf_counter() - started, ok)
+        return body or {}
+
+    def pause(self):
+        if self.think_time:
+            time.sleep(random.uniform(0, self.think_time))
+
+    def sign_up_and_login(self):
+        password = "loadtest"
+        signup = self.call("/signup", {
+            "name":      f"Load Student {self.index}",
+            "password":  password,
+            "role":      "student",
+            "rollNo":    f"LG{random.randint(0, 10**8):08d}",
+            "className": random.choice([str(i) for i in range(1, 11)]),
+            "division":  random.choice(["A", "B", "C", "D", "E"]),
+        })
+        user_id_code = signup.get("userIdCode")
+        if not user_id_code:
+            return False
+        return bool(self.call("/login", {"role": "student", "userIdCode": user_id_code, "password": password}).get("success"))
+
+    def award(self, mode, score, stars, difficulty):
+        event = {
+            "xpEarned": DIFFICULTY_XP[difficulty], "mode": mode, "score": score,
+            "starsEarned": stars, "difficulty": difficulty,
+        }
+        if not self.xp_batch:
+            self.call("/update_xp", event)
+            return
+        self.xp_seq += 1
+        self.xp_queue.append(dict(event, seq=self.xp_seq))
+        if len(self.xp_queue) >= self.xp_batch:
+            self.flush_xp()
+
+    def flush_xp(self):
+        if self.xp_queue:
+            self.call("/update_xp_batch", {"clientId": f"loadgen-{self.index}", "events": self.xp_queue})
+            self.xp_queue = []
+
+    def page_load(self):
+        self.call("/get_student_info")
+        self.call("/get_leaderboard")
+        self.call("/get_daily_challenge")
+
+    def practice(self, mode):
+        difficulty = random.choice(DIFFICULTIES)
+        if mode == "conversation":
+            self.call("/process", {"text": random.choice(SAMPLE_UTTERANCES)})
+            self.award(mode, random.randint(50, 100), random.randint(0, 3), "easy")
+        elif mode == "roleplay":
+            role = random.choice(ROLEPLAY_TYPES)
+            self.call("/reset_roleplay_context", {"roleplay": role})
+            self.call("/process", {"text": random.choice(SAMPLE_UTTERANCES), "roleplay": role})
+            self.award(mode, random.randint(50, 100), random.randint(0, 3), "easy")
+        elif mode == "repeat":
+            sentence = self.call("/repeat_sentence", {"category": random.choice(REPEAT_CATEGORIES), "difficulty": difficulty}).get("sentence", "")
+            result = self.call("/check_repeat", {"student": sentence.lower(), "correct": sentence})
+            self.award(mode, result.get("score", 0), result.get("stars", 0), difficulty)
+        elif mode == "spellbee":
+            word = self.call("/spell_word", {"difficulty": difficulty}).get("word", "")
+            result = self.call("/check_spelling", {"spelling": word, "correct": word, "attempt": 1})
+            self.award(mode, 100 if result.get("correct") else 0, result.get("stars", 0), difficulty)
+        elif mode == "wordpuzzle":
+            puzzle = self.call("/word_puzzle_start", {"difficulty": difficulty})
+            result = self.call("/check_word_puzzle", {"answer": puzzle.get("scrambled", ""), "attempt": 1})
+            self.award(mode, 100 if result.get("correct") else 0, result.get("stars", 0), difficulty)
+        elif mode == "grammar":
+            question = self.call("/grammar_question", {"difficulty": difficulty})
+            choice = random.randrange(len(question.get("options") or [0]))
+            result = self.call("/check_grammar", {"chosen_index": choice, "difficulty": difficulty})
+            self.award(mode, 100 if result.get("correct") else 0, result.get("stars", 0), difficulty)
+        elif mode == "meanings":
+            self.call("/get_meaning", {"word": random.choice(MEANING_WORDS)})
+            self.award(mode, 100, 1, "easy")
+
+    def run(self, deadline):
+        if not self.sign_up_and_login():
+            return
+        while time.time() < deadline:
+            self.page_load()
+            for mode in FEATURE_SEQUENCE:
+                if time.time() >= deadline:
+                    break
+                self.practice(mode)
+                self.pause()
+        self.flush_xp()
+
+
+# ================= REPORT =================
+def report(results, elapsed):
+    total = sum(len(v) for v in results.latencies.values())
+    print(f"\n{total} requests in {elapsed:.1f}s  ->  {total / elapsed:.1f} req/s overall\n")
+    print(f"{'route':<26}{'count':>8}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route in sorted(results.latencies):
+        values = sorted(results.latencies[route])
+        print(f"{route:<26}{len(values):>8}{results.errors[route]:>6}{len(values) / elapsed:>9.1f}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a classroom of students")
+    parser.add_argument("--base-url", default="http://127.0.0.1:10000")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which students log in")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max pause between items (seconds)")
+    parser.add_argument("--xp-batch", type=int, default=0,
+                        help="queue XP awards and send them to /update_xp_batch N at a time (0 = one /update_xp each)")
+    args = parser.parse_args()
+
+    results  = Results()
+    started  = time.time()
+    deadline = started + args.ramp_up + args.duration
+    threads  = []
+    for i in range(args.students):
+        student = Student(args.base_url, results, i, args.think_time, args.xp_batch)
+        t = threading.Thread(target=student.run, args=(deadline,), daemon=True)
+        threads.append(t)
+        t.start()
+        if args.students > 1:
+            time.sleep(args.ramp_up / args.students)
+    for t in threads:
+        t.join()
+    report(results, time.time() - started)
+
+
+if __name__ == "__main__":
+    main()